@@ -3,64 +3,461 @@ AI API调用模块
 负责与OpenRouter/OpenAI API交互
 """
 
+import hashlib
+import itertools
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from openai import OpenAI
-from dotenv import load_dotenv
+from hedging import Hedger
+from response_cache import ResponseCache
+from section_index import render_sections
+from text_chunker import chunk_text, select_sections, split_sections
+from token_budget import TokenBudget, compact_text, count_tokens, truncate_to_tokens
+from transport import ModelRouter, Transport, RetryableAPIError
+
+CHUNK_SYSTEM_PROMPT = """You are assisting a senior academic reviewer who cannot read the whole paper at once. You will receive one consecutive part of a long academic paper. Write dense reading notes on this part only, so that the reviewer can later write a full review from the notes of all parts.
+
+Cover whatever is present in this part:
+- Research question, hypotheses and theoretical framing
+- Literature positioning and any notable gaps
+- Data sources, sample, variables and measurement
+- Methods, model specifications and identification strategy
+- Key results with concrete numbers (coefficients, effect sizes, significance)
+- Robustness checks, endogeneity handling, heterogeneity analyses
+- Stated limitations and conclusions
+- Problems you notice: flaws, inconsistencies, missing analyses, unclear writing
+
+Rules:
+1. Write the notes in the same language as the paper
+2. Be specific and factual; do not praise or summarize generically
+3. If this part is only references, acknowledgements or boilerplate, say so in one line
+4. At most 400 words
+"""
+
+
+class LongDocumentNotes:
+    """
+    长文档分块阅读笔记
+    同一文档的AI解析和AI审稿共用一份笔记，并发请求时只生成一次
+    """
+
+    MAX_ENTRIES = 32
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def get(self, document_text, build):
+        """
+        获取文档的阅读笔记，不存在时调用build(document_text)生成
+        """
+        key = hashlib.sha256(document_text.encode("utf-8")).hexdigest()
+
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                if len(self._futures) >= self.MAX_ENTRIES:
+                    self._futures.clear()
+                future = Future()
+                self._futures[key] = future
+
+        if owner:
+            try:
+                future.set_result(build(document_text))
+            except Exception as e:
+                with self._lock:
+                    self._futures.pop(key, None)
+                future.set_exception(e)
+
+        return future.result()
 
 
 class AIClient:
     """AI客户端"""
 
+    # 各阶段的生成参数
+    PARSE_PARAMS = {"temperature": 0.3, "max_tokens": 3000}
+    REVIEW_PARAMS = {"temperature": 0.6, "max_tokens": 6000}
+    CHUNK_PARAMS = {"temperature": 0.3, "max_tokens": 1200}
+
+
     def __init__(self):
         """初始化AI客户端"""
         # 加载环境变量
+        from dotenv import load_dotenv
         load_dotenv()
 
         # 获取配置
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.base_url = os.getenv("OPENAI_BASE_URL", "https://openrouter.ai/api/v1")
-        self.model = os.getenv("OPENAI_MODEL", "openai/gpt-4o")
+        # 按阶段选择模型（OPENAI_MODEL_PARSE / OPENAI_MODEL_REVIEW / OPENAI_MODEL_CHUNK，均可配置备选模型）
+        self.router = ModelRouter(os.getenv("OPENAI_MODEL", "openai/gpt-4o"))
+        self.model = self.router.primary()
 
         if not self.api_key:
             raise ValueError("请在.env文件中配置OPENAI_API_KEY")
 
-        # 初始化OpenAI客户端
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url
-        )
-
-    def call_api(self, system_prompt, user_content, temperature=0.7, max_tokens=4000):
+        # OpenAI客户端在首次请求时创建（导入openai较慢，不计入启动时间）
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.transport = Transport()
+        # 长文档分块请求：每个文档最多LONG_DOC_MAP_WORKERS个并行，所有文档合计不超过REVIEW_IO_WORKERS个
+        # （等待分块结果的AI并发线程不发出请求，同时发出的请求数最多为两者之和）
+        self.map_workers = int(os.getenv("LONG_DOC_MAP_WORKERS", 8))
+        io_workers = int(os.getenv("REVIEW_IO_WORKERS", 8))
+        self.chunk_slots = threading.BoundedSemaphore(io_workers)
+        # 对冲请求（AI_HEDGE=1 启用）：首个token迟迟未到时再发一个请求，取先到的一方
+        # 主请求也在对冲线程池中执行：同时发出的请求最多为 REVIEW_IO_WORKERS 个AI请求加同样数量的分块请求，
+        # 每个请求最多占用两个线程（主请求和对冲请求）
+        concurrent_requests = io_workers + io_workers
+        self.hedger = Hedger(max_workers=concurrent_requests * 2)
+
+        # 响应缓存（AI_RESPONSE_CACHE=0 关闭，需要多样化采样时使用）
+        cache_enabled = os.getenv("AI_RESPONSE_CACHE", "1") != "0"
+        self.cache = ResponseCache() if cache_enabled else None
+
+        # Token预算：按模型上下文长度分配输入与输出
+        self.budget = TokenBudget()
+        self.direct_document_tokens = self.direct_document_budget(self.budget)
+
+        # 长文档模式：单次请求放不下的文档先分块并行生成阅读笔记，再基于全文笔记解析/审稿
+        self.long_document_mode = os.getenv("LONG_DOC_MODE", "1") != "0"
+        self.chunk_tokens = int(os.getenv("LONG_DOC_CHUNK_TOKENS", 6000))
+        self.long_document_notes = LongDocumentNotes()
+
+        # 两阶段审稿：REVIEW_CONTEXT=compact 时审稿请求基于AI解析结果+关键章节原文，而不是再次发送全文
+        self.compact_review = os.getenv("REVIEW_CONTEXT", "full") == "compact"
+        self.review_excerpt_tokens = int(os.getenv("REVIEW_EXCERPT_TOKENS", 6000))
+
+        # 发送给AI时省略的章节类别（按提取时生成的章节索引，逗号分隔，留空则发送全部章节）
+        omit = os.getenv("PROMPT_OMIT_SECTIONS", "references,acknowledgements,appendix")
+        self.omit_sections = tuple(label.strip() for label in omit.split(",") if label.strip())
+
+    @property
+    def client(self):
+        """OpenAI客户端（首次使用时导入openai并创建，重试由传输层统一处理）"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        max_retries=0
+                    )
+        return self._client
+
+    def call_api(self, system_prompt, user_content, temperature=0.7, max_tokens=4000, use_cache=True, stats=None,
+                 stage=None):
         """
         调用AI API
         :param system_prompt: 系统提示词
         :param user_content: 用户输入内容
         :param temperature: 温度参数
         :param max_tokens: 最大token数
+        :param use_cache: 是否使用响应缓存
+        :param stats: CallStats，累加该文档的请求、重试次数、等待时间、token用量和模型切换
+        :param stage: 阶段（parse / review / chunk），决定使用的模型链
         :return: AI生成的文本
         """
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
+        # 对冲请求按首个token的到达时间判断，启用时改用流式请求
+        if self.hedger.enabled:
+            return "".join(self.stream_api(
+                system_prompt, user_content, temperature, max_tokens, use_cache=use_cache, stats=stats, stage=stage
+            ))
+
+        # 保证请求不超出上下文长度，并按剩余空间设置max_tokens
+        user_content, max_tokens = self.budget.fit_request(system_prompt, user_content, max_tokens)
+
+        # 缓存键使用阶段的首选模型；备选模型生成的结果不写入缓存，下次运行仍优先使用首选模型
+        primary_model = self.router.primary(stage)
+        cache_key = None
+        if self.cache and use_cache:
+            cache_key = ResponseCache.make_key(
+                primary_model, self.base_url, system_prompt, user_content, temperature, max_tokens
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                if stats:
+                    stats.record_cache_hit()
+                return cached
+
+        def request(timeout, model):
+            return self.client.chat.completions.create(
+                model=model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_content}
                 ],
                 temperature=temperature,
-                max_tokens=max_tokens
+                max_tokens=max_tokens,
+                timeout=timeout
+            )
+
+        route = self.router.route(stage)
+        response = self.transport.execute(request, stats, route)
+        content = response.choices[0].message.content
+        self.record_usage(stats, route.model, response.usage, (system_prompt, user_content), content)
+
+        if cache_key and content and route.model == primary_model:
+            self.cache.set(cache_key, content)
+        return content
+
+    def stream_api(self, system_prompt, user_content, temperature=0.7, max_tokens=4000,
+                   resume_text="", use_cache=True, stats=None, stage=None):
+        """
+        流式调用AI API，逐段生成文本
+        建立连接阶段的失败按传输层策略重试（过载时切换备选模型），启用对冲时首个token超时未到会再发一个请求；
+        输出中途断开时抛出RetryableAPIError，已生成内容可用于续写
+        :param resume_text: 上次中断时已生成的内容，非空时要求模型从中断处继续
+        :param stage: 阶段（parse / review / chunk），决定使用的模型链
+        :return: 生成器，逐个产出新增的文本片段（不包含resume_text）
+        """
+        user_content, max_tokens = self.budget.fit_request(system_prompt, user_content, max_tokens)
+
+        primary_model = self.router.primary(stage)
+        cache_key = None
+        if self.cache and use_cache:
+            cache_key = ResponseCache.make_key(
+                primary_model, self.base_url, system_prompt, user_content, temperature, max_tokens
+            )
+            cached = self.cache.get(cache_key) if not resume_text else None
+            if cached is not None:
+                if stats:
+                    stats.record_cache_hit()
+                yield cached
+                return
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ]
+        if resume_text:
+            messages += [
+                {"role": "assistant", "content": resume_text},
+                {"role": "user", "content": "Continue exactly where you stopped. Do not repeat any text already written."}
+            ]
+            max_tokens = max(self.budget.MIN_OUTPUT_TOKENS, max_tokens - count_tokens(resume_text))
+
+        def request(timeout, model):
+            return self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                stream_options={"include_usage": True},
+                timeout=timeout
             )
 
-            return response.choices[0].message.content
+        prompt_texts = [message["content"] for message in messages]
+
+        def open_attempt(attempt):
+            """建立连接并读到首个内容片段（对冲时主请求和对冲请求各在一个线程中执行）"""
+            stream = self.transport.execute(request, stats, attempt.route)
+            attempt.attach(stream)
+            chunks = iter(stream)
+            head = []
+            try:
+                for chunk in chunks:
+                    head.append(chunk)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        break
+            except Exception as e:
+                raise RetryableAPIError(f"AI API调用失败（流式输出中断）: {e}") from e
+            return chunks, head
+
+        def discard(attempt):
+            # 落败的请求已被服务端接收，按输入token计入用量
+            self.record_usage(stats, attempt.route.model, None, prompt_texts, "")
+
+        attempt, (chunks, head) = self.hedger.run(stage, self.router.route(stage), open_attempt, stats, discard)
+        route = attempt.route
+
+        parts = [resume_text]
+        usage = None
+        try:
+            for chunk in itertools.chain(head, chunks):
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
 
         except Exception as e:
-            raise Exception(f"AI API调用失败: {e}")
+            raise RetryableAPIError(f"AI API调用失败（流式输出中断）: {e}") from e
+        finally:
+            self.record_usage(stats, route.model, usage, prompt_texts, "".join(parts[1:]))
+
+        if cache_key and route.model == primary_model:
+            self.cache.set(cache_key, "".join(parts))
 
-    def parse_document(self, document_text):
+    @staticmethod
+    def record_usage(stats, model, usage, prompt_texts, completion_text):
+        """
+        将一次请求的token用量累加到stats
+        服务端未返回usage时（部分兼容服务的流式输出）按本地计数估算
+        """
+        if stats is None:
+            return
+        if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+            stats.record_usage(model, usage.prompt_tokens, usage.completion_tokens or 0)
+        else:
+            prompt_tokens = sum(count_tokens(text) for text in prompt_texts)
+            stats.record_usage(model, prompt_tokens, count_tokens(completion_text or ""))
+
+    def focus_document(self, document_text, sections=None):
+        """
+        按提取时生成的章节索引整理发送给AI的原文：章节标题改为Markdown标题，
+        省略参考文献、致谢、附录等章节（PROMPT_OMIT_SECTIONS），预算内能放入更多正文
+        :param sections: DocumentParser.parse_with_info返回的章节索引，未提供时原样返回
+        """
+        if not sections:
+            return document_text
+        return render_sections(document_text, sections, self.omit_sections)
+
+    def parse_document(self, document_text, stats=None):
         """
         解析文档内容
         提取：研究主题、数据来源、使用方法、具体结论、创新点
         返回中英双语结果
+        :param stats: CallStats（可选），累加该文档的请求统计
+        """
+        document_text = compact_text(document_text)
+        notes = self.get_document_notes(document_text, stats)
+        system_prompt, user_content = self.build_parse_prompt(document_text, notes, self.budget)
+        return self.call_api(system_prompt, user_content, stats=stats, stage="parse", **self.PARSE_PARAMS)
+
+    def review_document(self, document_text, language="english", stats=None, parse_result=None, revision=None):
+        """
+        审稿文档
+        :param document_text: 文档文本
+        :param language: 审稿语言 ("chinese" 或 "english")
+        :param stats: CallStats（可选），累加该文档的请求统计
+        :param parse_result: AI解析结果（两阶段审稿时提供）
+        :param revision: RevisionContext（修改稿审稿时提供）
+        :return: 审稿意见
+        """
+        system_prompt, user_content = self.prepare_review_prompt(
+            document_text, language, stats, parse_result, revision
+        )
+        return self.call_api(system_prompt, user_content, stats=stats, stage="review", **self.REVIEW_PARAMS)
+
+    def review_document_stream(self, document_text, language="english", resume_text="", stats=None,
+                               parse_result=None, revision=None):
+        """
+        流式审稿
+        :param resume_text: 上次中断时已生成的审稿内容
+        :param parse_result: AI解析结果（两阶段审稿时提供）
+        :param revision: RevisionContext（修改稿审稿时提供）
+        :return: 生成器，逐个产出新增的文本片段
+        """
+        system_prompt, user_content = self.prepare_review_prompt(
+            document_text, language, stats, parse_result, revision
+        )
+        return self.stream_api(
+            system_prompt, user_content, resume_text=resume_text, stats=stats, stage="review", **self.REVIEW_PARAMS
+        )
+
+    def prepare_review_prompt(self, document_text, language, stats=None, parse_result=None, revision=None):
+        """
+        构建审稿请求：提供revision时只使用修改内容、上一轮审稿意见和作者回复信；
+        提供parse_result时使用解析结果+关键章节原文，否则使用全文（长文档为全文笔记）
+        原文本身不超过片段预算时直接使用全文
+        :return: (system_prompt, user_content)
+        """
+        if revision is not None:
+            return self.build_revision_prompt(revision, language, self.budget, self.omit_sections)
+        document_text = compact_text(document_text)
+        if parse_result and count_tokens(document_text) > self.review_excerpt_tokens:
+            return self.build_compact_review_prompt(
+                document_text, parse_result, language, self.review_excerpt_tokens
+            )
+        notes = self.get_document_notes(document_text, stats)
+        return self.build_review_prompt(document_text, language, notes, self.budget)
+
+    def uses_compact_review(self, document_text):
+        """该文档是否进行两阶段审稿（原文超出片段预算时才有意义）"""
+        return self.compact_review and count_tokens(compact_text(document_text)) > self.review_excerpt_tokens
+
+    def review_input_tokens(self, document_text, language, parse_result=None, revision=None):
+        """
+        估算审稿请求的输入token数（用于比较两阶段审稿、修改稿审稿与全文审稿）
+        长文档的全文模式按直接发送的预算上限计算
+        """
+        document_text = compact_text(document_text)
+        if revision is not None:
+            system_prompt, user_content = self.build_revision_prompt(
+                revision, language, self.budget, self.omit_sections
+            )
+        elif parse_result and count_tokens(document_text) > self.review_excerpt_tokens:
+            system_prompt, user_content = self.build_compact_review_prompt(
+                document_text, parse_result, language, self.review_excerpt_tokens
+            )
+        else:
+            system_prompt, user_content = self.build_review_prompt(document_text, language, None, self.budget)
+        return count_tokens(system_prompt) + count_tokens(user_content)
+
+    def is_long_document(self, document_text):
+        """是否启用长文档分块分析（全文超出单次请求的原文预算）"""
+        return self.long_document_mode and count_tokens(document_text) > self.direct_document_tokens
+
+    @classmethod
+    def direct_document_budget(cls, budget):
+        """解析和审稿请求中均可放入的原文token数（取各提示词下的最小值）"""
+        return min(
+            budget.document_budget(cls.build_parse_prompt("")[0], cls.PARSE_PARAMS["max_tokens"]),
+            budget.document_budget(cls.build_review_prompt("", "chinese")[0], cls.REVIEW_PARAMS["max_tokens"]),
+            budget.document_budget(cls.build_review_prompt("", "english")[0], cls.REVIEW_PARAMS["max_tokens"]),
+        )
+
+    def get_document_notes(self, document_text, stats=None):
+        """长文档返回全文分块阅读笔记，普通文档返回None"""
+        if not self.is_long_document(document_text):
+            return None
+        return self.long_document_notes.get(document_text, lambda text: self.analyze_chunks(text, stats))
+
+    def analyze_chunks(self, document_text, stats=None):
+        """
+        分块阶段：按章节边界切分全文，并行生成每块的阅读笔记
+        :return: 按原文顺序拼接的阅读笔记
+        """
+        chunks = chunk_text(document_text, min(self.chunk_tokens, self.direct_document_tokens))
+        print(f"长文档模式：全文 {len(document_text)} 字符，切分为 {len(chunks)} 块并行分析")
+
+        def analyze(index):
+            user_content = f"Part {index + 1} of {len(chunks)} of the paper:\n\n{chunks[index]}"
+            # 各文档的分块请求共用同一组名额，多个长文档同时处理时总并发仍受REVIEW_IO_WORKERS限制
+            with self.chunk_slots:
+                return self.call_api(CHUNK_SYSTEM_PROMPT, user_content, stats=stats, stage="chunk",
+                                     **self.CHUNK_PARAMS)
+
+        with ThreadPoolExecutor(max_workers=self.map_workers) as pool:
+            results = list(pool.map(analyze, range(len(chunks))))
+
+        return self.join_chunk_notes(chunks, results)
+
+    @staticmethod
+    def join_chunk_notes(chunks, results):
+        """将各块笔记按原文顺序拼接，并标注每块的起始章节"""
+        parts = []
+        for index, (chunk, notes) in enumerate(zip(chunks, results)):
+            title = split_sections(chunk)[0][0] or "(continued)"
+            parts.append(f"### Part {index + 1}/{len(chunks)} — {title}\n{notes.strip()}")
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def build_parse_prompt(document_text, notes=None, budget=None):
+        """
+        构建AI解析请求的提示词
+        :param notes: 长文档的全文分块阅读笔记（可选）
+        :param budget: TokenBudget，提供时按token预算截断原文，否则截取前15000字符
+        :return: (system_prompt, user_content)
         """
         system_prompt = """你是一位资深的学术论文分析专家。你的任务是仔细阅读学术论文，并提取关键信息。
 
@@ -92,16 +489,30 @@ class AIClient:
 3. 如果某些信息在文档中不明确，请说明"文档中未明确提及"
 """
 
-        user_content = f"请分析以下学术文档内容：\n\n{document_text[:15000]}"  # 限制文本长度
+        if notes:
+            user_content = (
+                "该文档篇幅较长，以下是按原文顺序覆盖全文的分块阅读笔记，以及论文开头部分的原文。"
+                "请基于全文笔记进行分析：\n\n"
+                f"## 全文阅读笔记\n\n{notes}\n\n"
+                f"## 论文开头原文\n\n{document_text[:4000]}"
+            )
+        else:
+            if budget:
+                document_text = budget.fit_document(document_text, system_prompt, AIClient.PARSE_PARAMS["max_tokens"])
+            else:
+                document_text = document_text[:15000]  # 限制文本长度
+            user_content = f"请分析以下学术文档内容：\n\n{document_text}"
 
-        return self.call_api(system_prompt, user_content, temperature=0.3, max_tokens=3000)
+        return system_prompt, user_content
 
-    def review_document(self, document_text, language="english"):
+    @staticmethod
+    def build_review_prompt(document_text, language="english", notes=None, budget=None):
         """
-        审稿文档
-        :param document_text: 文档文本
+        构建AI审稿请求的提示词
         :param language: 审稿语言 ("chinese" 或 "english")
-        :return: 审稿意见
+        :param notes: 长文档的全文分块阅读笔记（可选）
+        :param budget: TokenBudget，提供时按token预算截断原文，否则截取前15000字符
+        :return: (system_prompt, user_content)
         """
         if language.lower() == "chinese":
             system_prompt = """你是一位在本领域有15年以上研究经验的资深审稿人，曾担任多个SSCI/SCI期刊的编委。你的审稿风格严谨但富有建设性，注重细节和学术规范，擅长从理论贡献、方法严谨性和实践价值等多维度评估论文。
@@ -252,9 +663,141 @@ Review Format:
 *Note: These comments reflect this reviewer's professional judgment and are provided for the editor's and authors' consideration.*
 """
 
-        user_content = f"Please review the following academic document:\n\n{document_text[:15000]}"
+        if notes:
+            user_content = (
+                "This paper is too long to include verbatim. Below are section-by-section reading notes "
+                "that cover the full paper in order, followed by the opening of the paper. "
+                "Base your review on the full paper as captured by these notes, including methods, results, "
+                "robustness checks and limitations:\n\n"
+                f"## Full-Paper Reading Notes\n\n{notes}\n\n"
+                f"## Opening of the Paper\n\n{document_text[:4000]}"
+            )
+        else:
+            if budget:
+                document_text = budget.fit_document(document_text, system_prompt, AIClient.REVIEW_PARAMS["max_tokens"])
+            else:
+                document_text = document_text[:15000]
+            user_content = f"Please review the following academic document:\n\n{document_text}"
+
+        return system_prompt, user_content
+
+    @staticmethod
+    def build_compact_review_prompt(document_text, parse_result, language="english", excerpt_tokens=6000):
+        """
+        构建两阶段审稿的提示词
+        系统提示词与全文审稿完全相同且放在最前面，便于服务端复用提示词前缀缓存；
+        用户内容为AI解析得到的结构化信息加上关键章节的原文片段
+        :param parse_result: AI解析结果
+        :param excerpt_tokens: 原文片段的token上限
+        :return: (system_prompt, user_content)
+        """
+        system_prompt, _ = AIClient.build_review_prompt("", language)
+        excerpts = select_sections(document_text, excerpt_tokens)
+        user_content = (
+            "Please review the following academic paper. A first-pass analysis has already extracted its "
+            "research topic, data, methods, conclusions and claimed innovations; verify these claims against "
+            "the excerpts of the original text that follow (title and abstract, methods, results, discussion "
+            "and conclusions), and base your judgement on the original text wherever the two differ.\n\n"
+            f"## Structured Analysis (first pass)\n\n{parse_result.strip()}\n\n"
+            f"## Excerpts of the Original Paper\n\n{excerpts}"
+        )
+        return system_prompt, user_content
+
+    @staticmethod
+    def build_revision_prompt(revision, language="english", budget=None, omit=()):
+        """
+        构建修改稿审稿的提示词
+        用户内容为上一轮审稿意见、作者回复信和按章节对比得到的修改内容（未修改的章节只列出标题）
+        :param revision: RevisionContext
+        :param budget: TokenBudget，提供时回复信不超过原文预算的三分之一，修改内容截断到剩余预算内
+        :param omit: 省略的章节类别（PROMPT_OMIT_SECTIONS），其修改只列出标题
+        :return: (system_prompt, user_content)
+        """
+        if language.lower() == "chinese":
+            system_prompt = """你是一位资深审稿人，上一轮曾审阅过这篇论文并提出了修改意见。现在作者提交了修改稿和回复信。你将看到：你上一轮的审稿意见、作者的回复信，以及修改稿与上一版相比按章节整理的修改内容（未修改的章节只列出标题）。
+
+审稿要求：
+1. 逐条核对上一轮的每一条主要意见和修改要求：作者是否回应、回复信中的说法是否在修改内容中真正落实、修改是否充分
+2. 评价新增或改写的内容本身是否严谨，是否引入了新的问题
+3. 回复信声称已修改但修改内容中找不到对应改动的，要明确指出
+4. 只针对修改情况发表意见，不要重复上一轮已经提出且作者已妥善解决的问题
+5. 使用第一人称，语气专业、具体、有建设性
+
+审稿格式：
+
+## 修改稿审稿意见
+
+### 一、对上一轮意见的回应情况
+[逐条列出上一轮的主要意见，注明：已解决 / 部分解决 / 未解决，并说明依据]
+
+### 二、修改内容评价
+[评价新增和改写内容的质量]
+
+### 三、新发现的问题
+[修改中引入的新问题，或上一轮未注意到但现在需要处理的问题；没有时写"无"]
+
+## 审稿建议
+**决定**：[接受/小修后接受/大修后再审/拒稿]
+
+**主要理由**：
+[用100-200字说明作出此决定的核心考量]
+
+**仍需修改**（如适用）：
+1. [具体的修改要求1]
+2. [具体的修改要求2]
+...
+"""
+        else:
+            system_prompt = """You are a senior reviewer who reviewed the previous version of this paper and requested revisions. The authors have now submitted a revised manuscript and a response letter. You will see: your previous review, the authors' response letter, and the changes between the previous and the revised version, organised by section (unchanged sections are listed by title only).
+
+Review Requirements:
+1. Check every main concern and revision request from the previous round: did the authors respond, are the claims in the response letter actually reflected in the changes, and is the revision sufficient
+2. Evaluate whether the new or rewritten material is itself rigorous and whether it introduces new problems
+3. Explicitly point out any change claimed in the response letter that cannot be found in the changes
+4. Comment on the revision only; do not repeat earlier points that the authors have adequately resolved
+5. Use the first person and keep the tone professional, specific and constructive
+
+Review Format:
+
+## Review of the Revised Manuscript
+
+### 1. Response to Previous Comments
+[List each main comment from the previous round and mark it Resolved / Partially resolved / Not resolved, with the evidence]
+
+### 2. Assessment of the Changes
+[Evaluate the quality of the new and rewritten material]
+
+### 3. New Issues
+[Problems introduced by the revision, or issues that now need attention; write "None" if there are none]
+
+## Recommendation
+**Decision**: [Accept / Minor Revision / Major Revision / Reject]
+
+**Primary Rationale**:
+[In 100-200 words, explain the core considerations underlying your decision]
 
-        return self.call_api(system_prompt, user_content, temperature=0.6, max_tokens=6000)
+**Remaining Revision Requirements** (if applicable):
+1. [Specific requirement 1]
+2. [Specific requirement 2]
+...
+"""
+
+        letter = revision.response_letter.strip() if revision.response_letter else ""
+        changes = revision.render_changes(omit)
+        if budget:
+            available = budget.document_budget(system_prompt, AIClient.REVIEW_PARAMS["max_tokens"])
+            available -= count_tokens(revision.previous_review)
+            letter = truncate_to_tokens(letter, max(available // 3, 0))
+            changes = truncate_to_tokens(changes, max(available - count_tokens(letter), 0))
+
+        user_content = (
+            f"The manuscript below is a revision of a paper I reviewed before (review{revision.previous_number}, "
+            f"{revision.previous_file}).\n\n"
+            f"## My Previous Review\n\n{revision.previous_review.strip()}\n\n"
+            f"## Authors' Response Letter\n\n{letter or '(The authors did not provide a response letter.)'}\n\n"
+            f"## Changes in the Revised Manuscript (by section)\n\n{changes}"
+        )
+        return system_prompt, user_content
 
 
 def test_ai_client():
@@ -0,0 +1,310 @@
+"""
+离线批处理模块
+将所有待处理文档的AI解析与AI审稿请求写入OpenAI Batch API格式的JSONL文件，
+提交到任意兼容的批处理端点，轮询完成后按custom_id把结果写回response/reviewN/
+"""
+
+import json
+import time
+from pathlib import Path
+from document_parser import DocumentParser
+from job_journal import JobJournal
+from response_cache import ResponseCache
+from token_budget import compact_text
+from transport import CallStats
+
+# 批处理结束状态（expired/cancelled时输出文件中仍可能包含已完成的部分结果）
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+# 批处理请求阶段对应的处理日志阶段和结果文件
+JOURNAL_STAGES = {"parse": "parsed", "review": "reviewed"}
+FILE_LABELS = {"parse": "解析文件", "review": "审稿文件"}
+
+
+class BatchReviewRunner:
+    """批处理审稿"""
+
+    def __init__(self, review_system, poll_interval=60):
+        """
+        :param review_system: ReviewSystem实例（提供folder_manager、ai_client和审稿语言）
+        :param poll_interval: 轮询间隔（秒）
+        """
+        self.review_system = review_system
+        self.folder_manager = review_system.folder_manager
+        self.ai_client = review_system.ai_client
+        self.poll_interval = poll_interval
+
+        self.batch_dir = self.folder_manager.response_dir / "batches"
+        self.batch_dir.mkdir(exist_ok=True)
+
+    def prepare(self, files):
+        """
+        提取文本并生成批处理输入文件
+        每个文档分配独立的review文件夹，生成 reviewN:parse 和 reviewN:review 两条请求
+        :return: 状态字典（同时保存到 response/batches/<名称>.json）
+        """
+        name = time.strftime("batch_%Y%m%d_%H%M%S")
+        # 同一秒内再次准备时不覆盖已有批处理的状态文件
+        base_name, index = name, 1
+        while self.state_path(name).exists() or (self.batch_dir / f"{name}.jsonl").exists():
+            index += 1
+            name = f"{base_name}_{index}"
+        input_path = self.batch_dir / f"{name}.jsonl"
+        state = {
+            "name": name,
+            "input_file": str(input_path),
+            "language": self.review_system.review_language,
+            "batch_id": None,
+            "jobs": {},
+            "requests": {},
+        }
+
+        with open(input_path, 'w', encoding='utf-8') as f:
+            # 与流水线相同：分配review编号、建立处理日志并在材料目录中标记为处理中，上次未完成的文档沿用原编号
+            for job in self.review_system.create_jobs(files):
+                file_path = job.file_path
+                job_id = f"review{job.review_number}"
+                pending = self.pending_batch(job.journal)
+                if pending:
+                    print(f"⚠ [{file_path.name}] 已在未完成的批处理 {pending} 中（{job_id}），跳过")
+                    continue
+
+                try:
+                    full_text, parse_info = DocumentParser.parse_with_info(file_path)
+                    job.journal.mark("extracted", full_text)
+                    document_text = compact_text(self.ai_client.focus_document(full_text, parse_info["sections"]))
+                except Exception as e:
+                    print(f"❌ [{file_path.name}] 文档解析失败: {e}")
+                    continue
+
+                linked = False
+                if not job.journal.is_done("parsed"):
+                    # 检查失败只影响该文档：按非重复处理，照常加入批处理
+                    try:
+                        linked = self.review_system.check_near_duplicate(
+                            file_path, full_text, job.review_number, job.response_review_path, job.journal,
+                            file_path.name
+                        )
+                    except Exception as e:
+                        print(f"⚠ [{file_path.name}] 近似重复检查失败: {e}，按新稿件提交")
+                if linked:
+                    # 已关联到原审稿结果，不加入批处理
+                    self.move_job(file_path, job.material_review_path, job.journal)
+                    continue
+
+                # 上次运行中已完成的阶段不再提交
+                stages = [stage for stage in FILE_LABELS if not job.journal.is_done(JOURNAL_STAGES[stage])]
+                if not stages:
+                    self.move_job(file_path, job.material_review_path, job.journal)
+                    continue
+                state["jobs"][job_id] = {
+                    "file": str(file_path),
+                    "review_number": job.review_number,
+                    "material": str(job.material_review_path),
+                    "response": str(job.response_review_path),
+                    "parse": "parse" not in stages,
+                    "review": "review" not in stages,
+                    "moved": False,
+                }
+                job.journal.data["batch"] = name
+                job.journal.save()
+
+                prompts = {
+                    "parse": self.ai_client.build_parse_prompt(document_text, None, self.ai_client.budget)
+                    + (self.ai_client.PARSE_PARAMS,),
+                    "review": self.ai_client.build_review_prompt(
+                        document_text, state["language"], None, self.ai_client.budget
+                    ) + (self.ai_client.REVIEW_PARAMS,),
+                }
+                for stage in stages:
+                    system_prompt, user_content, params = prompts[stage]
+                    custom_id = f"{job_id}:{stage}"
+                    body, cache_key = self.build_body(system_prompt, user_content, stage=stage, **params)
+                    f.write(json.dumps({
+                        "custom_id": custom_id,
+                        "method": "POST",
+                        "url": "/v1/chat/completions",
+                        "body": body,
+                    }, ensure_ascii=False) + "\n")
+                    state["requests"][custom_id] = cache_key
+
+                print(f"✓ [{file_path.name}] 已加入批处理（{job_id}）")
+
+        self.save_state(state)
+        return state
+
+    def build_body(self, system_prompt, user_content, temperature, max_tokens, stage=None):
+        """
+        构建单条chat/completions请求体（与call_api使用相同的token预算）
+        批处理任务不能中途切换模型，使用该阶段的首选模型
+        :return: (请求体, 响应缓存键)
+        """
+        user_content, max_tokens = self.ai_client.budget.fit_request(system_prompt, user_content, max_tokens)
+        model = self.ai_client.router.primary(stage)
+        body = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content}
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        cache_key = ResponseCache.make_key(
+            model, self.ai_client.base_url, system_prompt, user_content, temperature, max_tokens
+        )
+        return body, cache_key
+
+    def submit(self, state):
+        """上传输入文件并创建批处理任务"""
+        client = self.ai_client.client
+        with open(state["input_file"], 'rb') as f:
+            input_file = client.files.create(file=f, purpose="batch")
+
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        state["batch_id"] = batch.id
+        self.save_state(state)
+        print(f"✓ 批处理已提交: {batch.id}（{len(state['requests'])} 条请求）")
+        return batch
+
+    def poll(self, state):
+        """轮询批处理状态直到结束"""
+        client = self.ai_client.client
+        while True:
+            batch = client.batches.retrieve(state["batch_id"])
+            counts = batch.request_counts
+            if counts:
+                print(f"  批处理状态: {batch.status}（完成 {counts.completed}/{counts.total}，失败 {counts.failed}）")
+            else:
+                print(f"  批处理状态: {batch.status}")
+
+            if batch.status in TERMINAL_STATUSES:
+                return batch
+            time.sleep(self.poll_interval)
+
+    def apply_results(self, state, batch):
+        """
+        下载输出文件，按custom_id将结果写回对应的review文件夹
+        已写入的结果不会重复写入；解析与审稿都完成的文档移动到material/reviewN/
+        """
+        client = self.ai_client.client
+        journals = {job_id: JobJournal.load(job["response"]) for job_id, job in state["jobs"].items()}
+
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+
+            content = client.files.content(file_id).text
+            for line in content.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                custom_id = record.get("custom_id", "")
+                job_id, _, stage = custom_id.partition(":")
+                job = state["jobs"].get(job_id)
+                if job is None or stage not in FILE_LABELS or job[stage]:
+                    continue
+                journal = journals.get(job_id)
+                if journal and journal.is_done(JOURNAL_STAGES[stage]):
+                    # 批处理期间已由普通运行完成该阶段，不覆盖已有结果
+                    job[stage] = True
+                    continue
+
+                response = record.get("response") or {}
+                if response.get("status_code") != 200:
+                    error = record.get("error") or response.get("body", {}).get("error")
+                    print(f"❌ [{custom_id}] 请求失败: {error}")
+                    continue
+
+                text = response["body"]["choices"][0]["message"]["content"]
+                usage = response["body"].get("usage") or {}
+                stats = CallStats()
+                stats.record_usage(
+                    response["body"].get("model", ""), usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+                )
+                file_name = f"{job_id}_{FILE_LABELS[stage]}.txt"
+                self.folder_manager.save_response(text, file_name, Path(job["response"]), stats)
+                if journal:
+                    journal.mark(JOURNAL_STAGES[stage], text, file_name, stats.routing())
+                job[stage] = True
+
+                # 写入响应缓存，之后同步运行同一文档时可直接命中
+                if self.ai_client.cache and text:
+                    self.ai_client.cache.set(state["requests"][custom_id], text)
+
+                print(f"✓ [{custom_id}] 结果已保存: {file_name}")
+
+        for job_id, job in state["jobs"].items():
+            journal = journals.get(job_id)
+            if journal and journal.is_done("moved"):
+                job["moved"] = True
+            if job["parse"] and job["review"] and not job["moved"]:
+                try:
+                    self.move_job(Path(job["file"]), Path(job["material"]), journal)
+                    job["moved"] = True
+                except Exception as e:
+                    print(f"❌ [{job_id}] 文件移动失败: {e}")
+
+        # 批处理已结束，未完成的文档可重新提交
+        state["finished"] = True
+        self.save_state(state)
+        return state
+
+    def move_job(self, file_path, material_review_path, journal=None):
+        """移动已完成的文档并记录到处理日志"""
+        self.folder_manager.move_file_to_review(file_path, material_review_path)
+        if journal:
+            journal.mark("moved")
+
+    def pending_batch(self, journal):
+        """
+        文档是否已在尚未写回结果的批处理中
+        :return: 批处理名称，不在未完成的批处理中时返回None
+        """
+        name = journal.data.get("batch")
+        if not name:
+            return None
+        try:
+            state = self.load_state(self.state_path(name))
+        except (OSError, ValueError):
+            return None
+        job = state["jobs"].get(f"review{journal.review_number}")
+        if state.get("finished") or job is None or job["moved"]:
+            return None
+        return name
+
+    def run(self, files=None, state_path=None):
+        """
+        执行批处理：准备并提交（或从状态文件恢复），轮询，写回结果
+        :param files: 待处理文件列表（新建批处理时使用）
+        :param state_path: 已提交批处理的状态文件（恢复时使用）
+        :return: 状态字典
+        """
+        if state_path:
+            state = self.load_state(state_path)
+            self.review_system.review_language = state["language"]
+        else:
+            state = self.prepare(files)
+            if not state["requests"]:
+                print("❌ 没有可提交的请求")
+                return state
+            self.submit(state)
+
+        print(f"状态文件: {self.state_path(state['name'])}（中断后可用 --resume-batch 恢复）")
+        batch = self.poll(state)
+        return self.apply_results(state, batch)
+
+    def state_path(self, name):
+        return self.batch_dir / f"{name}.json"
+
+    def save_state(self, state):
+        with open(self.state_path(state["name"]), 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def load_state(state_path):
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
@@ -0,0 +1,6 @@
+"""
+离线基准测试
+- mock_server: 本地模拟的OpenAI兼容服务（chat/completions）
+- corpus: 生成指定页数的合成PDF/DOCX文档
+- run_benchmark: 端到端运行ReviewSystem并统计吞吐量、各阶段耗时和内存峰值
+"""
@@ -0,0 +1,229 @@
+"""
+模拟的OpenAI兼容服务
+提供 POST /v1/chat/completions（支持stream），可配置首token延迟、生成速度、错误注入、429限流和偶发的首token停顿，
+用于在没有API密钥的情况下测量吞吐量和回归
+
+单独运行：
+    python -m benchmark.mock_server --port 8000 --latency 0.5 --token-rate 300 --rate-limit-rate 0.05
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from token_budget import count_tokens
+
+
+class MockOpenAIServer:
+    """本地模拟服务（后台线程运行）"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, token_rate=200, output_tokens=300,
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after=1.0, stall_rate=0.0, stall_seconds=5.0,
+                 seed=None):
+        """
+        :param port: 监听端口，0表示自动分配
+        :param latency: 首token延迟（秒）
+        :param token_rate: 生成速度（tokens/s）
+        :param output_tokens: 每次回复的token数（不超过请求的max_tokens）
+        :param error_rate: 返回500错误的比例
+        :param rate_limit_rate: 返回429限流的比例
+        :param retry_after: 429响应中Retry-After头的秒数
+        :param stall_rate: 首token前额外停顿的请求比例（模拟长尾延迟）
+        :param stall_seconds: 停顿秒数
+        """
+        self.latency = latency
+        self.token_rate = token_rate
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.random = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "completed": 0, "errors": 0, "rate_limited": 0,
+                      "stalled": 0, "cancelled": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+        handler = type("MockHandler", (_MockHandler,), {"server_state": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def pick_failure(self):
+        """按配置的比例决定本次请求是否返回429或500"""
+        with self._lock:
+            roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+    def pick_stall(self):
+        """按配置的比例决定本次请求首token前是否停顿"""
+        with self._lock:
+            return self.random.random() < self.stall_rate
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """请求处理（server_state 为 MockOpenAIServer 实例）"""
+
+    server_state = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        state = self.server_state
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            body = {}
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown endpoint {self.path}", "type": "not_found"}})
+            return
+
+        state.count("requests")
+        failure = state.pick_failure()
+        if failure == 429:
+            state.count("rate_limited")
+            self._send_json(429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+                            {"Retry-After": f"{state.retry_after:g}"})
+            return
+        if failure == 500:
+            state.count("errors")
+            self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return
+
+        messages = body.get("messages", [])
+        prompt_tokens = sum(count_tokens(str(message.get("content", ""))) for message in messages)
+        completion_tokens = max(1, min(state.output_tokens, int(body.get("max_tokens") or state.output_tokens)))
+        words = [f"word{index % 97}" for index in range(completion_tokens)]
+        state.count("prompt_tokens", prompt_tokens)
+        state.count("completion_tokens", completion_tokens)
+
+        latency = state.latency
+        if state.pick_stall():
+            state.count("stalled")
+            latency += state.stall_seconds
+        time.sleep(latency)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "mock")
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+
+        if body.get("stream"):
+            try:
+                self._stream(completion_id, model, words, usage, body)
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端提前关闭连接（如对冲请求中落败的一方）
+                state.count("cancelled")
+                return
+        else:
+            time.sleep(completion_tokens / state.token_rate)
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+        state.count("completed")
+
+    def _stream(self, completion_id, model, words, usage, body):
+        """以SSE格式逐段返回（每10个token一段）"""
+        state = self.server_state
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(choices, extra=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": choices}
+            if extra:
+                chunk.update(extra)
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        step = 10
+        for start in range(0, len(words), step):
+            piece = " ".join(words[start:start + step]) + " "
+            send([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            time.sleep(len(words[start:start + step]) / state.token_rate)
+
+        send([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (body.get("stream_options") or {}).get("include_usage"):
+            send([], {"usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟的OpenAI兼容服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.2, help="首token延迟（秒）")
+    parser.add_argument("--token-rate", type=float, default=200, help="生成速度（tokens/s）")
+    parser.add_argument("--output-tokens", type=int, default=300, help="每次回复的token数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回500错误的比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回429限流的比例")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429响应的Retry-After秒数")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="首token前额外停顿的请求比例")
+    parser.add_argument("--stall-seconds", type=float, default=5.0, help="停顿秒数")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(args.host, args.port, args.latency, args.token_rate, args.output_tokens,
+                              args.error_rate, args.rate_limit_rate, args.retry_after,
+                              args.stall_rate, args.stall_seconds)
+    print(f"✓ 模拟服务已启动: {server.url}（Ctrl+C 退出）")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n统计: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+端到端基准测试
+在临时工作目录中生成合成文档，启动本地模拟服务，用ReviewSystem完整处理所有文档，报告：
+- 吞吐量（文档/分钟）
+- 各阶段耗时的p50/p99（文本提取、AI解析、审稿、移动文件、单文档总耗时）
+- 每页文本提取秒数
+- 内存峰值（主进程与提取子进程）
+
+用法（在项目根目录运行）：
+    python -m benchmark.run_benchmark --docs 20 --pages 12 --latency 0.3 --token-rate 400
+    python -m benchmark.run_benchmark --mode sequential --rate-limit-rate 0.1 --json result.json
+    python -m benchmark.run_benchmark --stall-rate 0.05 --stall-seconds 5 --hedge
+    python -m benchmark.run_benchmark --docs 24 --pages 2 --latency 1.0 --token-rate 5000 --check-hedge-overhead
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmark.corpus import generate_corpus
+from benchmark.mock_server import MockOpenAIServer
+
+
+def percentile(values, pct):
+    """最近秩法计算百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    """主进程与已结束子进程的内存峰值（MB）"""
+    if resource is None:
+        return None, None
+    # ru_maxrss 在Linux上单位为KB，在macOS上为字节
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor
+    return round(self_rss, 1), round(children_rss, 1)
+
+
+class StageTimer:
+    """记录各阶段耗时（多线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = {}
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.durations.setdefault(stage, []).append(seconds)
+
+    def wrap(self, stage, func):
+        """包装函数，记录每次调用的耗时"""
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return timed
+
+
+def run_benchmark(args):
+    """
+    执行一次基准测试
+    :return: 结果字典
+    """
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="review-bench-")).resolve()
+    material_dir = workdir / "material"
+    manifest = generate_corpus(material_dir, args.docs, args.pages, args.words_per_page, args.docx_ratio, args.seed)
+    pages_by_file = {item["file"]: item["pages"] for item in manifest}
+
+    server = MockOpenAIServer(
+        latency=args.latency, token_rate=args.token_rate, output_tokens=args.output_tokens,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+        stall_rate=args.stall_rate, stall_seconds=args.stall_seconds, seed=args.seed
+    ).start()
+
+    os.environ.update({
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": server.url,
+        "OPENAI_MODEL": "mock-model",
+        "AI_CACHE_DIR": str(workdir / ".cache"),
+        "AI_RESPONSE_CACHE": "0",
+        "EXTRACTION_CACHE": "1" if args.extraction_cache else "0",
+        "AI_STREAM": "1" if args.stream else "0",
+        "AI_HEDGE": "1" if args.hedge else "0",
+    })
+
+    # 项目模块在设置环境变量之后导入（FolderManager以当前目录为根目录）
+    from main import ReviewSystem
+    from pipeline import ReviewPipeline
+
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    log_path = workdir / "benchmark.log"
+    timer = StageTimer()
+    try:
+        with open(log_path, 'w', encoding='utf-8') as log, \
+                contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+            system = ReviewSystem()
+            system.review_language = args.language
+
+            start_time = time.perf_counter()
+            document_done = {}
+
+            def record_move(move):
+                def timed_move(file_path, review_folder):
+                    result = timer.wrap("move", move)(file_path, review_folder)
+                    document_done[Path(file_path).name] = time.perf_counter() - start_time
+                    return result
+                return timed_move
+
+            system.ai_client.parse_document = timer.wrap("ai_parse", system.ai_client.parse_document)
+            system.ai_client.review_document = timer.wrap("ai_review", system.ai_client.review_document)
+            system.stream_review = timer.wrap("ai_review", system.stream_review)
+            system.folder_manager.move_file_to_review = record_move(system.folder_manager.move_file_to_review)
+
+            files = system.folder_manager.get_unprocessed_files()
+            jobs = system.create_jobs(files)
+            if args.mode == "pipeline":
+                ReviewPipeline(system).run(jobs)
+                succeeded = sum(1 for job in jobs if job.success)
+            else:
+                succeeded = sum(
+                    1 for job in jobs
+                    if system.process_document(job.file_path, job.review_number, job.material_review_path,
+                                               job.response_review_path, job.journal)
+                )
+            wall_seconds = time.perf_counter() - start_time
+            hedge_summary = system.ai_client.hedger.summary()
+            hedged_requests = system.ai_client.hedger.hedged
+    finally:
+        os.chdir(previous_cwd)
+        server.stop()
+
+    # 文本提取耗时来自解析日志（提取在子进程中进行）
+    extract_seconds_per_page = []
+    parse_log = workdir / ".cache" / "parse_log.jsonl"
+    if parse_log.exists():
+        for line in parse_log.read_text(encoding='utf-8').splitlines():
+            record = json.loads(line)
+            timer.add("extract", record["seconds"])
+            pages = pages_by_file.get(record.get("file"))
+            if pages:
+                extract_seconds_per_page.append(record["seconds"] / pages)
+    for seconds in document_done.values():
+        timer.add("document", seconds)
+
+    self_rss, children_rss = peak_rss_mb()
+    result = {
+        "mode": args.mode,
+        "stream": args.stream,
+        "hedge": hedge_summary,
+        "hedged_requests": hedged_requests,
+        "documents": len(manifest),
+        "succeeded": succeeded,
+        "pages_per_document": args.pages,
+        "wall_seconds": round(wall_seconds, 2),
+        "documents_per_minute": round(len(manifest) / wall_seconds * 60, 2) if wall_seconds else None,
+        "stages": {
+            stage: {
+                "count": len(values),
+                "p50": round(percentile(values, 50), 3),
+                "p99": round(percentile(values, 99), 3),
+            }
+            for stage, values in sorted(timer.durations.items())
+        },
+        "extract_seconds_per_page": round(percentile(extract_seconds_per_page, 50), 4)
+        if extract_seconds_per_page else None,
+        "peak_rss_mb": self_rss,
+        "peak_rss_children_mb": children_rss,
+        "server": dict(server.stats),
+        "workdir": str(workdir),
+    }
+
+    if not args.keep and not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+        result["workdir"] = None
+    return result
+
+
+def print_report(result):
+    """打印结果"""
+    print(f"\n{'=' * 60}")
+    print(f"基准测试结果（{result['mode']}，{'流式' if result['stream'] else '非流式'}）")
+    print(f"{'=' * 60}")
+    print(f"文档: {result['succeeded']}/{result['documents']} 成功，每个 {result['pages_per_document']} 页")
+    print(f"总耗时: {result['wall_seconds']} 秒")
+    print(f"吞吐量: {result['documents_per_minute']} 文档/分钟")
+    if result["extract_seconds_per_page"] is not None:
+        print(f"文本提取: {result['extract_seconds_per_page']} 秒/页（p50）")
+    if result["peak_rss_mb"] is not None:
+        print(f"内存峰值: 主进程 {result['peak_rss_mb']} MB，提取子进程 {result['peak_rss_children_mb']} MB")
+
+    print(f"\n{'阶段':<12}{'次数':>6}{'p50(秒)':>12}{'p99(秒)':>12}")
+    for stage, values in result["stages"].items():
+        print(f"{stage:<12}{values['count']:>6}{values['p50']:>12}{values['p99']:>12}")
+
+    server = result["server"]
+    print(f"\n模拟服务: 请求 {server['requests']} 次，429 {server['rate_limited']} 次，"
+          f"500 {server['errors']} 次，输入 {server['prompt_tokens']} tokens，输出 {server['completion_tokens']} tokens")
+    if server["stalled"] or server["cancelled"]:
+        print(f"首token停顿 {server['stalled']} 次，客户端取消 {server['cancelled']} 次")
+    if result["hedge"]:
+        print(result["hedge"])
+    if result["workdir"]:
+        print(f"工作目录: {result['workdir']}")
+
+
+def check_hedge_overhead(args):
+    """
+    对比不启用对冲与启用对冲但不发出对冲请求（预算为0）的吞吐量：
+    所有请求都经过对冲调度，但不应改变并发和耗时
+    :return: 是否在允许的差距内
+    """
+    if args.workdir:
+        print("❌ --check-hedge-overhead 需要两次独立运行，不能与 --workdir 同时使用")
+        return False
+
+    baseline = run_benchmark(argparse.Namespace(**dict(vars(args), hedge=False)))
+    print_report(baseline)
+    # 第一个请求之后即进入对冲调度（等待首token、必要时对冲），预算为0保证不发出对冲请求
+    os.environ.update({"AI_HEDGE_MIN_SAMPLES": "1", "AI_HEDGE_BUDGET": "0"})
+    hedged = run_benchmark(argparse.Namespace(**dict(vars(args), hedge=True)))
+    print_report(hedged)
+
+    ratio = hedged["documents_per_minute"] / baseline["documents_per_minute"]
+    print(f"\n启用对冲（发出 {hedged['hedged_requests']} 个对冲请求）的吞吐量为不启用时的 {ratio:.0%}")
+    if hedged["hedged_requests"] == 0 and ratio < 1 - args.tolerance:
+        print(f"❌ 未发出对冲请求但吞吐量下降超过 {args.tolerance:.0%}，对冲调度限制了并发")
+        return False
+    print("✓ 对冲调度未影响吞吐量")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI审稿系统端到端基准测试（使用本地模拟服务，无需API密钥）")
+    parser.add_argument("--docs", type=int, default=20, help="文档数")
+    parser.add_argument("--pages", type=int, default=12, help="每个文档的页数")
+    parser.add_argument("--words-per-page", type=int, default=500, help="每页词数")
+    parser.add_argument("--docx-ratio", type=float, default=0.25, help="DOCX所占比例")
+    parser.add_argument("--mode", choices=["pipeline", "sequential"], default="pipeline",
+                        help="pipeline: 流水线并发处理；sequential: 逐个process_document")
+    parser.add_argument("--language", choices=["chinese", "english"], default="english")
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=True, help="流式审稿输出")
+    parser.add_argument("--extraction-cache", action="store_true", help="启用文本提取缓存（默认关闭以测量提取耗时）")
+    parser.add_argument("--latency", type=float, default=0.2, help="模拟服务首token延迟（秒）")
+    parser.add_argument("--token-rate", type=float, default=400, help="模拟服务生成速度（tokens/s）")
+    parser.add_argument("--output-tokens", type=int, default=300, help="模拟服务每次回复的token数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟服务返回500的比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="模拟服务返回429的比例")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="429响应的Retry-After秒数")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="模拟服务首token前额外停顿的请求比例")
+    parser.add_argument("--stall-seconds", type=float, default=5.0, help="停顿秒数")
+    parser.add_argument("--hedge", action="store_true", help="启用对冲请求（AI_HEDGE=1）")
+    parser.add_argument("--check-hedge-overhead", action="store_true",
+                        help="分别以不启用对冲和启用对冲（预算为0）运行，吞吐量差距超过--tolerance时返回1")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="--check-hedge-overhead允许的吞吐量下降比例")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="工作目录（默认使用临时目录，结束后删除）")
+    parser.add_argument("--keep", action="store_true", help="保留临时工作目录")
+    parser.add_argument("--json", metavar="PATH", help="将结果写入JSON文件")
+    parser.add_argument("--verbose", action="store_true", help="显示处理过程输出（默认写入工作目录的benchmark.log）")
+    args = parser.parse_args()
+
+    if args.check_hedge_overhead:
+        sys.exit(0 if check_hedge_overhead(args) else 1)
+
+    result = run_benchmark(args)
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"✓ 结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
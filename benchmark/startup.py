@@ -0,0 +1,93 @@
+"""
+启动耗时测试
+在全新的子进程中测量导入各入口模块和创建ReviewSystem（显示标题前的全部初始化）的耗时，
+并按 python -X importtime 列出导入耗时最高的包
+
+用法（在项目根目录运行）：
+    python -m benchmark.startup
+    python -m benchmark.startup --runs 10 --max-ms 300     # 超过阈值时返回非零退出码，可用于CI
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+# (名称, 子进程中执行的代码)
+TARGETS = [
+    ("import main", "import main"),
+    ("import folder_manager", "import folder_manager"),
+    ("import search_results", "import search_results"),
+    ("ReviewSystem()", "import main; main.ReviewSystem()"),
+]
+
+
+def run_python(code, cwd, extra_args=()):
+    """在子进程中执行代码，返回 (耗时秒数, stderr)"""
+    env = dict(os.environ, PYTHONPATH=str(PROJECT_DIR), OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "startup-test"))
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, *extra_args, "-c", code], cwd=cwd, env=env, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{code} 执行失败:\n{result.stderr}")
+    return elapsed, result.stderr
+
+
+def top_imports(cwd, limit):
+    """
+    按 -X importtime 输出汇总各顶层包（含其子模块）自身的导入耗时
+    :return: [(包名, 毫秒)]，按耗时降序
+    """
+    _, stderr = run_python("import main", cwd, ("-X", "importtime"))
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_time, _, name = line[len("import time:"):].split("|")
+        if not self_time.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(self_time) / 1000
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI审稿系统启动耗时测试")
+    parser.add_argument("--runs", type=int, default=5, help="每项测量的次数（取中位数）")
+    parser.add_argument("--top", type=int, default=10, help="列出导入最慢的模块数")
+    parser.add_argument("--max-ms", type=float, help="ReviewSystem()中位耗时上限（毫秒），超过时返回1")
+    args = parser.parse_args()
+
+    # 在空目录中运行，避免material/response中已有的文档影响初始化耗时
+    with tempfile.TemporaryDirectory(prefix="startup_") as workdir:
+        # 预热：编译字节码、建立材料目录和结果库
+        run_python(TARGETS[-1][1], workdir)
+
+        print(f"{'测量项':<26}{'中位数(毫秒)':>14}{'最小值(毫秒)':>14}")
+        medians = {}
+        for name, code in TARGETS:
+            samples = [run_python(code, workdir)[0] * 1000 for _ in range(args.runs)]
+            medians[name] = statistics.median(samples)
+            print(f"{name:<26}{medians[name]:>14.0f}{min(samples):>14.0f}")
+        baseline = statistics.median(run_python("pass", workdir)[0] * 1000 for _ in range(args.runs))
+        print(f"{'python -c pass':<26}{baseline:>14.0f}")
+
+        print("\nimport main 导入耗时最高的包：")
+        for package, milliseconds in top_imports(workdir, args.top):
+            print(f"  {package:<24}{milliseconds:>8.1f} 毫秒")
+
+    if args.max_ms and medians["ReviewSystem()"] > args.max_ms:
+        print(f"\n❌ ReviewSystem() 耗时 {medians['ReviewSystem()']:.0f} 毫秒，超过上限 {args.max_ms:.0f} 毫秒")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
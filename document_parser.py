@@ -1,95 +1,467 @@
 """
 文档解析模块
-支持PDF和Word文档的文本提取
+支持PDF和Word文档的文本提取，其他格式通过parser_backends登记的第三方后端提取
+PDF/Word解析库在首次解析该类文件时才导入
 """
 
+import json
+import multiprocessing
 import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import PyPDF2
-import pdfplumber
-from docx import Document
+from extraction_cache import get_extraction_cache
+from parser_backends import backend_for_extension, get_backend, supported_extensions
+from response_cache import get_cache_dir
+from section_index import build_section_index, docx_heading_level, find_font_headings, find_text_headings, page_layout
 
 
 class DocumentParser:
     """文档解析器"""
 
-    SUPPORTED_EXTENSIONS = ['.pdf', '.docx', '.doc']
+    # 提取逻辑变化时递增，使旧的提取缓存失效
+    PARSER_VERSION = 4
+
+    @staticmethod
+    def backend_version(ext):
+        """返回某类文件所用解析后端的版本标识（用于提取缓存键，只读取发行包版本，不导入解析库）"""
+        tag = backend_for_extension(ext).version_tag()
+        if ext == '.pdf':
+            tag = f"{os.getenv('PDF_BACKEND', 'auto')}_{tag}"
+        return f"v{DocumentParser.PARSER_VERSION}_{tag}"
+
+    @staticmethod
+    def supported_extensions():
+        """支持的扩展名（内置的.pdf、.docx以及第三方后端）"""
+        return supported_extensions()
 
     @staticmethod
     def is_supported(file_path):
         """检查文件是否支持"""
-        ext = Path(file_path).suffix.lower()
-        return ext in DocumentParser.SUPPORTED_EXTENSIONS
+        return get_backend(file_path) is not None
 
     @staticmethod
     def parse_pdf(file_path):
         """
         解析PDF文件
-        优先使用pdfplumber，失败则使用PyPDF2
+        自动选择解析后端，详见extract_pdf
         """
-        text = ""
+        return DocumentParser.extract_pdf(file_path)[0]
 
-        try:
-            # 尝试使用pdfplumber（更好的文本提取效果）
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n\n"
-
-            if text.strip():
-                return text
-        except Exception as e:
-            print(f"pdfplumber解析失败: {e}, 尝试使用PyPDF2")
+    @staticmethod
+    def extract_pdf(file_path):
+        """
+        解析PDF文件并返回后端选择信息
+        PDF_BACKEND=auto（默认）时先用PyPDF2抽样检查文本质量，质量合格直接走PyPDF2快速路径，
+        否则使用pdfplumber（更好的版面分析），失败则回退PyPDF2
+        :return: (text, info)，info包含所用后端、抽样质量和章节索引
+        """
+        mode = os.getenv("PDF_BACKEND", "auto")
+        info = {"backend": None, "quality": None}
+
+        if mode == "auto":
+            try:
+                quality = DocumentParser.sample_pdf_quality(file_path)
+                info["quality"] = quality
+                if quality["ok"]:
+                    text, sections = DocumentParser.extract_pdf_pypdf2(file_path)
+                    if text.strip():
+                        info.update(backend="pypdf2", sections=sections)
+                        return text, info
+            except Exception as e:
+                print(f"PyPDF2抽样失败: {e}, 使用pdfplumber")
+
+        if mode != "pypdf2":
+            try:
+                text, sections = DocumentParser.extract_pdf_pdfplumber(file_path)
+                if text.strip():
+                    info.update(backend="pdfplumber", sections=sections)
+                    return text, info
+            except Exception as e:
+                print(f"pdfplumber解析失败: {e}, 尝试使用PyPDF2")
 
         try:
             # 备用方案：使用PyPDF2
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n\n"
-            return text
+            text, sections = DocumentParser.extract_pdf_pypdf2(file_path)
+            info.update(backend="pypdf2", sections=sections)
+            return text, info
         except Exception as e:
             raise Exception(f"PDF解析失败: {e}")
 
+    @staticmethod
+    def extract_pdf_pdfplumber(file_path):
+        """
+        使用pdfplumber提取全文（长文档分页并行），同时按字号和粗体识别章节标题
+        :return: (text, sections)
+        """
+        import pdfplumber
+
+        with pdfplumber.open(file_path) as pdf:
+            page_count = len(pdf.pages)
+
+        if page_count < DocumentParser.parallel_page_threshold():
+            pages = list(DocumentParser.iter_pdf_pages_pdfplumber(file_path, layout=True))
+        else:
+            # 长文档：按页分片交给进程池并行提取
+            pages = DocumentParser.extract_pages_parallel(file_path, page_count, layout=True)
+
+        page_texts = [page_text for page_text, _ in pages]
+        text, page_offsets = join_pages(page_texts)
+        headings = (
+            find_font_headings(page_texts, [layout for _, layout in pages], page_offsets)
+            or find_text_headings(text)
+        )
+        return text, build_section_index(text, headings, page_starts(page_offsets))
+
+    @staticmethod
+    def extract_pdf_pypdf2(file_path):
+        """
+        使用PyPDF2提取全文（没有版面信息，按标题文本模式识别章节）
+        :return: (text, sections)
+        """
+        text, page_offsets = join_pages(DocumentParser.iter_pdf_pages_pypdf2(file_path), keep_empty=True)
+        return text, build_section_index(text, find_text_headings(text), page_starts(page_offsets))
+
+    @staticmethod
+    def iter_pdf_pages_pdfplumber(file_path, start=0, end=None, layout=False):
+        """
+        使用pdfplumber逐页生成文本（空页生成空字符串）
+        每页提取后立即释放该页缓存的版面对象，内存占用不随页数增长
+        :param layout: 为True时生成 (文本, page_layout结果)，用于按字号识别章节标题
+        """
+        import pdfplumber
+
+        with pdfplumber.open(file_path) as pdf:
+            for page in pdf.pages[start:end]:
+                try:
+                    page_text = page.extract_text() or ""
+                    yield (page_text, page_layout(page)) if layout else page_text
+                finally:
+                    page.close()
+
+    @staticmethod
+    def iter_pdf_pages_pypdf2(file_path):
+        """使用PyPDF2逐页生成文本"""
+        import PyPDF2
+
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            for page in pdf_reader.pages:
+                yield page.extract_text() or ""
+
+    @staticmethod
+    def iter_pages(file_path, backend=None):
+        """
+        逐页生成文档文本（流式、内存占用有界）
+        调用方可在拿到足够字符后随时停止迭代，剩余页面不会被解析
+        :param backend: PDF后端（"pdfplumber"或"pypdf2"），默认按PDF_BACKEND自动选择
+        """
+        ext = Path(file_path).suffix.lower()
+
+        if ext == '.docx':
+            yield from DocumentParser.iter_blocks(file_path)
+            return
+        if ext != '.pdf':
+            backend = get_backend(file_path)
+            if backend is None:
+                raise ValueError(f"不支持的文件格式: {ext}")
+            # 第三方后端不支持逐页读取，整篇作为一页
+            yield backend.extract(file_path)[0]
+            return
+
+        if backend is None:
+            backend = os.getenv("PDF_BACKEND", "auto")
+            if backend == "auto":
+                # 与extract_pdf一致：PyPDF2无法打开的文件改用pdfplumber
+                try:
+                    quality = DocumentParser.sample_pdf_quality(file_path)
+                    backend = "pypdf2" if quality["ok"] else "pdfplumber"
+                except Exception as e:
+                    print(f"PyPDF2抽样失败: {e}, 使用pdfplumber")
+                    backend = "pdfplumber"
+
+        if backend == "pypdf2":
+            yield from DocumentParser.iter_pdf_pages_pypdf2(file_path)
+        else:
+            yield from DocumentParser.iter_pdf_pages_pdfplumber(file_path)
+
+    @staticmethod
+    def read_text(file_path, max_chars=None):
+        """
+        流式读取文档文本，累计达到max_chars后停止解析后续页面
+        :return: 不超过max_chars的文本
+        """
+        parts = []
+        total = 0
+        for page_text in DocumentParser.iter_pages(file_path):
+            if not page_text:
+                continue
+            parts.append(page_text)
+            total += len(page_text)
+            if max_chars and total >= max_chars:
+                break
+
+        text = "\n\n".join(parts)
+        return text[:max_chars] if max_chars else text
+
+    @staticmethod
+    def sample_pdf_quality(file_path, sample_pages=None):
+        """
+        用PyPDF2抽取均匀分布的若干页，评估文本层质量
+        :return: assess_text_quality的结果
+        """
+        import PyPDF2
+
+        sample_pages = sample_pages or int(os.getenv("PDF_SAMPLE_PAGES", 3))
+
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            page_count = len(pdf_reader.pages)
+            if page_count == 0:
+                return assess_text_quality([])
+
+            sample_count = min(sample_pages, page_count)
+            if sample_count == 1:
+                indexes = [0]
+            else:
+                indexes = sorted({round(i * (page_count - 1) / (sample_count - 1)) for i in range(sample_count)})
+            page_texts = [pdf_reader.pages[i].extract_text() or "" for i in indexes]
+
+        return assess_text_quality(page_texts)
+
+    @staticmethod
+    def parallel_page_threshold():
+        """达到该页数才启用分页并行提取，低于该值沿用串行路径"""
+        return int(os.getenv("PDF_PARALLEL_THRESHOLD", 60))
+
+    @staticmethod
+    def page_workers():
+        """
+        分页并行提取的进程数，默认读取PDF_PAGE_WORKERS
+        未配置时主进程中取CPU核数；在流水线的提取进程中按REVIEW_PARSE_WORKERS个提取进程均分CPU核数，
+        避免每个提取进程各开一个CPU核数大小的进程池
+        """
+        configured = int(os.getenv("PDF_PAGE_WORKERS", 0))
+        if configured:
+            return configured
+        cpu_count = os.cpu_count() or 1
+        if multiprocessing.parent_process() is None:
+            return cpu_count
+        parse_workers = int(os.getenv("REVIEW_PARSE_WORKERS", min(4, cpu_count)))
+        return max(1, cpu_count // max(1, parse_workers))
+
+    @staticmethod
+    def extract_pages_parallel(file_path, page_count, workers=None, layout=False):
+        """
+        将页码范围切分给进程池并行提取，每个进程独立打开PDF
+        返回按原始页序排列的每页结果列表（与串行路径逐页结果一致）
+        :param layout: 同iter_pdf_pages_pdfplumber
+        """
+        workers = workers or DocumentParser.page_workers()
+        if workers <= 1:
+            return list(DocumentParser.iter_pdf_pages_pdfplumber(file_path, layout=layout))
+        slice_count = min(page_count, workers * 2)
+        bounds = [page_count * i // slice_count for i in range(slice_count + 1)]
+        ranges = list(zip(bounds[:-1], bounds[1:]))
+
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # map按提交顺序返回结果，拼接后即为原始页序
+                slices = pool.map(
+                    _extract_pdf_pages, [file_path] * len(ranges), *zip(*ranges), [layout] * len(ranges)
+                )
+                return [page for page_slice in slices for page in page_slice]
+        except Exception as e:
+            print(f"分页并行提取失败: {e}, 改用串行提取")
+            return list(DocumentParser.iter_pdf_pages_pdfplumber(file_path, layout=layout))
+
     @staticmethod
     def parse_docx(file_path):
         """解析Word文档"""
-        try:
-            doc = Document(file_path)
-            text = ""
+        return DocumentParser.extract_docx(file_path)[0]
 
-            # 提取段落文本
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
+    @staticmethod
+    def extract_docx(file_path):
+        """
+        解析Word文档并返回后端信息
+        章节标题按段落样式（Title / Heading N）识别，没有标题样式时按标题文本模式；
+        页码取自Word保存时记录的分页位置（没有记录时不提供页码）
+        :return: (text, info)
+        """
+        from docx import Document
 
-            # 提取表格文本
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        text += cell.text + "\t"
-                    text += "\n"
+        try:
+            parts = []
+            headings = []
+            starts = [(0, 1)]
+            offset = 0
+            for block, paragraph in DocumentParser.iter_docx_blocks(Document(file_path)):
+                if paragraph is not None:
+                    level = docx_heading_level(paragraph)
+                    if level is not None and block.strip():
+                        headings.append((offset, block.strip(), level))
+                    breaks = len(paragraph.rendered_page_breaks)
+                    if breaks:
+                        starts.append((offset + len(block), starts[-1][1] + breaks))
+                parts.append(block)
+                offset += len(block)
 
-            return text
+            text = "".join(parts)
+            sections = build_section_index(
+                text, headings or find_text_headings(text), starts if len(starts) > 1 else None
+            )
+            return text, {"backend": "python-docx", "quality": None, "sections": sections}
         except Exception as e:
             raise Exception(f"Word文档解析失败: {e}")
 
     @staticmethod
-    def parse(file_path):
+    def iter_blocks(file_path):
+        """逐块生成Word文档文本：先逐段落，再逐个表格行"""
+        from docx import Document
+
+        for block, _ in DocumentParser.iter_docx_blocks(Document(file_path)):
+            yield block
+
+    @staticmethod
+    def iter_docx_blocks(doc):
+        """
+        逐块生成已打开的Word文档的文本
+        :return: 生成器，产出 (文本, 段落对象)，表格行的段落对象为None
+        """
+        # 提取段落文本
+        for paragraph in doc.paragraphs:
+            yield paragraph.text + "\n", paragraph
+
+        # 提取表格文本
+        for table in doc.tables:
+            for row in table.rows:
+                yield "".join(cell.text + "\t" for cell in row.cells) + "\n", None
+
+    @staticmethod
+    def parse(file_path, use_cache=True):
         """
         解析文档（自动识别类型）
         """
+        return DocumentParser.parse_with_info(file_path, use_cache)[0]
+
+    @staticmethod
+    def parse_with_info(file_path, use_cache=True):
+        """
+        解析文档并返回提取信息
+        先按文件内容哈希查询提取缓存，未命中再调用解析后端
+        :return: (text, info)，info包含所用后端（命中缓存时为"cache"）、耗时、PDF抽样质量和章节索引
+                 （sections，见section_index.build_section_index）
+        """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"文件不存在: {file_path}")
 
         ext = Path(file_path).suffix.lower()
+        backend = get_backend(file_path)
+        if backend is None:
+            raise ValueError(f"不支持的文件格式: {ext}")
+        extract = backend.extract
 
-        if ext == '.pdf':
-            return DocumentParser.parse_pdf(file_path)
-        elif ext in ['.docx', '.doc']:
-            return DocumentParser.parse_docx(file_path)
+        start_time = time.perf_counter()
+        cache = get_extraction_cache() if use_cache else None
+
+        if cache is None:
+            text, info = extract(file_path)
         else:
-            raise ValueError(f"不支持的文件格式: {ext}")
+            file_hash = cache.file_hash(file_path)
+            backend_version = DocumentParser.backend_version(ext)
+            text = cache.get(file_hash, backend_version)
+            if text is not None:
+                sections = cache.get_sections(file_hash, backend_version)
+                if sections is None:
+                    sections = build_section_index(text, find_text_headings(text))
+                info = {"backend": "cache", "quality": None, "sections": sections}
+            else:
+                text, info = extract(file_path)
+                if text.strip():
+                    cache.set(file_hash, backend_version, text, info["sections"])
+
+        info["seconds"] = round(time.perf_counter() - start_time, 3)
+        info["file"] = Path(file_path).name
+        DocumentParser.record_parse(info)
+        return text, info
+
+    @staticmethod
+    def record_parse(info):
+        """将每个文件的后端选择、耗时和章节数追加到 <缓存目录>/parse_log.jsonl"""
+        try:
+            record = dict(info, sections=len(info.get("sections") or []), time=time.strftime("%Y-%m-%d %H:%M:%S"))
+            with open(get_cache_dir() / "parse_log.jsonl", 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+
+def assess_text_quality(page_texts):
+    """
+    评估抽样页的文本质量
+    - 字符密度：每页非空白字符数
+    - 乱码比例：替换字符、私有区字符、控制字符以及(cid:N)占位符所占比例
+    - 行结构：平均行长度（过短说明逐词断行，过长说明缺少换行）
+    """
+    page_count = len(page_texts)
+    text = "\n".join(page_texts)
+    chars = sum(1 for ch in text if not ch.isspace())
+    lines = [line for line in text.splitlines() if line.strip()]
+
+    garbage = len(re.findall(r"\(cid:\d+\)", text)) * 8
+    for ch in text:
+        if ch == "\ufffd" or (unicodedata.category(ch) in ("Co", "Cc") and ch not in "\n\r\t"):
+            garbage += 1
+
+    density = chars / page_count if page_count else 0
+    garbage_ratio = garbage / chars if chars else 1.0
+    avg_line_length = chars / len(lines) if lines else 0
+
+    min_density = float(os.getenv("PDF_MIN_CHARS_PER_PAGE", 200))
+    ok = (
+        density >= min_density
+        and garbage_ratio <= 0.01
+        and 15 <= avg_line_length <= 300
+    )
+
+    return {
+        "ok": ok,
+        "pages_sampled": page_count,
+        "density": round(density, 1),
+        "garbage_ratio": round(garbage_ratio, 4),
+        "avg_line_length": round(avg_line_length, 1),
+    }
+
+
+def join_pages(page_texts, keep_empty=False):
+    """
+    拼接逐页文本（每页后接一个空行）
+    :param keep_empty: 是否为空页保留空行（PyPDF2路径保留，pdfplumber路径跳过）
+    :return: (全文, 每页文本在全文中的起始偏移列表，跳过的空页为None)
+    """
+    parts = []
+    offsets = []
+    offset = 0
+    for page_text in page_texts:
+        if page_text or keep_empty:
+            offsets.append(offset if page_text else None)
+            parts.append(page_text + "\n\n")
+            offset += len(page_text) + 2
+        else:
+            offsets.append(None)
+    return "".join(parts), offsets
+
+
+def page_starts(page_offsets):
+    """将join_pages返回的页偏移转换为 [(字符偏移, 页码)]"""
+    return [(offset, index + 1) for index, offset in enumerate(page_offsets) if offset is not None]
+
+
+def _extract_pdf_pages(file_path, start, end, layout=False):
+    """进程池工作函数：独立打开PDF，提取第start页到第end页（不含）的文本"""
+    return list(DocumentParser.iter_pdf_pages_pdfplumber(file_path, start, end, layout))
 
 
 def test_parser():
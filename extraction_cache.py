@@ -0,0 +1,128 @@
+"""
+文本提取缓存模块
+按文件内容哈希+解析器版本缓存提取出的文本（zlib压缩存储），
+避免重复运行或重试时重新解析PDF/Word文档
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from response_cache import get_cache_dir
+
+
+class ExtractionCache:
+    """提取文本缓存"""
+
+    def __init__(self, cache_dir=None):
+        """
+        :param cache_dir: 缓存目录，默认为 <缓存目录>/extracted
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else get_cache_dir() / "extracted"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # 路径索引：记录 路径+大小+修改时间 -> 内容哈希，文件未变化时无需重新计算哈希
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_dir / "paths.sqlite3"), check_same_thread=False, timeout=30)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS paths (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def compute_hash(file_path):
+        """分块计算文件内容的SHA-256"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def file_hash(self, file_path):
+        """获取文件内容哈希，优先使用路径索引"""
+        path = str(Path(file_path).resolve())
+        stat = os.stat(path)
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, hash FROM paths WHERE path = ?", (path,)
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        file_hash = self.compute_hash(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO paths (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, file_hash)
+            )
+            self._conn.commit()
+        return file_hash
+
+    def _entry_path(self, file_hash, backend_version):
+        return self.cache_dir / file_hash[:2] / f"{file_hash}-{backend_version}.txt.zz"
+
+    def get(self, file_hash, backend_version):
+        """读取缓存文本，未命中返回None"""
+        entry = self._entry_path(file_hash, backend_version)
+        try:
+            return zlib.decompress(entry.read_bytes()).decode("utf-8")
+        except (OSError, zlib.error):
+            return None
+
+    def get_sections(self, file_hash, backend_version):
+        """读取缓存的章节索引，未命中返回None"""
+        entry = self._entry_path(file_hash, backend_version).with_suffix(".sections.json")
+        try:
+            return json.loads(entry.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def set(self, file_hash, backend_version, text, sections=None):
+        """写入缓存文本和章节索引（先写临时文件再原子替换；章节索引先于文本写入）"""
+        entry = self._entry_path(file_hash, backend_version)
+        entry.parent.mkdir(exist_ok=True)
+        if sections is not None:
+            sections_entry = entry.with_suffix(".sections.json")
+            tmp_path = sections_entry.with_name(f"{sections_entry.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(sections, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, sections_entry)
+        tmp_path = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(zlib.compress(text.encode("utf-8")))
+        os.replace(tmp_path, entry)
+
+    def relocate(self, src_path, dest_path):
+        """文件被移动后，将路径索引中的记录转移到新路径"""
+        src = str(Path(src_path).resolve())
+        dest = str(Path(dest_path).resolve())
+        with self._lock:
+            self._conn.execute("UPDATE OR REPLACE paths SET path = ? WHERE path = ?", (dest, src))
+            self._conn.commit()
+
+
+_extraction_cache = None
+# 创建_extraction_cache的进程号：提取进程池的子进程由fork创建时会继承父进程的SQLite连接，
+# 跨进程共用同一连接可能损坏路径索引，进程号变化时重新连接
+_extraction_cache_pid = None
+
+
+def get_extraction_cache():
+    """获取进程内共享的提取缓存，EXTRACTION_CACHE=0 时返回None"""
+    global _extraction_cache, _extraction_cache_pid
+
+    if os.getenv("EXTRACTION_CACHE", "1") == "0":
+        return None
+    if _extraction_cache is None or _extraction_cache_pid != os.getpid():
+        _extraction_cache = ExtractionCache()
+        _extraction_cache_pid = os.getpid()
+    return _extraction_cache
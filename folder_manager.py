@@ -1,12 +1,23 @@
 """
 文件夹管理模块
 负责创建review文件夹、复制文件、管理目录结构
+已处理文档的review编号和状态记录在材料目录（material/catalog.sqlite3）中，
+保存的解析文件和审稿文件同时写入结果库（response/results.sqlite3）供全文检索
 """
 
 import os
 import shutil
+import sqlite3
+import time
 from pathlib import Path
 from document_parser import DocumentParser
+from extraction_cache import get_extraction_cache
+from job_journal import JobJournal, sha256_file
+from material_catalog import MaterialCatalog, STATUS_DONE, STATUS_PROCESSING
+from near_duplicate import minhash, near_duplicate_settings
+from revision import find_response_letter, letter_manuscript_stem
+from results_store import RESULT_KINDS, ResultsStore, result_kind
+from token_budget import count_tokens
 
 
 class FolderManager:
@@ -25,47 +36,201 @@ class FolderManager:
         self.material_dir.mkdir(exist_ok=True)
         self.response_dir.mkdir(exist_ok=True)
 
-    def get_next_review_number(self):
+        # 材料目录：首次使用时全量扫描一次历史review文件夹，之后增量更新
+        self.catalog = MaterialCatalog(self.material_dir / MaterialCatalog.FILE_NAME)
+        if not self.catalog.is_initialized():
+            self.rebuild_catalog()
+
+        # 近似重复检测（NEAR_DUPLICATE=0 关闭）
+        self.near_duplicate, self.near_duplicate_threshold, self.near_duplicate_action = near_duplicate_settings()
+
+        # 结果库：首次使用时导入已有的结果文件，之后随保存增量写入
+        self.results = ResultsStore(self.response_dir / ResultsStore.FILE_NAME)
+        if not self.results.is_initialized():
+            self.rebuild_results()
+
+    def rebuild_catalog(self):
         """
-        获取下一个review文件夹编号
-        检查material文件夹中已存在的review*文件夹
+        全量重建材料目录
+        material/review*/ 中的文件记为已完成，response/review*/job.json 中未完成的记录记为处理中
         """
-        existing_reviews = []
+        print("正在建立材料目录（仅首次运行或重建时需要）...")
+        self.catalog.reset()
+        count = 0
 
         for item in self.material_dir.iterdir():
-            if item.is_dir() and item.name.startswith("review"):
-                try:
-                    # 提取数字部分
-                    num = int(item.name.replace("review", ""))
-                    existing_reviews.append(num)
-                except ValueError:
+            if not (item.is_dir() and item.name.startswith("review")):
+                continue
+            try:
+                # 提取数字部分
+                review_number = int(item.name.replace("review", ""))
+            except ValueError:
+                continue
+
+            self.catalog.reserve_review_number(review_number)
+            for file in item.iterdir():
+                if file.is_file():
+                    self.catalog.record(sha256_file(file), file.name, review_number, STATUS_DONE)
+                    count += 1
+
+        for file_hash, journal in JobJournal.find_unfinished(self.response_dir).items():
+            if self.catalog.lookup(file_hash) is None:
+                self.catalog.record(file_hash, journal.data["file"], journal.review_number, STATUS_PROCESSING)
+
+        self.catalog.mark_initialized()
+        print(f"✓ 材料目录已建立，收录 {count} 个已处理文档")
+
+    def rebuild_results(self):
+        """
+        重新导入 response/review*/ 中的所有解析文件和审稿文件到结果库
+        模型取自处理日志，token数未记录
+        """
+        count = 0
+        for folder in sorted(self.response_dir.glob("review*")):
+            if not folder.is_dir():
+                continue
+            journal = JobJournal.load(folder)
+            for kind, label in RESULT_KINDS.items():
+                file_path = folder / f"{folder.name}_{label}.txt"
+                if not file_path.exists():
                     continue
+                stage = journal.data["stages"].get("parsed" if kind == "parse" else "reviewed", {}) if journal else {}
+                models = (stage.get("routing") or {}).get("models")
+                if self.index_result(file_path.read_text(encoding='utf-8'), file_path.name, folder, models=models):
+                    count += 1
 
-        # 返回最大值+1，如果没有则返回1
-        return max(existing_reviews, default=0) + 1
+        self.results.mark_initialized()
+        if count:
+            print(f"✓ 结果库已建立，收录 {count} 个结果文件")
+        return count
+
+    def get_next_review_number(self):
+        """
+        获取下一个review文件夹编号
+        从材料目录中读取已使用的最大编号
+        """
+        return self.catalog.next_review_number()
 
     def get_unprocessed_files(self):
         """
         获取material文件夹中未处理的文档
-        排除已经在review*文件夹中的文件
+        只检查material根目录下的文件，按内容哈希排除已处理的文档（包括改名后重新提交的文档）
         """
-        # 获取所有已处理的文件名
-        processed_files = set()
-        for item in self.material_dir.iterdir():
-            if item.is_dir() and item.name.startswith("review"):
-                for file in item.iterdir():
-                    if file.is_file():
-                        processed_files.add(file.name)
+        return self.filter_unprocessed(self.material_dir.iterdir())
 
-        # 获取未处理的文件
+    def filter_unprocessed(self, paths):
+        """
+        从给定路径中筛选未处理的文档（按内容哈希排除已处理和重复的文档）
+        :param paths: 候选文件路径
+        :return: 未处理的文档路径列表
+        """
         unprocessed_files = []
-        for item in self.material_dir.iterdir():
-            if item.is_file() and DocumentParser.is_supported(item):
-                if item.name not in processed_files:
-                    unprocessed_files.append(item)
+        seen_hashes = set()
+
+        for item in paths:
+            if not (item.is_file() and DocumentParser.is_supported(item)):
+                continue
+            if self.is_response_letter(item):
+                # 作者回复信随稿件一起处理
+                continue
+
+            file_hash = sha256_file(item)
+            entry = self.catalog.lookup(file_hash)
+            if entry and entry["status"] == STATUS_DONE:
+                print(f"   跳过 {item.name}：内容与 review{entry['review_number']}/{entry['file_name']} 相同，已处理过")
+                continue
+            if file_hash in seen_hashes:
+                print(f"   跳过 {item.name}：与本次的另一个文档内容相同")
+                continue
+
+            seen_hashes.add(file_hash)
+            unprocessed_files.append(item)
 
         return unprocessed_files
 
+    def find_near_duplicate(self, file_path, text, file_hash=None):
+        """
+        按提取文本查找与已处理文档近似重复的稿件（改名重投、一稿多投等），并记录本文档的签名
+        同一批次中先完成提取的文档也参与比较（同时放入的两份改名副本只处理一份）
+        :param text: 文档提取文本
+        :param file_hash: 文档内容哈希，未提供时计算
+        :return: {"file_name", "review_number", "status", "similarity"}，未启用、文本过短或没有近似文档时返回None
+        """
+        if not self.near_duplicate:
+            return None
+        signature = minhash(text)
+        if signature is None:
+            return None
+        file_hash = file_hash or sha256_file(file_path)
+        duplicate = self.catalog.find_similar(
+            file_hash, signature, self.near_duplicate_threshold, include_processing=True
+        )
+        self.catalog.record_fingerprint(file_hash, signature)
+        return duplicate
+
+    def index_fingerprints(self):
+        """
+        为 material/review*/ 中还没有签名的已处理文档计算签名（启用近似重复检测前处理的文档需运行一次）
+        :return: 新建签名的文档数
+        """
+        count = 0
+        for item in sorted(self.material_dir.glob("review*/*")):
+            if not (item.is_file() and DocumentParser.is_supported(item)):
+                continue
+            file_hash = sha256_file(item)
+            if self.catalog.has_fingerprint(file_hash):
+                continue
+            try:
+                signature = minhash(DocumentParser.parse(item))
+            except Exception as e:
+                print(f"⚠ {item.parent.name}/{item.name} 解析失败，跳过: {e}")
+                continue
+            if signature is not None:
+                self.catalog.record_fingerprint(file_hash, signature)
+                count += 1
+
+        print(f"✓ 已为 {count} 个已处理文档建立近似重复索引")
+        return count
+
+    @staticmethod
+    def is_response_letter(file_path):
+        """是否为同一文件夹中某个稿件的作者回复信（如 paper_R1.pdf 旁的 paper_R1_response.docx）"""
+        stem = letter_manuscript_stem(file_path)
+        if stem is None:
+            return False
+        parent = Path(file_path).parent
+        return any((parent / f"{stem}{extension}").exists() for extension in DocumentParser.supported_extensions())
+
+    def find_prior_version(self, file_path, text, threshold, file_hash=None):
+        """
+        查找修改稿对应的上一版稿件（已处理文档中估计相似度最高且达到阈值的一个），并记录本文档的签名
+        修改稿与原稿的相似度可能较低，LSH候选中没有达到阈值的文档时逐个比较所有签名
+        :return: {"file_name", "review_number", "similarity"}，没有时返回None
+        """
+        signature = minhash(text)
+        if signature is None:
+            return None
+        file_hash = file_hash or sha256_file(file_path)
+        prior = self.catalog.find_similar(file_hash, signature, threshold, exhaustive=True)
+        self.catalog.record_fingerprint(file_hash, signature)
+        return prior
+
+    def find_unfinished_review(self, file_path):
+        """
+        查找文档上次未完成的review编号
+        :return: (review编号, 内容哈希)，没有未完成记录时编号为None
+        """
+        file_hash = sha256_file(file_path)
+        entry = self.catalog.lookup(file_hash)
+        if entry and entry["status"] == STATUS_PROCESSING:
+            return entry["review_number"], file_hash
+        return None, file_hash
+
+    def mark_processing(self, file_path, review_number, file_hash=None):
+        """在材料目录中记录文档已分配review编号、正在处理"""
+        file_hash = file_hash or sha256_file(file_path)
+        self.catalog.record(file_hash, Path(file_path).name, review_number, STATUS_PROCESSING)
+
     def create_review_folders(self, review_number):
         """
         创建review文件夹（在material和response中）
@@ -82,6 +247,7 @@ class FolderManager:
         response_review_path = self.response_dir / review_name
         response_review_path.mkdir(exist_ok=True)
 
+        self.catalog.reserve_review_number(review_number)
         return material_review_path, response_review_path
 
     def move_file_to_review(self, file_path, review_folder):
@@ -92,23 +258,119 @@ class FolderManager:
         """
         file_path = Path(file_path)
         dest_path = review_folder / file_path.name
+        file_hash = sha256_file(file_path)
+        letter_path = find_response_letter(file_path, DocumentParser.supported_extensions())
 
-        # 移动文件
+        # 移动文件（作者回复信一并移动）
         shutil.move(str(file_path), str(dest_path))
+        if letter_path:
+            shutil.move(str(letter_path), str(Path(review_folder) / letter_path.name))
+
+        # 提取缓存的路径索引跟随文件移动
+        cache = get_extraction_cache()
+        if cache:
+            cache.relocate(file_path, dest_path)
+
+        # 材料目录增量更新
+        review_number = int(Path(review_folder).name.replace("review", ""))
+        self.catalog.record(file_hash, file_path.name, review_number, STATUS_DONE)
+
         return dest_path
 
-    def save_response(self, content, file_name, review_folder):
+    def save_response(self, content, file_name, review_folder, stats=None):
         """
-        保存审稿结果到response文件夹
+        保存审稿结果到response文件夹，解析文件和审稿文件同时写入结果库
         :param content: 文本内容
         :param file_name: 文件名
         :param review_folder: response中的review文件夹路径
+        :param stats: 生成该结果的CallStats（可选），记录模型和token数
         """
         file_path = review_folder / file_name
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(content)
+        self.index_result(content, file_name, review_folder, stats)
         return file_path
 
+    def index_result(self, content, file_name, review_folder, stats=None, models=None):
+        """
+        将结果文件写入结果库（写入失败只提示，不影响结果文件）
+        :param models: 未提供stats时记录的模型列表
+        :return: 是否已写入
+        """
+        kind = result_kind(file_name)
+        review_folder = Path(review_folder)
+        if kind is None:
+            return False
+        try:
+            review_number = int(review_folder.name.replace("review", ""))
+        except ValueError:
+            return False
+
+        journal = JobJournal.load(review_folder)
+        usage = stats.usage_snapshot() if stats else {}
+        try:
+            self.results.record(
+                review_number, kind, file_name, content,
+                document=journal.data.get("file") if journal else None,
+                models=sorted(usage) if usage else models,
+                prompt_tokens=sum(tokens["prompt_tokens"] for tokens in usage.values()) if usage else None,
+                completion_tokens=sum(tokens["completion_tokens"] for tokens in usage.values()) if usage else None,
+            )
+        except sqlite3.Error as e:
+            print(f"⚠ 结果库写入失败（{file_name}）: {e}")
+            return False
+        return True
+
+    def read_partial(self, file_name, review_folder):
+        """读取上次中断时留下的未完成输出（.partial文件），不存在时返回空字符串"""
+        partial_path = review_folder / f"{file_name}.partial"
+        if partial_path.exists():
+            return partial_path.read_text(encoding='utf-8')
+        return ""
+
+    def stream_response(self, chunks, file_name, review_folder, resume_text="", label=None, stats=None):
+        """
+        流式保存结果：逐段追加写入 <文件名>.partial，全部完成后原子重命名为正式文件
+        中断时.partial文件保留，下次可作为resume_text继续生成
+        :param chunks: 文本片段迭代器
+        :param resume_text: .partial中已有的内容（新片段在其后追加）
+        :param label: 进度显示的前缀
+        :param stats: 生成该结果的CallStats（可选），写入结果库时记录模型和token数
+        :return: (完整内容, 文件路径)
+        """
+        file_path = review_folder / file_name
+        partial_path = review_folder / f"{file_name}.partial"
+        prefix = f"[{label}] " if label else ""
+
+        parts = [resume_text]
+        start_time = time.monotonic()
+        last_report = start_time
+
+        mode = 'a' if resume_text else 'w'
+        with open(partial_path, mode, encoding='utf-8') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                f.flush()
+                parts.append(chunk)
+
+                now = time.monotonic()
+                if now - last_report >= 5:
+                    # 每个片段可能包含多个token，按本次生成的文本计算token数
+                    token_count = count_tokens("".join(parts[1:]))
+                    rate = token_count / (now - start_time)
+                    print(f"  {prefix}生成中: {token_count} tokens，{rate:.1f} tokens/s")
+                    last_report = now
+
+        os.replace(partial_path, file_path)
+        content = "".join(parts)
+        self.index_result(content, file_name, review_folder, stats)
+
+        elapsed = time.monotonic() - start_time
+        token_count = count_tokens("".join(parts[1:]))
+        if elapsed > 0 and token_count:
+            print(f"  {prefix}生成完成: {token_count} tokens，{token_count / elapsed:.1f} tokens/s")
+        return content, file_path
+
     def process_new_review(self):
         """
         处理新的审稿任务
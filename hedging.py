@@ -0,0 +1,176 @@
+"""
+对冲请求模块
+流式请求在观测到的首token延迟的某个百分位内仍未收到首个token时，再发出一个相同的请求
+（链中还有备选模型时发给下一个模型），采用先收到首个token的一方，另一方立即关闭连接；
+对冲请求数占全部请求的比例不超过预算
+
+胜负按首个token而不是完整回答判定：对冲针对的是上游服务商卡住、迟迟不开始输出的情况，
+开始输出后两边的生成速度相近；若等到其中一方完整回答，落败的一方也要生成完整输出，
+对冲请求的输出token费用会翻倍，且只有等先完成的一方才能取消另一方
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class HedgeCancelled(Exception):
+    """对冲中落败的请求已被取消"""
+
+
+class HedgeAttempt:
+    """一次流式请求（主请求或对冲请求）的状态"""
+
+    def __init__(self, route, hedge=False):
+        self.route = route
+        self.hedge = hedge
+        self.started = time.monotonic()
+        # 线程池开始执行该请求时置位（排队时间不计入首token延迟）
+        self.running = threading.Event()
+        self._lock = threading.Lock()
+        self._stream = None
+        self._cancelled = False
+
+    def attach(self, stream):
+        """登记已建立的流式连接；已被取消时立即关闭"""
+        with self._lock:
+            self._stream = stream
+            cancelled = self._cancelled
+        if cancelled:
+            stream.close()
+            raise HedgeCancelled()
+
+    def cancel(self):
+        """取消请求：关闭已建立的连接（阻塞在读取上的线程随即结束），尚未建立的连接建立后立即关闭"""
+        with self._lock:
+            self._cancelled = True
+            stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+class Hedger:
+    """对冲请求调度（多线程共享同一实例）"""
+
+    def __init__(self, enabled=None, percentile=None, budget=None, min_samples=None, max_workers=None):
+        """
+        :param enabled: 是否启用，默认读取AI_HEDGE（默认关闭）
+        :param percentile: 等待首token的时间取观测延迟的百分位，默认读取AI_HEDGE_PERCENTILE
+        :param budget: 对冲请求数占全部请求的比例上限，默认读取AI_HEDGE_BUDGET
+        :param min_samples: 某阶段积累到多少个延迟样本后才开始对冲，默认读取AI_HEDGE_MIN_SAMPLES
+        :param max_workers: 线程池大小，须不少于同时发出流式请求的线程数的两倍（主请求和对冲请求各占一个线程），
+                            否则请求在池中排队，启用对冲反而限制了并发
+        """
+        self.enabled = enabled if enabled is not None else os.getenv("AI_HEDGE", "0") == "1"
+        self.percentile = percentile or float(os.getenv("AI_HEDGE_PERCENTILE", 95))
+        self.budget = budget if budget is not None else float(os.getenv("AI_HEDGE_BUDGET", 0.05))
+        self.min_samples = min_samples or int(os.getenv("AI_HEDGE_MIN_SAMPLES", 20))
+
+        self._lock = threading.Lock()
+        # 各阶段最近的首token延迟（秒）
+        self._latencies = {}
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge") if self.enabled else None
+
+    def record_latency(self, stage, seconds):
+        with self._lock:
+            self._latencies.setdefault(stage, deque(maxlen=500)).append(seconds)
+
+    def hedge_delay(self, stage):
+        """发出对冲请求前等待的秒数（样本不足时返回None，不对冲）"""
+        with self._lock:
+            samples = sorted(self._latencies.get(stage, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return samples[index]
+
+    def _reserve_hedge(self):
+        """预算内时计入一次对冲并返回True"""
+        with self._lock:
+            if self.hedged + 1 > self.budget * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def run(self, stage, route, open_attempt, stats=None, on_discard=None):
+        """
+        执行一次流式请求的建立阶段（到收到首个token为止），必要时发出对冲请求
+        :param route: 主请求的ModelRoute
+        :param open_attempt: 可调用对象，接收HedgeAttempt，建立连接（建立后调用attempt.attach）并读到首个token后返回
+        :param stats: CallStats，记录对冲次数
+        :param on_discard: 可调用对象，接收落败的HedgeAttempt（用于记录其消耗）
+        :return: (获胜的HedgeAttempt, open_attempt的返回值)
+        """
+        primary = HedgeAttempt(route)
+        if not self.enabled:
+            return primary, open_attempt(primary)
+
+        with self._lock:
+            self.requests += 1
+        delay = self.hedge_delay(stage)
+        if delay is None:
+            result = open_attempt(primary)
+            self.record_latency(stage, time.monotonic() - primary.started)
+            return primary, result
+
+        attempts = {self._pool.submit(self._open, open_attempt, primary): primary}
+        # 从主请求开始执行时计时
+        primary.running.wait()
+        done, _ = wait(attempts, timeout=max(0.0, delay - (time.monotonic() - primary.started)))
+        if not done and self._reserve_hedge():
+            hedge = HedgeAttempt(route.alternate(), hedge=True)
+            print(f"⚠ {stage or 'AI'}请求 {delay:.1f} 秒内未收到首个token，发出对冲请求（{hedge.route.model}）")
+            attempts[self._pool.submit(self._open, open_attempt, hedge)] = hedge
+            if stats:
+                stats.record_hedge()
+
+        pending = set(attempts)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+
+                winner = attempts[future]
+                for other, attempt in attempts.items():
+                    if attempt is winner:
+                        continue
+                    attempt.cancel()
+                    # 已经失败的请求没有消耗，不计入
+                    if on_discard and not (other.done() and other.exception() is not None):
+                        on_discard(attempt)
+                # 对冲获胜时主请求的真实延迟未知，按实际等待时间记录（不低于对冲触发延迟）
+                self.record_latency(stage, time.monotonic() - primary.started)
+                if winner.hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                    if stats:
+                        stats.record_hedge_win()
+                return winner, future.result()
+
+        raise error
+
+    @staticmethod
+    def _open(open_attempt, attempt):
+        """线程池中执行一次请求，开始执行时重新记录起始时间"""
+        attempt.started = time.monotonic()
+        attempt.running.set()
+        return open_attempt(attempt)
+
+    def summary(self):
+        """对冲请求统计（未发出过请求时返回None）"""
+        with self._lock:
+            if not self.enabled or not self.requests:
+                return None
+            return (f"对冲请求: {self.hedged}/{self.requests} 次（{self.hedged / self.requests:.1%}，"
+                    f"预算 {self.budget:.0%}），对冲请求先到 {self.hedge_wins} 次")
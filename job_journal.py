@@ -0,0 +1,136 @@
+"""
+处理日志模块
+在每个 response/reviewN/ 中记录该文档各阶段的完成情况（提取、AI解析、审稿、移动）及内容哈希，
+中断后重新运行时从第一个未完成的阶段继续，并沿用原来的review编号
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from extraction_cache import ExtractionCache, get_extraction_cache
+
+# 处理阶段（按顺序）
+STAGES = ("extracted", "parsed", "reviewed", "moved")
+
+
+def sha256_file(file_path):
+    """计算文件内容哈希（启用提取缓存时复用其路径索引）"""
+    cache = get_extraction_cache()
+    if cache:
+        return cache.file_hash(file_path)
+    return ExtractionCache.compute_hash(file_path)
+
+
+class JobJournal:
+    """单个文档的处理日志（response/reviewN/job.json）"""
+
+    FILE_NAME = "job.json"
+
+    def __init__(self, path, data):
+        self.path = Path(path)
+        self.data = data
+
+    @classmethod
+    def create(cls, response_review_path, file_path, review_number, file_hash=None):
+        """
+        新建处理日志
+        :param file_hash: 源文件内容哈希，未提供时计算
+        """
+        journal = cls(Path(response_review_path) / cls.FILE_NAME, {
+            "file": Path(file_path).name,
+            "file_hash": file_hash or sha256_file(file_path),
+            "review_number": review_number,
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "stages": {},
+        })
+        journal.save()
+        return journal
+
+    @classmethod
+    def load(cls, response_review_path):
+        """读取处理日志，不存在或损坏时返回None"""
+        path = Path(response_review_path) / cls.FILE_NAME
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(path, json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def find_unfinished(cls, response_dir):
+        """
+        查找所有未完成（文件尚未移动）的处理日志
+        :return: {源文件内容哈希: JobJournal}，同一文档有多条记录时取编号最小的
+        """
+        unfinished = {}
+        for item in sorted(Path(response_dir).glob("review*/" + cls.FILE_NAME)):
+            journal = cls.load(item.parent)
+            if journal is None or journal.is_done("moved"):
+                continue
+            file_hash = journal.data.get("file_hash")
+            current = unfinished.get(file_hash)
+            if current is None or journal.review_number < current.review_number:
+                unfinished[file_hash] = journal
+        return unfinished
+
+    @property
+    def review_number(self):
+        return self.data["review_number"]
+
+    @property
+    def file_hash(self):
+        return self.data["file_hash"]
+
+    def save(self):
+        """原子写入（先写临时文件再重命名）"""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def mark(self, stage, content=None, output_file=None, routing=None):
+        """
+        记录阶段完成
+        :param content: 该阶段产出的文本（记录其哈希）
+        :param output_file: 该阶段写入的文件名（相对于日志所在文件夹），续跑时检查其是否仍存在且未被修改
+        :param routing: AI阶段的模型选择记录（CallStats.routing()：实际使用的模型和切换过程）
+        """
+        entry = {"done_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        if content is not None:
+            entry["sha256"] = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        if output_file:
+            entry["output_file"] = output_file
+        if routing:
+            entry["routing"] = routing
+        self.data["stages"][stage] = entry
+        self.save()
+
+    def is_done(self, stage):
+        """阶段是否已完成（有输出文件的阶段要求文件存在且内容哈希一致）"""
+        entry = self.data["stages"].get(stage)
+        if entry is None:
+            return False
+
+        output_file = entry.get("output_file")
+        if output_file:
+            output_path = self.path.parent / output_file
+            if not output_path.exists():
+                return False
+            if "sha256" in entry:
+                content = output_path.read_text(encoding='utf-8')
+                if hashlib.sha256(content.encode("utf-8")).hexdigest() != entry["sha256"]:
+                    return False
+        return True
+
+    def read_output(self, stage):
+        """读取已完成阶段的输出文件内容"""
+        return (self.path.parent / self.data["stages"][stage]["output_file"]).read_text(encoding='utf-8')
+
+    def first_incomplete_stage(self):
+        """第一个未完成的阶段，全部完成时返回None"""
+        for stage in STAGES:
+            if not self.is_done(stage):
+                return stage
+        return None
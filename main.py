@@ -3,11 +3,21 @@ AI审稿系统 - 主程序
 自动处理学术文档并生成审稿意见
 """
 
+import argparse
+import os
 import sys
+import time
 from pathlib import Path
 from document_parser import DocumentParser
 from folder_manager import FolderManager
 from ai_client import AIClient
+from pipeline import ReviewPipeline, ReviewJob
+from batch_runner import BatchReviewRunner
+from job_journal import JobJournal
+from watcher import MaterialWatcher
+from telemetry import Telemetry
+from material_catalog import STATUS_DONE
+from revision import RevisionContext, diff_sections, find_response_letter
 
 
 class ReviewSystem:
@@ -19,6 +29,16 @@ class ReviewSystem:
         self.ai_client = AIClient()
         self.review_language = None
 
+        # 运行指标：各阶段耗时、token用量和费用（TELEMETRY=0 关闭）
+        self.telemetry = Telemetry()
+
+        # 流式输出：审稿意见边生成边写入.partial文件（AI_STREAM=0 关闭）
+        self.stream_output = os.getenv("AI_STREAM", "1") != "0"
+
+        # 修改稿模式：按相似度找到上一轮的review，只针对修改内容审稿（--revision 开启）
+        self.revision_mode = False
+        self.revision_threshold = float(os.getenv("REVISION_MATCH_THRESHOLD", 0.3))
+
     def display_banner(self):
         """显示程序标题"""
         banner = """
@@ -55,7 +75,7 @@ class ReviewSystem:
 
         if not unprocessed_files:
             print("\n❌ 在material文件夹中没有找到待处理的文档")
-            print("   支持的格式: PDF (.pdf), Word (.docx, .doc)")
+            print(f"   支持的格式: {', '.join(DocumentParser.supported_extensions())}")
             return []
 
         print(f"\n✓ 找到 {len(unprocessed_files)} 个待处理文档:")
@@ -65,77 +85,374 @@ class ReviewSystem:
 
         return unprocessed_files
 
-    def process_document(self, file_path, review_number, material_review_path, response_review_path):
+    def process_document(self, file_path, review_number, material_review_path, response_review_path, journal=None):
         """
-        处理单个文档
+        处理单个文档（按顺序执行提取、AI解析、审稿、移动，各阶段与流水线共用同一组方法）
         :param file_path: 文档路径
         :param review_number: review编号
         :param material_review_path: material中的review文件夹路径
         :param response_review_path: response中的review文件夹路径
+        :param journal: 处理日志（JobJournal，可选），已完成的阶段跳过
+        :return: 是否处理成功
         """
-        file_name = file_path.name
+        job = ReviewJob(file_path, review_number, material_review_path, response_review_path, journal)
+        job.started_at = time.perf_counter()
         print(f"\n{'='*60}")
-        print(f"正在处理: {file_name}")
+        print(f"正在处理: {file_path.name}")
         print(f"{'='*60}")
 
         # 1. 解析文档
         print("\n[1/4] 正在解析文档...")
-        try:
-            document_text = DocumentParser.parse(file_path)
-            print(f"✓ 文档解析成功，提取文本长度: {len(document_text)} 字符")
-        except Exception as e:
-            print(f"❌ 文档解析失败: {e}")
-            return False
+        stages = self.start_job(job, DocumentParser.parse_with_info, file_path)
 
         # 2. AI解析：提取关键信息（中英双语）
-        print("\n[2/4] 正在进行AI解析（提取研究信息）...")
-        try:
-            parse_result = self.ai_client.parse_document(document_text)
-            print("✓ AI解析完成")
+        if "parse" in stages:
+            print("\n[2/4] 正在进行AI解析（提取研究信息）...")
+            self.finish_ai_stage(job, "parse", self.run_ai_stage, job, "parse")
 
-            # 保存解析文件
-            parse_file_name = f"review{review_number}_解析文件.txt"
-            self.folder_manager.save_response(parse_result, parse_file_name, response_review_path)
-            print(f"✓ 解析文件已保存: {parse_file_name}")
+        # 3. AI审稿：生成审稿意见
+        if "review" in stages and not job.errors:
+            print(f"\n[3/4] 正在生成{self.review_language}审稿意见...")
+            self.finish_ai_stage(job, "review", self.run_ai_stage, job, "review")
 
-        except Exception as e:
-            print(f"❌ AI解析失败: {e}")
-            return False
+        # 4. 移动文档到review文件夹
+        print("\n[4/4] 正在整理文件...")
+        return self.finalize_job(job)
 
-        # 3. AI审稿：生成审稿意见
-        print(f"\n[3/4] 正在生成{self.review_language}审稿意见...")
+    def start_job(self, job, extract, *args):
+        """
+        文本提取完成后的准备阶段：记录提取结果，修改稿对比或近似重复检查，整理发送给AI的文本，沿用已有的解析和审稿结果
+        :param job: ReviewJob
+        :param extract: 返回 (文本, 提取信息) 的函数（逐个处理时为DocumentParser.parse_with_info，流水线中为进程池结果）
+        :return: 需要发出的AI请求阶段列表（"parse" / "review"），为空时直接进入最终阶段；失败原因记录在job.errors中
+        """
+        prefix = job.prefix()
+        file_name = job.file_path.name
         try:
-            review_result = self.ai_client.review_document(document_text, self.review_language)
-            print("✓ 审稿意见生成完成")
+            job.document_text, job.parse_info = extract(*args)
+            sections = job.parse_info["sections"]
+            print(f"✓ {prefix}文档解析成功，提取文本长度: {len(job.document_text)} 字符，{len(sections)} 个章节"
+                  f"（{job.parse_info['backend']}，{job.parse_info['seconds']}秒）")
+            # 流水线中提取在子进程中进行，耗时统一取自提取结果
+            self.telemetry.record(
+                "extract", job.parse_info["seconds"], file_name, job.review_number,
+                backend=job.parse_info["backend"], chars=len(job.document_text), sections=len(sections)
+            )
+            if job.journal:
+                job.journal.mark("extracted", job.document_text)
+        except Exception as e:
+            self.telemetry.record("extract", 0.0, file_name, job.review_number, "error")
+            job.errors.append(f"文档解析失败: {e}")
+            return []
 
-            # 保存审稿文件
-            review_file_name = f"review{review_number}_审稿文件.txt"
-            self.folder_manager.save_response(review_result, review_file_name, response_review_path)
-            print(f"✓ 审稿文件已保存: {review_file_name}")
+        if self.revision_mode:
+            # 修改稿：对比上一轮的稿件，只针对修改内容审稿
+            if not (job.journal and job.journal.is_done("reviewed")):
+                try:
+                    job.revision = self.prepare_revision(
+                        job.file_path, job.document_text, sections, job.review_number, job.response_review_path,
+                        job.journal, job.label
+                    )
+                except Exception as e:
+                    job.errors.append(f"修改稿对比失败: {e}")
+                    return []
+        elif not (job.journal and job.journal.is_done("parsed")):
+            # 发出AI请求前检查是否与已处理的文档近似重复，已关联到原审稿结果时直接进入最终阶段
+            try:
+                if self.check_near_duplicate(
+                    job.file_path, job.document_text, job.review_number, job.response_review_path, job.journal,
+                    job.label
+                ):
+                    return []
+            except Exception as e:
+                job.errors.append(f"近似重复检查失败: {e}")
+                return []
+        # 之后的AI请求只使用按章节索引整理后的文本
+        job.document_text = self.ai_client.focus_document(job.document_text, sections)
+
+        stages = []
+        if job.revision and job.revision.previous_parse:
+            job.parse_result = job.revision.previous_parse
+            print(f"✓ {prefix}修改稿沿用 review{job.revision.previous_number} 的AI解析结果")
+        elif job.journal and job.journal.is_done("parsed"):
+            job.parse_result = job.journal.read_output("parsed")
+            print(f"✓ {prefix}AI解析已在上次运行中完成，跳过")
+        else:
+            stages.append("parse")
+
+        if job.journal and job.journal.is_done("reviewed"):
+            job.review_result = job.journal.read_output("reviewed")
+            print(f"✓ {prefix}审稿已在上次运行中完成，跳过")
+        else:
+            stages.append("review")
+            # 两阶段审稿：审稿请求需要等AI解析完成后再发出
+            job.review_waiting = (
+                job.revision is None and "parse" in stages and self.ai_client.uses_compact_review(job.document_text)
+            )
+        return stages
+
+    def run_ai_stage(self, job, stage):
+        """
+        执行AI解析或审稿请求并记录运行指标（流水线中在I/O线程执行）
+        审稿时两阶段审稿附带AI解析结果，修改稿审稿附带修改内容；流式模式下审稿意见边生成边写入.partial文件
+        :param stage: "parse" / "review"
+        :return: AI生成的文本
+        """
+        file_name = job.file_path.name
+        if stage == "parse":
+            stats = job.stage_stats["ai_parse"]
+            with self.telemetry.stage("ai_parse", file_name, job.review_number, stats):
+                return self.ai_client.parse_document(job.document_text, stats)
+
+        prefix = job.prefix()
+        parse_result = job.parse_result if self.ai_client.uses_compact_review(job.document_text) else None
+        if job.revision:
+            revision_tokens = self.ai_client.review_input_tokens(
+                job.document_text, self.review_language, revision=job.revision
+            )
+            full_tokens = self.ai_client.review_input_tokens(job.document_text, self.review_language)
+            print(f"  {prefix}修改稿审稿输入 {revision_tokens} tokens（全文模式 {full_tokens} tokens）")
+        elif parse_result:
+            compact_tokens = self.ai_client.review_input_tokens(job.document_text, self.review_language, parse_result)
+            full_tokens = self.ai_client.review_input_tokens(job.document_text, self.review_language)
+            print(f"  {prefix}两阶段审稿输入 {compact_tokens} tokens（全文模式 {full_tokens} tokens）")
+
+        stats = job.stage_stats["ai_review"]
+        with self.telemetry.stage("ai_review", file_name, job.review_number, stats):
+            if self.stream_output:
+                # 流式输出边生成边保存，保存时间计入审稿阶段
+                return self.stream_review(
+                    job.document_text, job.review_number, job.response_review_path, job.label, stats,
+                    parse_result, job.revision
+                )
+            return self.ai_client.review_document(
+                job.document_text, self.review_language, stats, parse_result, job.revision
+            )
 
+    def finish_ai_stage(self, job, stage, result, *args):
+        """
+        取得AI请求的结果，保存到response文件夹并记录到处理日志
+        AI请求失败与保存失败分别记录，磁盘或处理日志的错误不计为AI失败
+        :param stage: "parse" / "review"
+        :param result: 返回AI结果的函数（逐个处理时为run_ai_stage，流水线中为future.result）
+        """
+        prefix = job.prefix()
+        file_name = job.file_path.name
+        try:
+            text = result(*args)
         except Exception as e:
-            print(f"❌ 审稿失败: {e}")
-            return False
+            job.errors.append(f"{'AI解析失败' if stage == 'parse' else '审稿失败'}: {e}")
+            return
+
+        if stage == "parse":
+            job.parse_result = text
+            print(f"✓ {prefix}AI解析完成")
+            output_name, journal_stage, stats = f"review{job.review_number}_解析文件.txt", "parsed", "ai_parse"
+        else:
+            job.review_result = text
+            print(f"✓ {prefix}审稿意见生成完成")
+            output_name, journal_stage, stats = f"review{job.review_number}_审稿文件.txt", "reviewed", "ai_review"
 
-        # 4. 移动文档到review文件夹
-        print("\n[4/4] 正在整理文件...")
         try:
-            dest_path = self.folder_manager.move_file_to_review(file_path, material_review_path)
-            print(f"✓ 文档已移动到: {dest_path.parent.name}/{dest_path.name}")
+            # 流式审稿已在生成时写入审稿文件
+            if stage == "parse" or not self.stream_output:
+                with self.telemetry.stage("save", file_name, job.review_number):
+                    self.folder_manager.save_response(
+                        text, output_name, job.response_review_path, job.stage_stats[stats]
+                    )
+            if job.journal:
+                job.journal.mark(journal_stage, text, output_name, job.stage_stats[stats].routing())
+            print(f"✓ {prefix}{'解析文件' if stage == 'parse' else '审稿文件'}已保存: {output_name}")
         except Exception as e:
-            print(f"❌ 文件移动失败: {e}")
+            job.errors.append(f"{'解析文件' if stage == 'parse' else '审稿文件'}保存失败: {e}")
+
+    def finalize_job(self, job):
+        """
+        最终阶段：全部成功后移动原文档，记录单个文档的总耗时和token用量
+        :return: 是否处理成功
+        """
+        prefix = job.prefix()
+        file_name = job.file_path.name
+
+        if job.call_stats.attempts:
+            print(f"  {prefix}AI{job.call_stats.summary()}")
+
+        if job.errors:
+            for error in job.errors:
+                print(f"❌ {prefix}{error}")
+            if job.journal:
+                print(f"  {prefix}重新运行时将从未完成的阶段继续（review{job.review_number}）")
+        else:
+            try:
+                with self.telemetry.stage("move", file_name, job.review_number):
+                    dest_path = self.folder_manager.move_file_to_review(job.file_path, job.material_review_path)
+                if job.journal:
+                    job.journal.mark("moved")
+                print(f"✓ {prefix}文档已移动到: {dest_path.parent.name}/{dest_path.name}")
+                job.success = True
+            except Exception as e:
+                print(f"❌ {prefix}文件移动失败: {e}")
+
+        self.telemetry.record(
+            "document", time.perf_counter() - job.started_at, file_name, job.review_number,
+            "ok" if job.success else "error", job.call_stats
+        )
+        if job.success:
+            print(f"✓ {file_name} 处理完成！")
+        return job.success
+
+    def check_near_duplicate(self, file_path, document_text, review_number, response_review_path, journal=None,
+                             label=None):
+        """
+        发出AI请求前检查文档是否与已处理的文档近似重复
+        NEAR_DUPLICATE_ACTION=link 时不再解析和审稿，写入指向原审稿结果的说明文件
+        :param document_text: 提取的全文
+        :param label: 进度显示的前缀
+        :return: 是否已关联到原审稿结果（为True时跳过AI解析和审稿）
+        """
+        prefix = f"[{label}] " if label else ""
+        duplicate = self.folder_manager.find_near_duplicate(
+            file_path, document_text, journal.data.get("file_hash") if journal else None
+        )
+        if duplicate is None:
             return False
 
-        print(f"\n✓ {file_name} 处理完成！")
+        earlier_number = duplicate["review_number"]
+        earlier = f"review{earlier_number}/{duplicate['file_name']}"
+        if duplicate["status"] != STATUS_DONE:
+            earlier += "（同一批次中处理）"
+        print(f"⚠ {prefix}与已处理的 {earlier} 近似重复（估计相似度 {duplicate['similarity']:.0%}）")
+        if self.folder_manager.near_duplicate_action != "link":
+            return False
+
+        note_name = f"review{review_number}_重复稿件.txt"
+        note = (
+            f"{file_path.name} 与 {earlier} 近似重复（估计相似度 {duplicate['similarity']:.0%}），未重新解析和审稿。\n"
+            f"解析文件: response/review{earlier_number}/review{earlier_number}_解析文件.txt\n"
+            f"审稿文件: response/review{earlier_number}/review{earlier_number}_审稿文件.txt\n"
+        )
+        self.folder_manager.save_response(note, note_name, response_review_path)
+        if journal:
+            journal.mark("parsed", note, note_name)
+            journal.mark("reviewed", note, note_name)
+        print(f"✓ {prefix}已关联到 review{earlier_number} 的审稿结果: {note_name}")
         return True
 
+    def prepare_revision(self, file_path, document_text, sections, review_number, response_review_path,
+                         journal=None, label=None):
+        """
+        查找修改稿的上一版并按章节对比两版文本
+        上一版须已完成审稿（response中有审稿文件，material中有原稿件）；上一轮的AI解析结果直接沿用
+        :param document_text: 提取的全文
+        :param sections: 章节索引
+        :param label: 进度显示的前缀
+        :return: RevisionContext，找不到上一版时返回None（按新稿件审稿）
+        """
+        prefix = f"[{label}] " if label else ""
+        prior = self.folder_manager.find_prior_version(
+            file_path, document_text, self.revision_threshold, journal.data.get("file_hash") if journal else None
+        )
+        if prior is None:
+            print(f"⚠ {prefix}未找到修改稿对应的上一版稿件，按新稿件审稿")
+            return None
+
+        previous_number = prior["review_number"]
+        previous_response = self.folder_manager.response_dir / f"review{previous_number}"
+        previous_review_path = previous_response / f"review{previous_number}_审稿文件.txt"
+        previous_file = self.folder_manager.material_dir / f"review{previous_number}" / prior["file_name"]
+        if not (previous_review_path.exists() and previous_file.exists()):
+            print(f"⚠ {prefix}上一版 review{previous_number}/{prior['file_name']} 的稿件或审稿文件不存在，按新稿件审稿")
+            return None
+
+        previous_text, previous_info = DocumentParser.parse_with_info(previous_file)
+        changes = diff_sections(previous_text, previous_info["sections"], document_text, sections)
+
+        previous_parse_path = previous_response / f"review{previous_number}_解析文件.txt"
+        previous_parse = previous_parse_path.read_text(encoding="utf-8") if previous_parse_path.exists() else None
+
+        letter_path = find_response_letter(file_path, DocumentParser.supported_extensions())
+        response_letter = DocumentParser.parse(letter_path) if letter_path else None
+
+        revision = RevisionContext(
+            previous_number, prior["file_name"], prior["similarity"], changes,
+            previous_review_path.read_text(encoding="utf-8"), previous_parse, response_letter
+        )
+
+        # 沿用上一轮的解析结果，本轮不再调用AI解析
+        if previous_parse and not (journal and journal.is_done("parsed")):
+            parse_file_name = f"review{review_number}_解析文件.txt"
+            self.folder_manager.save_response(previous_parse, parse_file_name, response_review_path)
+            if journal:
+                journal.mark("parsed", previous_parse, parse_file_name)
+
+        letter = f"作者回复信 {letter_path.name}" if letter_path else "无作者回复信"
+        print(f"✓ {prefix}修改稿对应 review{previous_number}/{prior['file_name']}"
+              f"（估计相似度 {prior['similarity']:.0%}）：{revision.summary()}，{letter}")
+        return revision
+
+    def create_jobs(self, files):
+        """
+        为待处理文档分配review文件夹并创建处理任务
+        材料目录中处于处理中状态的文档（内容哈希相同）沿用原review编号，从未完成的阶段继续
+        :return: ReviewJob列表
+        """
+        jobs = []
+
+        for file_path in files:
+            review_number, file_hash = self.folder_manager.find_unfinished_review(file_path)
+            journal = None
+
+            if review_number is not None:
+                material_review_path, response_review_path = self.folder_manager.create_review_folders(review_number)
+                journal = JobJournal.load(response_review_path)
+
+            if journal:
+                print(f"\n{file_path.name} 上次未完成，沿用 review{review_number} 文件夹"
+                      f"（从 {journal.first_incomplete_stage()} 阶段继续）")
+            else:
+                if review_number is None:
+                    review_number = self.folder_manager.get_next_review_number()
+                    material_review_path, response_review_path = self.folder_manager.create_review_folders(
+                        review_number
+                    )
+                journal = JobJournal.create(response_review_path, file_path, review_number, file_hash)
+                self.folder_manager.mark_processing(file_path, review_number, file_hash)
+                print(f"\n为 {file_path.name} 创建 review{review_number} 文件夹")
+
+            jobs.append(ReviewJob(file_path, review_number, material_review_path, response_review_path, journal))
+
+        return jobs
+
+    def stream_review(self, document_text, review_number, response_review_path, label=None, stats=None,
+                      parse_result=None, revision=None):
+        """
+        流式生成审稿意见并逐段写入response文件夹
+        若存在上次中断留下的.partial文件，则在其基础上继续生成
+        :param stats: CallStats（可选），累加该文档的请求统计
+        :param parse_result: AI解析结果（两阶段审稿时提供）
+        :param revision: RevisionContext（修改稿审稿时提供）
+        :return: 完整的审稿意见
+        """
+        review_file_name = f"review{review_number}_审稿文件.txt"
+        resume_text = self.folder_manager.read_partial(review_file_name, response_review_path)
+        if resume_text:
+            print(f"  发现未完成的审稿输出（{len(resume_text)} 字符），从中断处继续生成")
+
+        chunks = self.ai_client.review_document_stream(
+            document_text, self.review_language, resume_text, stats, parse_result, revision
+        )
+        review_result, _ = self.folder_manager.stream_response(
+            chunks, review_file_name, response_review_path, resume_text, label, stats
+        )
+        return review_result
+
     def run(self):
         """运行审稿系统"""
         # 显示标题
         self.display_banner()
 
-        # 选择语言
-        if not self.select_language():
+        # 选择语言（命令行已指定时跳过）
+        if self.review_language is None and not self.select_language():
             return
 
         # 检查待处理材料
@@ -150,30 +467,15 @@ class ReviewSystem:
             print("已取消操作")
             return
 
-        # 处理每个文档
-        success_count = 0
-        fail_count = 0
-        review_numbers = []  # 记录所有创建的review编号
+        # 为每个文档创建独立的review文件夹（上次未完成的文档沿用原编号）
+        jobs = self.create_jobs(unprocessed_files)
+        review_numbers = [job.review_number for job in jobs]  # 记录所有使用的review编号
 
-        for file_path in unprocessed_files:
-            # 为每个文档创建独立的review文件夹
-            review_number = self.folder_manager.get_next_review_number()
-            material_review_path, response_review_path = self.folder_manager.create_review_folders(review_number)
-            review_numbers.append(review_number)
+        # 流水线并发处理所有文档
+        ReviewPipeline(self).run(jobs)
 
-            print(f"\n为 {file_path.name} 创建 review{review_number} 文件夹")
-
-            success = self.process_document(
-                file_path,
-                review_number,
-                material_review_path,
-                response_review_path
-            )
-
-            if success:
-                success_count += 1
-            else:
-                fail_count += 1
+        success_count = sum(1 for job in jobs if job.success)
+        fail_count = len(jobs) - success_count
 
         # 显示统计信息
         print(f"\n{'='*60}")
@@ -181,16 +483,88 @@ class ReviewSystem:
         print(f"{'='*60}")
         print(f"成功: {success_count} 个")
         print(f"失败: {fail_count} 个")
+        if self.ai_client.cache:
+            cache_stats = self.ai_client.cache.stats()
+            print(f"响应缓存: 命中 {cache_stats['hits']} 次，未命中 {cache_stats['misses']} 次")
+        hedge_summary = self.ai_client.hedger.summary()
+        if hedge_summary:
+            print(hedge_summary)
+        self.telemetry.print_summary()
         print(f"\n结果保存在:")
         for review_num in review_numbers:
             print(f"  - review{review_num}: material/review{review_num}/ 和 response/review{review_num}/")
 
 
+    def run_watch(self):
+        """监视模式：常驻运行，material中放入新文档后自动处理"""
+        self.display_banner()
+
+        # 选择语言（命令行已指定时跳过）
+        if self.review_language is None and not self.select_language():
+            return
+
+        MaterialWatcher(self).run()
+
+    def run_batch(self, state_path=None):
+        """
+        批处理模式：通过Batch API提交所有待处理文档，轮询完成后写回结果
+        :param state_path: 已提交批处理的状态文件，用于中断后恢复
+        """
+        self.display_banner()
+        if self.revision_mode:
+            print("⚠ 批处理模式不支持修改稿审稿，所有文档按新稿件审稿")
+        runner = BatchReviewRunner(self, poll_interval=int(os.getenv("BATCH_POLL_INTERVAL", 60)))
+
+        if state_path:
+            state = runner.run(state_path=state_path)
+        else:
+            if self.review_language is None:
+                self.select_language()
+            unprocessed_files = self.check_materials()
+            if not unprocessed_files:
+                return
+            state = runner.run(files=unprocessed_files)
+
+        jobs = state["jobs"].values()
+        success_count = sum(1 for job in jobs if job["moved"])
+        print(f"\n{'='*60}")
+        print("批处理完成！")
+        print(f"{'='*60}")
+        print(f"成功: {success_count} 个")
+        print(f"未完成: {len(jobs) - success_count} 个")
+
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="AI学术论文审稿系统")
+    parser.add_argument("--language", choices=["chinese", "english"], help="审稿语言（不指定时交互选择）")
+    parser.add_argument("--batch", action="store_true", help="通过Batch API离线批处理所有待处理文档")
+    parser.add_argument("--resume-batch", metavar="STATE_FILE", help="恢复已提交批处理的轮询和结果写回")
+    parser.add_argument("--watch", action="store_true", help="监视模式：常驻运行，自动处理放入material的新文档")
+    parser.add_argument("--rebuild-catalog", action="store_true",
+                        help="重新扫描material/review*文件夹重建材料目录（手动移动或删除过review文件夹时使用）")
+    parser.add_argument("--index-fingerprints", action="store_true",
+                        help="为已处理的文档建立近似重复索引（启用近似重复检测前处理的文档需运行一次）")
+    parser.add_argument("--revision", action="store_true",
+                        help="修改稿模式：对比上一轮的稿件，只针对修改内容和作者回复信审稿（不支持--batch）")
+    args = parser.parse_args()
+
     try:
         system = ReviewSystem()
-        system.run()
+        system.review_language = args.language
+        system.revision_mode = args.revision
+
+        if args.rebuild_catalog:
+            system.folder_manager.rebuild_catalog()
+        if args.index_fingerprints:
+            system.folder_manager.index_fingerprints()
+
+        if args.watch:
+            system.run_watch()
+        elif args.batch or args.resume_batch:
+            system.run_batch(args.resume_batch)
+        else:
+            system.run()
     except KeyboardInterrupt:
         print("\n\n程序已被用户中断")
         sys.exit(0)
@@ -0,0 +1,184 @@
+"""
+材料目录模块
+用SQLite记录每个文档（按内容哈希）对应的review编号和处理状态，
+启动时只需检查material根目录下的新文件，无需逐个扫描历史review文件夹；
+同时保存提取文本的MinHash签名及其LSH分段索引，用于查找近似重复的文档
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from near_duplicate import band_keys, pack_signature, similarity, unpack_signature
+
+# 处理状态
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"
+
+
+class MaterialCatalog:
+    """材料目录（material/catalog.sqlite3）"""
+
+    FILE_NAME = "catalog.sqlite3"
+
+    def __init__(self, db_path):
+        """
+        :param db_path: 数据库文件路径
+        """
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                hash TEXT PRIMARY KEY,
+                file_name TEXT NOT NULL,
+                review_number INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_review ON documents (review_number);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                hash TEXT PRIMARY KEY,
+                signature BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS lsh_buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                hash TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_lsh_buckets ON lsh_buckets (band, bucket);
+            CREATE INDEX IF NOT EXISTS idx_lsh_buckets_hash ON lsh_buckets (hash);
+            """
+        )
+        self._conn.commit()
+
+    def _get_meta(self, key, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def is_initialized(self):
+        """是否已完成首次全量扫描"""
+        with self._lock:
+            return self._get_meta("initialized") == "1"
+
+    def reset(self):
+        """清空目录（全量重建前调用）"""
+        with self._lock:
+            self._conn.execute("DELETE FROM documents")
+            self._conn.execute("DELETE FROM meta")
+            self._conn.commit()
+
+    def mark_initialized(self):
+        with self._lock:
+            self._set_meta("initialized", 1)
+            self._conn.commit()
+
+    def lookup(self, file_hash):
+        """
+        按内容哈希查询文档
+        :return: {"file_name", "review_number", "status"}，未收录时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_name, review_number, status FROM documents WHERE hash = ?", (file_hash,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"file_name": row[0], "review_number": row[1], "status": row[2]}
+
+    def record(self, file_hash, file_name, review_number, status):
+        """记录（或更新）文档的review编号和状态"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (hash, file_name, review_number, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (file_hash, file_name, review_number, status, time.time())
+            )
+            self._reserve(review_number)
+            self._conn.commit()
+
+    def reserve_review_number(self, review_number):
+        """记录已使用的review编号（编号只增不减）"""
+        with self._lock:
+            self._reserve(review_number)
+            self._conn.commit()
+
+    def _reserve(self, review_number):
+        if review_number > int(self._get_meta("max_review_number", 0)):
+            self._set_meta("max_review_number", review_number)
+
+    def next_review_number(self):
+        """下一个可用的review编号"""
+        with self._lock:
+            return int(self._get_meta("max_review_number", 0)) + 1
+
+    def has_fingerprint(self, file_hash):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM fingerprints WHERE hash = ?", (file_hash,)).fetchone() is not None
+
+    def record_fingerprint(self, file_hash, signature):
+        """记录（或更新）文档的MinHash签名及LSH分段"""
+        with self._lock:
+            self._conn.execute("DELETE FROM lsh_buckets WHERE hash = ?", (file_hash,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (hash, signature) VALUES (?, ?)",
+                (file_hash, pack_signature(signature))
+            )
+            self._conn.executemany(
+                "INSERT INTO lsh_buckets (band, bucket, hash) VALUES (?, ?, ?)",
+                [(band, bucket, file_hash) for band, bucket in band_keys(signature)]
+            )
+            self._conn.commit()
+
+    def find_similar(self, file_hash, signature, threshold, exhaustive=False, include_processing=False):
+        """
+        查找与签名近似的已处理文档（只比较至少一个LSH分段相同的候选）
+        :param file_hash: 当前文档的内容哈希（排除自身）
+        :param threshold: 估计相似度下限
+        :param exhaustive: 候选中没有达到阈值的文档时，逐个比较所有签名（阈值较低时LSH可能漏掉候选）
+        :param include_processing: 同时比较处理中且已记录签名的文档（同一批次中先提取完成的文档）
+        :return: {"hash", "file_name", "review_number", "status", "similarity"}，取最相似的一个（相同时优先已完成的）；
+                 没有时返回None
+        """
+        statuses = (STATUS_DONE, STATUS_PROCESSING) if include_processing else (STATUS_DONE,)
+        status_placeholders = ", ".join("?" * len(statuses))
+        keys = band_keys(signature)
+        placeholders = " OR ".join(["(b.band = ? AND b.bucket = ?)"] * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT d.hash, d.file_name, d.review_number, d.status, f.signature "
+                "FROM lsh_buckets b JOIN documents d ON d.hash = b.hash JOIN fingerprints f ON f.hash = b.hash "
+                f"WHERE ({placeholders}) AND d.status IN ({status_placeholders}) AND d.hash != ?",
+                [value for key in keys for value in key] + list(statuses) + [file_hash]
+            ).fetchall()
+            if exhaustive and not any(similarity(signature, unpack_signature(row[4])) >= threshold for row in rows):
+                rows = self._conn.execute(
+                    "SELECT d.hash, d.file_name, d.review_number, d.status, f.signature "
+                    "FROM fingerprints f JOIN documents d ON d.hash = f.hash "
+                    f"WHERE d.status IN ({status_placeholders}) AND d.hash != ?",
+                    list(statuses) + [file_hash]
+                ).fetchall()
+
+        best = None
+        for candidate_hash, file_name, review_number, status, data in rows:
+            score = similarity(signature, unpack_signature(data))
+            if score < threshold:
+                continue
+            if best is None or (score, status == STATUS_DONE) > (best["similarity"], best["status"] == STATUS_DONE):
+                best = {"hash": candidate_hash, "file_name": file_name, "review_number": review_number,
+                        "status": status, "similarity": score}
+        return best
+
+    def stats(self):
+        """各状态的文档数"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM documents GROUP BY status").fetchall()
+        return dict(rows)
@@ -0,0 +1,102 @@
+"""
+近似重复检测模块
+对提取的文本计算MinHash签名（单次哈希的MinHash：每个词组只哈希一次，按哈希值分到各个桶中取最小值），
+按LSH（局部敏感哈希）分段写入材料目录，新文档只需比较落在同一分段桶中的少数候选，
+文档数增长到数万篇时查询仍只需若干次索引查找
+"""
+
+import hashlib
+import os
+import re
+from array import array
+
+# 签名长度（桶数）
+NUM_HASHES = 128
+# LSH分段：32段 x 每段4个值，相似度0.7的文档对成为候选的概率超过99.9%，0.2的约5%
+BANDS = 32
+ROWS = NUM_HASHES // BANDS
+# 连续词数（中文按单字计）
+SHINGLE_SIZE = 3
+# 签名至少需要的词组数，过短的文本不计算签名
+MIN_SHINGLES = 50
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+HASH_MASK = (1 << 64) - 1
+
+
+def shingle_hashes(text):
+    """文本归一化（小写，只保留字母数字和汉字）后取连续SHINGLE_SIZE个词的64位哈希"""
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(tokens[i:i + SHINGLE_SIZE]).encode("utf-8"),
+                                       digest_size=8).digest(), "little")
+        for i in range(len(tokens) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(text):
+    """
+    计算文本的MinHash签名
+    哈希值的低位决定所在的桶，高位参与取最小值；空桶取其后第一个非空桶的值（按距离偏移，避免与该桶相同）
+    :return: NUM_HASHES个整数，文本过短时返回None
+    """
+    hashes = shingle_hashes(text)
+    if len(hashes) < MIN_SHINGLES:
+        return None
+
+    signature = [None] * NUM_HASHES
+    for value in hashes:
+        index = value % NUM_HASHES
+        rest = value // NUM_HASHES
+        if signature[index] is None or rest < signature[index]:
+            signature[index] = rest
+
+    if None in signature:
+        for index in range(NUM_HASHES):
+            if signature[index] is not None:
+                continue
+            distance = 1
+            while signature[(index + distance) % NUM_HASHES] is None:
+                distance += 1
+            donor = signature[(index + distance) % NUM_HASHES]
+            signature[index] = (donor + distance * 0x9E3779B97F4A7C15) & HASH_MASK
+    return signature
+
+
+def similarity(signature_a, signature_b):
+    """两个签名估计的Jaccard相似度"""
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / NUM_HASHES
+
+
+def band_keys(signature):
+    """
+    LSH分段键：每段ROWS个值哈希为一个整数（SQLite有符号64位）
+    :return: [(分段序号, 桶键)]
+    """
+    keys = []
+    for band in range(BANDS):
+        values = array("Q", signature[band * ROWS:(band + 1) * ROWS]).tobytes()
+        keys.append((band, int.from_bytes(hashlib.blake2b(values, digest_size=8).digest(), "little", signed=True)))
+    return keys
+
+
+def pack_signature(signature):
+    return array("Q", signature).tobytes()
+
+
+def unpack_signature(data):
+    return array("Q", data).tolist()
+
+
+def near_duplicate_settings():
+    """
+    读取近似重复检测配置
+    :return: (是否启用, 相似度阈值, 处理方式 flag/link)
+    """
+    enabled = os.getenv("NEAR_DUPLICATE", "1") != "0"
+    threshold = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.7))
+    action = os.getenv("NEAR_DUPLICATE_ACTION", "flag").lower()
+    if action not in ("flag", "link"):
+        print(f"⚠ NEAR_DUPLICATE_ACTION={action} 无效，改为 flag")
+        action = "flag"
+    return enabled, threshold, action
@@ -0,0 +1,172 @@
+"""
+解析后端注册模块
+按扩展名登记文档解析后端，后端模块在首次解析该类文件时才导入（启动时不加载PDF/Word解析库）
+
+第三方后端通过入口点（entry point）组 ai_reviewer.parsers 登记，入口点名称为扩展名，值为提取函数：
+
+    [project.entry-points."ai_reviewer.parsers"]
+    odt = "odt_parser:extract"
+
+也可以用环境变量 PARSER_BACKENDS 登记本地模块（逗号分隔）：
+
+    PARSER_BACKENDS=.doc=doc_converter:extract,.odt=odt_parser:extract
+
+提取函数接收文件路径，返回文本或 (文本, info)；info 中没有章节索引时按标题文本模式生成
+"""
+
+import importlib
+import os
+import threading
+from pathlib import Path
+
+ENTRY_POINT_GROUP = "ai_reviewer.parsers"
+
+
+class ParserBackend:
+    """一个解析后端：登记时只记录目标路径，首次使用时导入"""
+
+    def __init__(self, name, target, packages=(), version=None):
+        """
+        :param name: 后端名称（写入提取信息）
+        :param target: 提取函数的路径 "模块:属性"（属性可带点，如 "document_parser:DocumentParser.extract_pdf"）
+        :param packages: 后端依赖的发行包，其版本号计入提取缓存键（不导入包本身）
+        :param version: 后端版本标识（第三方后端为所在发行包的版本）
+        """
+        self.name = name
+        self.target = target
+        self.packages = tuple(packages)
+        self.version = version
+        self._extract = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """导入提取函数（只在首次调用时导入）"""
+        if self._extract is None:
+            with self._lock:
+                if self._extract is None:
+                    module_name, _, attribute = self.target.partition(":")
+                    extract = importlib.import_module(module_name)
+                    for part in attribute.split("."):
+                        extract = getattr(extract, part)
+                    self._extract = extract
+        return self._extract
+
+    def extract(self, file_path):
+        """
+        调用后端提取文本
+        :return: (text, info)，info包含backend、quality和sections
+        """
+        result = self.load()(file_path)
+        text, info = result if isinstance(result, tuple) else (result, {})
+        info = dict(info)
+        info.setdefault("backend", self.name)
+        info.setdefault("quality", None)
+        if info.get("sections") is None:
+            # 导入section_index会加载分块模块，只在第三方后端没有提供章节索引时导入
+            from section_index import build_section_index, find_text_headings
+            info["sections"] = build_section_index(text, find_text_headings(text))
+        return text, info
+
+    def version_tag(self):
+        """后端版本标识（读取发行包元数据，不导入后端模块）"""
+        versions = [f"{package}{package_version(package)}" for package in self.packages]
+        if self.version:
+            versions.append(self.version)
+        return "_".join([self.name] + versions)
+
+
+def package_version(package):
+    """发行包版本号（未安装时为空字符串）"""
+    from importlib import metadata
+
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return ""
+
+
+# 内置后端
+_backends = {
+    ".pdf": ParserBackend("pdf", "document_parser:DocumentParser.extract_pdf", ("pdfplumber", "PyPDF2")),
+    ".docx": ParserBackend("docx", "document_parser:DocumentParser.extract_docx", ("python-docx",)),
+}
+_plugins_loaded = False
+_plugins_lock = threading.Lock()
+
+
+def normalize_extension(extension):
+    extension = extension.strip().lower()
+    return extension if extension.startswith(".") else f".{extension}"
+
+
+def register_backend(extension, backend):
+    """
+    登记解析后端（已有后端的扩展名保留原后端）
+    :param extension: 扩展名（带不带点均可）
+    :return: 是否登记成功
+    """
+    extension = normalize_extension(extension)
+    if extension in _backends:
+        print(f"⚠ {extension} 已有解析后端（{_backends[extension].name}），忽略 {backend.target}")
+        return False
+    _backends[extension] = backend
+    return True
+
+
+def load_plugins():
+    """登记入口点和PARSER_BACKENDS中的第三方后端（只在首次需要时执行一次，不导入后端模块）"""
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    with _plugins_lock:
+        if _plugins_loaded:
+            return
+        from importlib import metadata
+        from dotenv import load_dotenv
+
+        # PARSER_BACKENDS可以写在.env中（登记可能早于AI客户端加载.env）
+        load_dotenv()
+        try:
+            entry_points = metadata.entry_points(group=ENTRY_POINT_GROUP)
+        except Exception as e:
+            print(f"⚠ 读取解析后端入口点失败: {e}")
+            entry_points = []
+        for entry_point in entry_points:
+            version = entry_point.dist.version if entry_point.dist else None
+            register_backend(entry_point.name, ParserBackend(entry_point.name.lstrip("."), entry_point.value,
+                                                             version=version))
+
+        for item in os.getenv("PARSER_BACKENDS", "").split(","):
+            extension, _, target = item.partition("=")
+            if not target.strip():
+                if item.strip():
+                    print(f"⚠ PARSER_BACKENDS 中的 {item.strip()} 格式无效（应为 扩展名=模块:函数）")
+                continue
+            extension = normalize_extension(extension)
+            register_backend(extension, ParserBackend(extension.lstrip("."), target.strip()))
+        _plugins_loaded = True
+
+
+def get_backend(file_path):
+    """
+    按文件扩展名查找解析后端
+    :return: ParserBackend，不支持时返回None
+    """
+    return backend_for_extension(Path(file_path).suffix)
+
+
+def backend_for_extension(extension):
+    """
+    按扩展名查找解析后端（内置后端无需读取入口点）
+    :return: ParserBackend，不支持时返回None
+    """
+    extension = extension.lower()
+    if extension not in _backends:
+        load_plugins()
+    return _backends.get(extension)
+
+
+def supported_extensions():
+    """所有支持的扩展名（含第三方后端）"""
+    load_plugins()
+    return list(_backends)
@@ -0,0 +1,128 @@
+"""
+流水线处理模块
+将文档处理拆分为三个阶段并发执行：
+1. 文本提取（CPU密集，进程池）
+2. AI解析与AI审稿（网络密集，有界线程池，同一文档的两个请求同时发出；两阶段审稿时审稿在解析完成后发出）
+3. 移动文件（主线程顺序执行；AI结果在各自请求完成时立即保存，流式模式下审稿意见边生成边写入）
+各阶段的具体步骤由ReviewSystem提供（start_job、run_ai_stage、finish_ai_stage、finalize_job），与逐个处理共用
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from document_parser import DocumentParser
+from transport import CallStats
+
+
+class ReviewJob:
+    """单个文档的处理任务"""
+
+    def __init__(self, file_path, review_number, material_review_path, response_review_path, journal=None):
+        self.file_path = file_path
+        self.review_number = review_number
+        self.material_review_path = material_review_path
+        self.response_review_path = response_review_path
+
+        self.document_text = None
+        self.parse_info = None
+        self.parse_result = None
+        self.review_result = None
+        # 修改稿审稿时的RevisionContext
+        self.revision = None
+        # 两阶段审稿时审稿请求等待AI解析完成
+        self.review_waiting = False
+        self.errors = []
+        self.pending_ai_calls = 0
+        self.success = False
+        # 该文档所有AI请求的次数、重试、等待时间和token用量（各阶段的统计同时汇总到这里）
+        self.call_stats = CallStats()
+        self.stage_stats = {
+            "ai_parse": CallStats(parent=self.call_stats),
+            "ai_review": CallStats(parent=self.call_stats),
+        }
+        self.started_at = None
+        # 处理日志（JobJournal），记录已完成的阶段
+        self.journal = journal
+        # 进度显示的标签（流水线中多个文档的输出交错，显示文件名）
+        self.label = None
+
+    def prefix(self):
+        """进度显示的前缀"""
+        return f"[{self.label}] " if self.label else ""
+
+
+class ReviewPipeline:
+    """分阶段并发处理流水线"""
+
+    def __init__(self, review_system, parse_workers=None, io_workers=None):
+        """
+        :param review_system: ReviewSystem实例（提供各阶段的处理方法）
+        :param parse_workers: 文本提取进程数，默认读取REVIEW_PARSE_WORKERS
+        :param io_workers: 同时进行的AI请求数上限，默认读取REVIEW_IO_WORKERS
+        """
+        self.review_system = review_system
+
+        self.parse_workers = parse_workers or int(
+            os.getenv("REVIEW_PARSE_WORKERS", min(4, os.cpu_count() or 1))
+        )
+        self.io_workers = io_workers or int(os.getenv("REVIEW_IO_WORKERS", 8))
+
+    def run(self, jobs):
+        """
+        执行流水线
+        :param jobs: ReviewJob列表
+        :return: 处理后的ReviewJob列表（job.success表示是否成功）
+        """
+        if not jobs:
+            return []
+
+        print(f"\n流水线启动：提取进程 {self.parse_workers} 个，AI并发 {self.io_workers} 个")
+
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as parse_pool, \
+                ThreadPoolExecutor(max_workers=self.io_workers) as io_pool:
+            # 阶段1：所有文档同时提交到进程池进行文本提取
+            futures = {}
+            for job in jobs:
+                job.started_at = time.perf_counter()
+                job.label = job.file_path.name
+                future = parse_pool.submit(DocumentParser.parse_with_info, job.file_path)
+                futures[future] = ("extract", job)
+
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, job = futures.pop(future)
+                    if stage == "extract":
+                        self._on_extracted(future, job, io_pool, futures)
+                    else:
+                        self._on_ai_finished(future, stage, job, io_pool, futures)
+
+        return jobs
+
+    def _on_extracted(self, future, job, io_pool, futures):
+        """文本提取完成：提交AI解析和AI审稿（两者互不依赖，同时发出；两阶段审稿时审稿在解析完成后发出）"""
+        stages = self.review_system.start_job(job, future.result)
+        for stage in stages:
+            if not (stage == "review" and job.review_waiting):
+                self._submit(job, stage, io_pool, futures)
+
+        if job.pending_ai_calls == 0:
+            self.review_system.finalize_job(job)
+
+    def _submit(self, job, stage, io_pool, futures):
+        """在I/O线程池中发出AI解析或审稿请求"""
+        future = io_pool.submit(self.review_system.run_ai_stage, job, stage)
+        futures[future] = (stage, job)
+        job.pending_ai_calls += 1
+
+    def _on_ai_finished(self, future, stage, job, io_pool, futures):
+        """AI请求完成：立即保存结果并记录到处理日志，所有请求都结束后进入最终阶段"""
+        self.review_system.finish_ai_stage(job, stage, future.result)
+
+        if stage == "parse" and job.review_waiting and not job.errors:
+            job.review_waiting = False
+            self._submit(job, "review", io_pool, futures)
+
+        job.pending_ai_calls -= 1
+        if job.pending_ai_calls == 0:
+            self.review_system.finalize_job(job)
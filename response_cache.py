@@ -0,0 +1,143 @@
+"""
+AI响应缓存模块
+以请求内容为键，将AI响应持久化到SQLite，重复运行同一文档时不再调用API
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+def get_cache_dir():
+    """缓存根目录，默认为当前目录下的.cache，可通过AI_CACHE_DIR修改"""
+    cache_dir = Path(os.getenv("AI_CACHE_DIR", ".cache"))
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def sha256_text(text):
+    """计算文本的SHA-256摘要"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """基于SQLite的AI响应缓存（线程安全）"""
+
+    def __init__(self, db_path=None, max_entries=None, max_age_days=None):
+        """
+        :param db_path: 数据库路径，默认为 <缓存目录>/responses.sqlite3
+        :param max_entries: 最多保留的条目数，默认读取AI_CACHE_MAX_ENTRIES
+        :param max_age_days: 条目最长保留天数，默认读取AI_CACHE_MAX_AGE_DAYS（0表示不过期）
+        """
+        self.db_path = Path(db_path) if db_path else get_cache_dir() / "responses.sqlite3"
+        self.max_entries = max_entries or int(os.getenv("AI_CACHE_MAX_ENTRIES", 5000))
+        if max_age_days is None:
+            max_age_days = float(os.getenv("AI_CACHE_MAX_AGE_DAYS", 30))
+        self.max_age = max_age_days * 86400
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model, base_url, system_prompt, user_content, temperature, max_tokens):
+        """
+        生成缓存键
+        覆盖模型、API端点、提示词摘要和生成参数，任一变化都会得到不同的键
+        """
+        payload = json.dumps({
+            "model": model,
+            "base_url": base_url,
+            "system": sha256_text(system_prompt),
+            "user": sha256_text(user_content),
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }, sort_keys=True)
+        return sha256_text(payload)
+
+    def get(self, key):
+        """查询缓存，未命中或已过期返回None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or (self.max_age and now - row[1] > self.max_age):
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, content):
+        """写入缓存并执行淘汰"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, content, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, content, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """淘汰过期条目，并按最近访问时间淘汰超出数量上限的条目"""
+        if self.max_age:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.max_age,))
+
+        self._conn.execute(
+            """
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,)
+        )
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+def test_response_cache():
+    """测试响应缓存"""
+    cache = ResponseCache()
+    print(f"缓存数据库: {cache.db_path}")
+
+    key = ResponseCache.make_key("test-model", "http://localhost", "system", "user", 0.3, 100)
+    print(f"首次查询: {cache.get(key)}")
+    cache.set(key, "cached response")
+    print(f"再次查询: {cache.get(key)}")
+    print(f"统计: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    test_response_cache()
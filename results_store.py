@@ -0,0 +1,348 @@
+"""
+结果库模块
+将每个AI解析文件和审稿文件按章节拆分后写入SQLite（response/results.sqlite3），
+FTS5全文索引覆盖中英文内容（中文按相邻两字切分），可按字段、审稿决定检索所有历史审稿结果
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# 结果文件类型：文件名中的标记
+RESULT_KINDS = {"parse": "解析文件", "review": "审稿文件"}
+
+# 章节字段（按顺序匹配标题，先匹配到的优先）
+FIELD_PATTERNS = [
+    ("topic", re.compile(r"研究主题|research topic", re.IGNORECASE)),
+    ("question", re.compile(r"研究问题|research question", re.IGNORECASE)),
+    ("literature", re.compile(r"文献综述|literature review", re.IGNORECASE)),
+    ("data", re.compile(r"数据|data", re.IGNORECASE)),
+    ("methods", re.compile(r"方法|研究设计|method|research design", re.IGNORECASE)),
+    ("analysis", re.compile(r"分析过程|analytical process", re.IGNORECASE)),
+    ("robustness", re.compile(r"稳健|robustness", re.IGNORECASE)),
+    ("conclusions", re.compile(r"结论|研究发现|conclusion|interpretation", re.IGNORECASE)),
+    ("limitations", re.compile(r"局限|limitation", re.IGNORECASE)),
+    ("writing", re.compile(r"写作|writing", re.IGNORECASE)),
+    ("innovation", re.compile(r"创新|innovation|originality", re.IGNORECASE)),
+    ("assessment", re.compile(r"总体评价|overall assessment", re.IGNORECASE)),
+    ("recommendation", re.compile(r"审稿建议|recommendation", re.IGNORECASE)),
+]
+
+# 审稿决定（按顺序匹配，如 "小修后接受" 归为 minor）
+DECISION_PATTERNS = [
+    ("reject", re.compile(r"拒稿|拒绝|reject", re.IGNORECASE)),
+    ("major", re.compile(r"大修|major", re.IGNORECASE)),
+    ("minor", re.compile(r"小修|minor", re.IGNORECASE)),
+    ("accept", re.compile(r"接受|accept", re.IGNORECASE)),
+]
+
+SECTION_HEADING = re.compile(r"^#{2,3}\s+(.+?)\s*$", re.MULTILINE)
+DECISION_LINE = re.compile(r"\*\*\s*(?:决定|Decision)\s*\*\*\s*[:：]?\s*(.+)", re.IGNORECASE)
+CJK_RUN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+QUERY_TERM = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def result_kind(file_name):
+    """按文件名判断结果类型（parse / review），不是结果文件时返回None"""
+    for kind, label in RESULT_KINDS.items():
+        if label in file_name:
+            return kind
+    return None
+
+
+def classify_field(heading):
+    """按章节标题判断字段，无法判断时返回other"""
+    for field, pattern in FIELD_PATTERNS:
+        if pattern.search(heading):
+            return field
+    return "other"
+
+
+def parse_decision(content):
+    """从审稿意见中提取审稿决定（accept / minor / major / reject），未找到时返回None"""
+    match = DECISION_LINE.search(content)
+    if not match:
+        return None
+    for decision, pattern in DECISION_PATTERNS:
+        if pattern.search(match.group(1)):
+            return decision
+    return None
+
+
+def split_result_sections(content):
+    """
+    按 ## / ### 标题拆分结果文本
+    :return: [(字段, 标题, 内容)]，首个标题前的内容标题为空；没有正文的标题（如 "## 审稿意见"）不单独成节
+    """
+    matches = list(SECTION_HEADING.finditer(content))
+    sections = []
+    preamble = content[:matches[0].start()] if matches else content
+    if preamble.strip():
+        sections.append(("other", "", preamble.strip()))
+    for match, following in zip(matches, matches[1:] + [None]):
+        body = content[match.end():following.start() if following else len(content)].strip()
+        if body:
+            heading = match.group(1).strip()
+            sections.append((classify_field(heading), heading, body))
+    return sections
+
+
+def segment(text):
+    """
+    建立索引和查询前的切分：连续的中文按相邻两字切分（"双重差分" -> "双重 重差 差分"），
+    FTS5的unicode61分词器会把整段中文当作一个词，切分后任意两字以上的中文词都能检索
+    """
+    def bigrams(match):
+        run = match.group(0)
+        if len(run) == 1:
+            return f" {run} "
+        return " " + " ".join(run[i:i + 2] for i in range(len(run) - 1)) + " "
+    return CJK_RUN.sub(bigrams, text)
+
+
+QUERY_OPERATORS = ("OR", "NOT", "AND")
+
+
+def build_match(query):
+    """
+    将检索词转换为FTS5查询：空格分隔的词同时出现（AND），引号内为短语，OR / NOT 原样保留，
+    以*结尾的英文词按前缀匹配
+    FTS5不接受开头或结尾的运算符：开头和结尾的OR / AND去掉，连续的运算符保留最后一个，
+    开头的 NOT a 移到其余条件之后（"NOT a b" 即 "b NOT a"）；只有排除条件时单独返回
+    :return: (FTS5查询, 排除条件)，排除条件为要排除的结果所匹配的FTS5查询（没有时为空字符串）
+    """
+    terms = []
+    for quoted, word in QUERY_TERM.findall(query):
+        if word in ("OR", "NOT", "AND"):
+            terms.append(word)
+            continue
+        text = quoted or word
+        prefix = not quoted and text.endswith("*")
+        tokens = re.findall(r"\w+", segment(text.rstrip("*")))
+        if not tokens:
+            continue
+        # 单个汉字不构成两字词，按前缀匹配以其开头的两字词
+        if len(tokens) == 1 and len(tokens[0]) == 1 and CJK_RUN.fullmatch(tokens[0]):
+            prefix = True
+        terms.append('"' + " ".join(tokens) + '"' + (" *" if prefix else ""))
+
+    cleaned = []
+    for term in terms:
+        if term in QUERY_OPERATORS and cleaned and cleaned[-1] in QUERY_OPERATORS:
+            cleaned[-1] = term
+        else:
+            cleaned.append(term)
+
+    excluded = []
+    while True:
+        while cleaned and cleaned[0] in ("OR", "AND"):
+            cleaned.pop(0)
+        while cleaned and cleaned[-1] in QUERY_OPERATORS:
+            cleaned.pop()
+        if len(cleaned) < 2 or cleaned[0] != "NOT":
+            break
+        excluded.append(cleaned[1])
+        cleaned = cleaned[2:]
+
+    if not cleaned:
+        return "", " OR ".join(excluded)
+    match = " ".join(cleaned)
+    if excluded:
+        match = f"({match})" + "".join(f" NOT {term}" for term in excluded)
+    return match, ""
+
+
+def query_words(query):
+    """检索词中用于定位摘要的词（去掉引号、运算符和前缀符号）"""
+    return [
+        (quoted or word).rstrip("*") for quoted, word in QUERY_TERM.findall(query)
+        if word not in ("OR", "NOT", "AND") and (quoted or word).rstrip("*")
+    ]
+
+
+def make_snippet(content, words, width=60):
+    """在原文中截取首个检索词附近的文字作为摘要"""
+    lowered = content.lower()
+    positions = [lowered.find(word.lower()) for word in words]
+    positions = [position for position in positions if position >= 0]
+    start = max(0, min(positions) - width // 2) if positions else 0
+    snippet = " ".join(content[start:start + width * 2].split())
+    return ("…" if start > 0 else "") + snippet + ("…" if start + width * 2 < len(content) else "")
+
+
+class ResultsStore:
+    """结果库（response/results.sqlite3）"""
+
+    FILE_NAME = "results.sqlite3"
+
+    def __init__(self, db_path):
+        """
+        :param db_path: 数据库文件路径
+        """
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY,
+                review_number INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                file_name TEXT NOT NULL,
+                document TEXT,
+                decision TEXT,
+                models TEXT,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER,
+                content TEXT NOT NULL,
+                saved_at REAL NOT NULL,
+                UNIQUE (review_number, kind)
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_decision ON results (decision);
+            CREATE TABLE IF NOT EXISTS sections (
+                id INTEGER PRIMARY KEY,
+                result_id INTEGER NOT NULL,
+                field TEXT NOT NULL,
+                heading TEXT NOT NULL,
+                content TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sections_result ON sections (result_id);
+            CREATE INDEX IF NOT EXISTS idx_sections_field ON sections (field);
+            CREATE VIRTUAL TABLE IF NOT EXISTS sections_fts USING fts5(
+                heading, content, tokenize = 'unicode61 remove_diacritics 2'
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def is_initialized(self):
+        """是否已导入过历史结果文件"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'initialized'").fetchone()
+        return row is not None and row[0] == "1"
+
+    def mark_initialized(self):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('initialized', '1')")
+            self._conn.commit()
+
+    def record(self, review_number, kind, file_name, content, document=None, models=None,
+               prompt_tokens=None, completion_tokens=None):
+        """
+        写入（或替换）一个结果文件的记录
+        :param kind: parse / review
+        :param document: 源文档文件名
+        :param models: 生成结果的模型列表
+        :param prompt_tokens: 输入token数（未知时为None）
+        """
+        decision = parse_decision(content) if kind == "review" else None
+        sections = split_result_sections(content)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM results WHERE review_number = ? AND kind = ?", (review_number, kind)
+            ).fetchone()
+            if row:
+                self._delete(row[0])
+            cursor = self._conn.execute(
+                "INSERT INTO results (review_number, kind, file_name, document, decision, models, "
+                "prompt_tokens, completion_tokens, content, saved_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (review_number, kind, file_name, document, decision, ",".join(models or []),
+                 prompt_tokens, completion_tokens, content, time.time())
+            )
+            result_id = cursor.lastrowid
+            for field, heading, body in sections:
+                section_id = self._conn.execute(
+                    "INSERT INTO sections (result_id, field, heading, content) VALUES (?, ?, ?, ?)",
+                    (result_id, field, heading, body)
+                ).lastrowid
+                self._conn.execute(
+                    "INSERT INTO sections_fts (rowid, heading, content) VALUES (?, ?, ?)",
+                    (section_id, segment(heading), segment(body))
+                )
+            self._conn.commit()
+        return decision
+
+    def _delete(self, result_id):
+        """删除结果及其章节（需持有锁）"""
+        self._conn.execute(
+            "DELETE FROM sections_fts WHERE rowid IN (SELECT id FROM sections WHERE result_id = ?)", (result_id,)
+        )
+        self._conn.execute("DELETE FROM sections WHERE result_id = ?", (result_id,))
+        self._conn.execute("DELETE FROM results WHERE id = ?", (result_id,))
+
+    def search(self, query=None, field=None, decision=None, kind=None, limit=20):
+        """
+        检索结果
+        :param query: 检索词（见build_match），为空时按review编号倒序列出符合条件的结果
+        :param field: 只在该字段的章节中检索（如 data、methods）
+        :param decision: 只返回该审稿决定的结果（按review编号关联，解析文件也可按决定筛选）
+        :param kind: parse / review
+        :return: [{"review_number", "kind", "document", "decision", "models", "field", "heading", "snippet"}]，
+                 每个结果文件只返回最相关的一个章节
+        """
+        conditions, params = [], []
+        if decision:
+            conditions.append("(SELECT decision FROM results d WHERE d.review_number = r.review_number "
+                              "AND d.kind = 'review') = ?")
+            params.append(decision)
+        if kind:
+            conditions.append("r.kind = ?")
+            params.append(kind)
+
+        match, exclude = build_match(query) if query else ("", "")
+        if exclude:
+            conditions.append("r.id NOT IN (SELECT result_id FROM sections WHERE id IN ("
+                              "SELECT rowid FROM sections_fts WHERE sections_fts MATCH ?))")
+            params.append(exclude)
+        if match:
+            sql = (
+                "SELECT r.review_number, r.kind, r.document, r.decision, r.models, s.field, s.heading, s.content, "
+                "MIN(m.rank) AS best FROM ("
+                "  SELECT rowid AS section_id, rank FROM sections_fts"
+                "  WHERE sections_fts MATCH ?"
+                ") m JOIN sections s ON s.id = m.section_id JOIN results r ON r.id = s.result_id"
+            )
+            params.insert(0, match)
+            if field:
+                conditions.append("s.field = ?")
+                params.append(field)
+            if conditions:
+                sql += " WHERE " + " AND ".join(conditions)
+            sql += " GROUP BY r.id ORDER BY best LIMIT ?"
+        else:
+            sql = (
+                "SELECT r.review_number, r.kind, r.document, r.decision, r.models, s.field, s.heading, s.content, 0 "
+                "FROM results r JOIN sections s ON s.id = ("
+                "  SELECT id FROM sections WHERE result_id = r.id" + (" AND field = ?" if field else "") +
+                "  ORDER BY id LIMIT 1)"
+            )
+            if field:
+                params.insert(0, field)
+            if conditions:
+                sql += " WHERE " + " AND ".join(conditions)
+            sql += " ORDER BY r.review_number DESC, r.kind LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        words = query_words(query) if query else []
+        return [
+            {"review_number": row[0], "kind": row[1], "document": row[2], "decision": row[3], "models": row[4],
+             "field": row[5], "heading": row[6], "snippet": make_snippet(row[7], words)}
+            for row in rows
+        ]
+
+    def stats(self):
+        """各类型结果数及审稿决定分布"""
+        with self._lock:
+            kinds = dict(self._conn.execute("SELECT kind, COUNT(*) FROM results GROUP BY kind").fetchall())
+            decisions = dict(self._conn.execute(
+                "SELECT COALESCE(decision, 'unknown'), COUNT(*) FROM results WHERE kind = 'review' GROUP BY decision"
+            ).fetchall())
+        return {"kinds": kinds, "decisions": decisions}
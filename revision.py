@@ -0,0 +1,205 @@
+"""
+修改稿模块
+修改稿（R1、R2）返回时，按提取文本的相似度找到上一轮的review，按章节对比两版文本，
+只把有变化的内容、上一轮的审稿意见和作者回复信交给AI，生成针对修改情况的审稿意见
+"""
+
+import difflib
+import re
+from pathlib import Path
+
+# 作者回复信：与稿件同名并带以下后缀（如 paper_R1.pdf 与 paper_R1_response.docx）
+RESPONSE_LETTER_SUFFIXES = ("_response", "_reply", "_rebuttal", "_回复", "_答复", "_修改说明")
+
+# 章节中变化的句子比例超过该值时发送修改后的整节，否则只发送增删的句子
+REWRITE_RATIO = 0.6
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?。！？；])\s+|\n+")
+TITLE_NUMBERING = re.compile(r"^[#\s]*(?:\d+(?:\.\d+)*\.?|[一二三四五六七八九十]+[、.]|[IVX]+\.)\s*")
+HAS_LETTER = re.compile(r"[A-Za-z\u4e00-\u9fff]")
+
+
+def letter_manuscript_stem(path):
+    """作者回复信对应的稿件文件名（不含扩展名），文件名不带回复信后缀时返回None"""
+    stem = Path(path).stem
+    for suffix in RESPONSE_LETTER_SUFFIXES:
+        if stem.lower().endswith(suffix) and len(stem) > len(suffix):
+            return stem[:-len(suffix)]
+    return None
+
+
+def find_response_letter(file_path, extensions):
+    """
+    查找稿件的作者回复信（同一文件夹中同名带回复信后缀的文件）
+    :param extensions: 支持的扩展名
+    :return: 回复信路径，没有时返回None
+    """
+    file_path = Path(file_path)
+    for suffix in RESPONSE_LETTER_SUFFIXES:
+        for extension in extensions:
+            candidate = file_path.with_name(f"{file_path.stem}{suffix}{extension}")
+            if candidate.exists():
+                return candidate
+    return None
+
+
+def normalize_title(title):
+    """去掉编号和多余空白后的小写标题（"3. Data" 与 "4 Data" 视为同一章节）"""
+    return " ".join(TITLE_NUMBERING.sub("", title).split()).lower()
+
+
+def split_sentences(text):
+    """按句切分并合并空白，去掉不含文字的片段（页码、表格数字等）"""
+    return [" ".join(part.split()) for part in SENTENCE_BOUNDARY.split(text) if HAS_LETTER.search(part)]
+
+
+def section_texts(text, sections):
+    """
+    按章节索引切分文本
+    :return: [(标题, 类别, 正文)]，正文不含标题行；没有章节索引时整篇为一节
+    """
+    if not sections:
+        return [("", "front", text)]
+    parts = []
+    for section in sections:
+        body = text[section["start"]:section["end"]]
+        if section["title"]:
+            body = body.partition("\n")[2]
+        parts.append((section["title"], section["label"], body))
+    return parts
+
+
+def match_sections(old_sections, new_sections):
+    """
+    对应两版的章节：先按标题，标题改动时按类别匹配第一个未对应的同类章节
+    :return: [(旧章节或None, 新章节或None)]，按新稿顺序，删除的章节附在最后
+    """
+    by_title = {}
+    for index, (title, _, _) in enumerate(old_sections):
+        by_title.setdefault(normalize_title(title), index)
+
+    used = set()
+    pairs = []
+    for section in new_sections:
+        index = by_title.get(normalize_title(section[0]))
+        if index is None or index in used:
+            index = next((
+                i for i, old in enumerate(old_sections)
+                if i not in used and section[1] != "other" and old[1] == section[1]
+            ), None)
+        if index is not None:
+            used.add(index)
+        pairs.append((old_sections[index] if index is not None else None, section))
+
+    pairs += [(old, None) for index, old in enumerate(old_sections) if index not in used]
+    return pairs
+
+
+def diff_sections(old_text, old_sections, new_text, new_sections):
+    """
+    按章节对比两版文本（以句为单位）
+    :param old_sections: 上一版的章节索引（section_index.build_section_index）
+    :return: [{"title", "label", "status", "ratio", "added", "removed", "text"}]，
+             label 为章节类别，status 为 unchanged / modified / added / removed，ratio 为变化的句子比例，
+             added / removed 为新增（含改写后）和删除（含改写前）的句子，text 为修改后的整节正文
+    """
+    changes = []
+    pairs = match_sections(section_texts(old_text, old_sections), section_texts(new_text, new_sections))
+    for old, new in pairs:
+        title = (new or old)[0] or "(title page)"
+        label = (new or old)[1]
+        if old is None:
+            changes.append({"title": title, "label": label, "status": "added", "ratio": 1.0, "added": split_sentences(new[2]),
+                            "removed": [], "text": new[2].strip()})
+            continue
+        if new is None:
+            changes.append({"title": title, "label": label, "status": "removed", "ratio": 1.0, "added": [],
+                            "removed": split_sentences(old[2]), "text": ""})
+            continue
+
+        old_sentences, new_sentences = split_sentences(old[2]), split_sentences(new[2])
+        matcher = difflib.SequenceMatcher(None, old_sentences, new_sentences, autojunk=False)
+        added, removed = [], []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag != "equal":
+                removed += old_sentences[i1:i2]
+                added += new_sentences[j1:j2]
+        changes.append({
+            "title": title,
+            "label": label,
+            "status": "modified" if added or removed else "unchanged",
+            "ratio": round(1 - matcher.ratio(), 3),
+            "added": added,
+            "removed": removed,
+            "text": new[2].strip(),
+        })
+    return changes
+
+
+def render_changes(changes, omit=()):
+    """
+    将章节对比结果整理为提示词中的修改内容（未修改的章节只列出标题）
+    :param omit: 省略的章节类别（如参考文献、附录），这些章节的修改只列出标题，不展示内容
+    """
+    unchanged = [change["title"] for change in changes if change["status"] == "unchanged"]
+    omitted = [change for change in changes if change["status"] != "unchanged" and change["label"] in omit]
+    parts = []
+    if unchanged:
+        parts.append("Sections without any textual change: " + "; ".join(unchanged))
+    if omitted:
+        parts.append("Changed sections whose content is not shown (back matter): " + "; ".join(
+            f"{change['title']} ({change['status']})" for change in omitted
+        ))
+
+    for change in changes:
+        status = change["status"]
+        if status == "unchanged" or change["label"] in omit:
+            continue
+        if status == "added":
+            parts.append(f"### {change['title']} [NEW SECTION]\n{change['text']}")
+        elif status == "removed":
+            parts.append(f"### {change['title']} [SECTION REMOVED]")
+        elif change["ratio"] > REWRITE_RATIO:
+            parts.append(f"### {change['title']} [LARGELY REWRITTEN — revised text]\n{change['text']}")
+        else:
+            lines = [f"### {change['title']} [MODIFIED — {change['ratio']:.0%} of sentences changed]"]
+            lines += [f"- REMOVED: {sentence}" for sentence in change["removed"]]
+            lines += [f"+ ADDED: {sentence}" for sentence in change["added"]]
+            parts.append("\n".join(lines))
+
+    if all(change["status"] == "unchanged" for change in changes):
+        parts.append("No textual changes were detected between the two versions.")
+    return "\n\n".join(parts)
+
+
+class RevisionContext:
+    """修改稿审稿所需的信息"""
+
+    def __init__(self, previous_number, previous_file, similarity, changes, previous_review,
+                 previous_parse=None, response_letter=None):
+        """
+        :param previous_number: 上一轮的review编号
+        :param previous_file: 上一轮的稿件文件名
+        :param similarity: 两版文本的估计相似度
+        :param changes: diff_sections的结果
+        :param previous_review: 上一轮的审稿意见
+        :param previous_parse: 上一轮的AI解析结果（没有时为None）
+        :param response_letter: 作者回复信文本（没有时为None）
+        """
+        self.previous_number = previous_number
+        self.previous_file = previous_file
+        self.similarity = similarity
+        self.changes = changes
+        self.previous_review = previous_review
+        self.previous_parse = previous_parse
+        self.response_letter = response_letter
+
+    def render_changes(self, omit=()):
+        return render_changes(self.changes, omit)
+
+    def summary(self):
+        counts = {}
+        for change in self.changes:
+            counts[change["status"]] = counts.get(change["status"], 0) + 1
+        return (f"修改 {counts.get('modified', 0)} 节，新增 {counts.get('added', 0)} 节，"
+                f"删除 {counts.get('removed', 0)} 节，未修改 {counts.get('unchanged', 0)} 节")
@@ -0,0 +1,76 @@
+"""
+结果检索工具
+在结果库（response/results.sqlite3）中全文检索所有历史解析文件和审稿意见
+
+用法（在项目根目录运行）：
+    python search_results.py 双重差分
+    python search_results.py "instrumental variable" --field methods --decision reject
+    python search_results.py CFPS OR CHARLS --field data --kind parse
+    python search_results.py --decision accept          # 不带检索词时列出符合条件的结果
+    python search_results.py --stats
+    python search_results.py --reindex                  # 重新导入response/review*/中的结果文件
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from results_store import DECISION_PATTERNS, FIELD_PATTERNS, RESULT_KINDS, ResultsStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全文检索历史审稿结果")
+    parser.add_argument("query", nargs="*", help="检索词（空格分隔的词同时出现；引号内为短语；支持OR / NOT）")
+    parser.add_argument("--field", choices=[field for field, _ in FIELD_PATTERNS] + ["other"],
+                        help="只在该字段的章节中检索")
+    parser.add_argument("--decision", choices=[decision for decision, _ in DECISION_PATTERNS], help="按审稿决定筛选")
+    parser.add_argument("--kind", choices=list(RESULT_KINDS), help="parse: 解析文件；review: 审稿文件")
+    parser.add_argument("--limit", type=int, default=20, help="最多返回的结果数")
+    parser.add_argument("--response-dir", default="response", help="response目录")
+    parser.add_argument("--stats", action="store_true", help="显示结果库统计")
+    parser.add_argument("--reindex", action="store_true", help="重新导入所有结果文件")
+    args = parser.parse_args()
+
+    response_dir = Path(args.response_dir)
+    if args.reindex:
+        # 仅重建时需要（导入文档解析依赖较慢，检索时不导入）
+        from folder_manager import FolderManager
+        folder_manager = FolderManager(response_dir.resolve().parent)
+        count = folder_manager.rebuild_results()
+        print(f"✓ 已导入 {count} 个结果文件")
+        return
+
+    db_path = response_dir / ResultsStore.FILE_NAME
+    if not db_path.exists():
+        print(f"❌ 结果库不存在: {db_path}（运行一次审稿或使用 --reindex 建立）")
+        sys.exit(1)
+    store = ResultsStore(db_path)
+
+    if args.stats:
+        stats = store.stats()
+        print(f"解析文件 {stats['kinds'].get('parse', 0)} 个，审稿文件 {stats['kinds'].get('review', 0)} 个")
+        for decision, count in sorted(stats["decisions"].items()):
+            print(f"  {decision:<10}{count:>6}")
+        return
+
+    query = " ".join(args.query)
+    start = time.perf_counter()
+    try:
+        results = store.search(query, args.field, args.decision, args.kind, args.limit)
+    except sqlite3.OperationalError as e:
+        print(f"❌ 检索词格式有误: {query}（{e}）")
+        print("   空格分隔的词同时出现，引号内为短语，OR / NOT 连接两个检索词，如: CFPS OR CHARLS、面板 NOT CFPS")
+        sys.exit(1)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    for result in results:
+        heading = f" · {result['heading']}" if result["heading"] else ""
+        decision = f" [{result['decision']}]" if result["decision"] else ""
+        print(f"review{result['review_number']} {result['kind']}{decision} {result['document'] or ''}{heading}")
+        print(f"    {result['snippet']}")
+    print(f"\n找到 {len(results)} 个结果（{elapsed:.1f} 毫秒）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+章节索引模块
+在文本提取时识别章节标题（PDF按字号和粗体，Word按段落样式，均未识别时按标题文本模式），
+生成每个章节的类别、字符偏移和页码，供构建提示词时只保留需要的章节
+"""
+
+import bisect
+import re
+from collections import Counter
+from text_chunker import HEADING_PATTERN
+
+# 章节类别（按顺序匹配，先匹配到的优先；例如 "Results and Discussion" 归为 results）
+LABEL_PATTERNS = [
+    ("references", re.compile(r"references|bibliography|works cited|literature cited|参考文献", re.IGNORECASE)),
+    ("acknowledgements", re.compile(r"acknowledge?ments?|致\s*谢", re.IGNORECASE)),
+    ("appendix", re.compile(r"appendi(?:x|ces)|supplementa|附\s*录", re.IGNORECASE)),
+    ("abstract", re.compile(r"abstract|摘\s*要", re.IGNORECASE)),
+    ("introduction", re.compile(r"introduction|引\s*言|导\s*论|绪\s*论|前\s*言", re.IGNORECASE)),
+    ("conclusion", re.compile(r"conclu|结\s*论|结\s*语|总\s*结", re.IGNORECASE)),
+    ("results", re.compile(
+        r"result|finding|estimates|robust|heterogene|mechanism|结果|发现|稳健|异质|机制|实证分析", re.IGNORECASE
+    )),
+    ("discussion", re.compile(r"discussion|implication|limitation|讨\s*论|启\s*示|局\s*限", re.IGNORECASE)),
+    ("methods", re.compile(
+        r"method|data|design|sample|model|identification|estimation|strategy|experiment|material|specification"
+        r"|方法|数据|样本|模型|设计|识别|实证策略",
+        re.IGNORECASE
+    )),
+]
+
+# 发送给AI时默认省略的章节类别
+BACK_MATTER_LABELS = ("references", "acknowledgements", "appendix")
+
+# 标题字号至少为正文字号的倍数
+HEADING_SIZE_RATIO = 1.15
+
+NUMBERING_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)*)\.?\s")
+
+# 参考文献条目的特征：et al.、年份、卷(期):页码、姓名后的首字母缩写（如 "Smith J," "Wang L."）
+CITATION_PATTERN = re.compile(
+    r"\bet al\b|\b(?:1[89]|20)\d{2}[a-z]?\b|\d+\s*(?:\(\d+\))?\s*:\s*\d+"
+    r"|\b[A-Z][a-z]+,?\s+(?:[A-Z]\.?\s?){1,3}(?:[,.;]|$)"
+)
+
+
+def classify_heading(title):
+    """按标题文本判断章节类别，无法判断时返回other"""
+    for label, pattern in LABEL_PATTERNS:
+        if pattern.search(title):
+            return label
+    return "other"
+
+
+def numbering_level(title):
+    """按编号判断标题层级（2 -> 1，2.1 -> 2），无编号时为1"""
+    match = NUMBERING_PATTERN.match(title)
+    return match.group(1).count(".") + 1 if match else 1
+
+
+def drop_reference_entries(headings):
+    """
+    去掉参考文献中被误识别为标题的编号条目（如 "2. Wang L. Panel data methods"）
+    参考文献标题之后，带编号的标题须延续正文的章节编号（下一章或当前章的小节），且不像文献条目
+    :param headings: [(字符偏移, 标题, 层级)]
+    :return: 过滤后的标题列表
+    """
+    kept = []
+    in_references = False
+    last_number = None
+    for offset, title, level in headings:
+        match = NUMBERING_PATTERN.match(title)
+        number = int(match.group(1).split(".")[0]) if match else None
+        if in_references and match:
+            continues = last_number is not None and (
+                number == last_number + 1 or (number == last_number and "." in match.group(1))
+            )
+            if not continues or CITATION_PATTERN.search(title[match.end():]):
+                continue
+        if number is not None:
+            last_number = number
+        if classify_heading(title) == "references":
+            in_references = True
+        kept.append((offset, title, level))
+    return kept
+
+
+def find_text_headings(text):
+    """
+    按标题文本模式查找章节标题（无版面信息时使用）
+    :return: [(字符偏移, 标题, 层级)]
+    """
+    headings = []
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        if len(line) < 100 and HEADING_PATTERN.match(line):
+            title = line.strip()
+            headings.append((offset, title, numbering_level(title)))
+        offset += len(line)
+    return drop_reference_entries(headings)
+
+
+def page_layout(page):
+    """
+    统计pdfplumber页面的正文字号分布以及每个短行的字号和是否粗体
+    行按字符的top坐标聚合，行签名为去掉空白后的文本（用于与提取文本中的行对应）
+    :return: {"sizes": {字号: 字符数}, "lines": [(签名, 字号, 是否粗体)]}
+    """
+    sizes = Counter()
+    lines = []
+    groups = []
+    for char in sorted(page.chars, key=lambda item: item["top"]):
+        if groups and char["top"] - groups[-1][0]["top"] <= 3:
+            groups[-1].append(char)
+        else:
+            groups.append([char])
+
+    for group in groups:
+        visible = [char for char in group if not char["text"].isspace()]
+        if not visible:
+            continue
+        line_sizes = Counter(round(char["size"], 1) for char in visible)
+        sizes.update(line_sizes)
+        signature = "".join(char["text"] for char in sorted(visible, key=lambda item: item["x0"]))
+        if 2 <= len(signature) <= 100:
+            bold = all(
+                any(weight in char.get("fontname", "").lower() for weight in ("bold", "black", "heavy"))
+                for char in visible
+            )
+            lines.append((signature, line_sizes.most_common(1)[0][0], bold))
+
+    return {"sizes": dict(sizes), "lines": lines}
+
+
+def find_font_headings(page_texts, layouts, page_offsets):
+    """
+    按字号和粗体查找PDF章节标题
+    字号明显大于正文的短行视为标题；与正文同字号的整行粗体需同时符合标题文本模式；
+    连续多行同字号标题（如跨行的论文题目）合并为一个
+    :param page_texts: 每页文本
+    :param layouts: 每页的page_layout结果
+    :param page_offsets: 每页文本在全文中的起始偏移（空页为None）
+    :return: [(字符偏移, 标题, 层级)]，识别结果不可靠时返回空列表
+    """
+    sizes = Counter()
+    for layout in layouts:
+        sizes.update(layout["sizes"])
+    if not sizes:
+        return []
+    body_size = sizes.most_common(1)[0][0]
+
+    candidates = []
+    for page_text, layout, page_offset in zip(page_texts, layouts, page_offsets):
+        if page_offset is None:
+            continue
+        styles = {signature: (size, bold) for signature, size, bold in layout["lines"]}
+        offset = page_offset
+        previous = None
+        for line in page_text.splitlines(keepends=True):
+            style = styles.get("".join(line.split()))
+            is_heading = False
+            if style and re.search(r"[A-Za-z\u4e00-\u9fff]", line) and len(line) < 100:
+                size, bold = style
+                is_heading = size >= body_size * HEADING_SIZE_RATIO or (
+                    bold and size >= body_size and HEADING_PATTERN.match(line)
+                )
+            if is_heading and previous == style:
+                # 与上一行同字号的标题行视为上一标题的续行
+                pass
+            elif is_heading:
+                candidates.append((offset, line.strip(), style[0]))
+            previous = style if is_heading else None
+            offset += len(line)
+
+    candidates = drop_reference_entries(candidates)
+    # 数量过多说明字号差异不是标题（如大字号的图表文字），放弃版面线索
+    if len(candidates) < 2 or len(candidates) > max(20, 2 * len(page_texts)):
+        return []
+
+    heading_sizes = sorted({size for _, _, size in candidates}, reverse=True)
+    return [(offset, title, heading_sizes.index(size) + 1) for offset, title, size in candidates]
+
+
+def docx_heading_level(paragraph):
+    """按段落样式判断Word标题层级（Title为0，Heading N / 标题 N 为N），不是标题返回None"""
+    style = paragraph.style
+    name = (style.name if style is not None else "") or ""
+    if name.lower() == "title":
+        return 0
+    match = re.match(r"(?:heading|标题)\s*(\d)", name, re.IGNORECASE)
+    return int(match.group(1)) if match else None
+
+
+def build_section_index(text, headings, page_starts=None):
+    """
+    由标题位置生成章节索引
+    未识别出类别的小节沿用所属上级章节的类别（如 "4.2 Sample" 位于 "4. Methods" 下）
+    :param headings: [(字符偏移, 标题, 层级)]，按偏移排序
+    :param page_starts: [(字符偏移, 页码)]，按偏移排序；为None时不记录页码
+    :return: [{"title", "label", "level", "start", "end", "page_start", "page_end"}]，
+             首个标题前的内容（题目、作者等）为标题为空、类别为"front"的章节
+    """
+    def page_at(offset):
+        if not page_starts:
+            return None
+        index = bisect.bisect_right([start for start, _ in page_starts], offset) - 1
+        return page_starts[max(index, 0)][1]
+
+    entries = []
+    if not headings or text[:headings[0][0]].strip():
+        entries.append({"title": "", "label": "front", "level": 0, "start": 0})
+
+    parents = []
+    for offset, title, level in headings:
+        label = classify_heading(title)
+        while parents and parents[-1][0] >= level:
+            parents.pop()
+        if label == "other" and parents and parents[-1][1] not in ("other", "front"):
+            label = parents[-1][1]
+        parents.append((level, label))
+        entries.append({"title": title, "label": label, "level": level, "start": offset})
+
+    for entry, following in zip(entries, entries[1:] + [None]):
+        entry["end"] = following["start"] if following else len(text)
+        entry["page_start"] = page_at(entry["start"])
+        entry["page_end"] = page_at(max(entry["start"], entry["end"] - 1))
+    return [entry for entry in entries if entry["end"] > entry["start"]]
+
+
+def render_sections(text, sections, omit=BACK_MATTER_LABELS):
+    """
+    按章节索引整理文本：标题行改为Markdown标题（分块和两阶段审稿据此切分章节），
+    omit中的章节只保留标题和一行省略说明
+    """
+    parts = []
+    for section in sections:
+        body = text[section["start"]:section["end"]]
+        if not section["title"]:
+            parts.append(body)
+            continue
+        heading_line, _, rest = body.partition("\n")
+        heading = f"{'#' * max(1, min(section['level'], 3))} {heading_line.strip()}\n"
+        if section["label"] in omit:
+            parts.append(f"{heading}[section omitted]\n\n")
+        else:
+            parts.append(heading + rest)
+    return "".join(parts)
+
+
+def test_section_index():
+    """检查按标题文本模式生成的章节索引（参考文献中的编号条目不应被识别为章节）"""
+    text = (
+        "A Study of Firms\n"
+        "1. Introduction\nWe study firms.\n"
+        "2. Data and Methods\nWe use panel data.\n"
+        "3. Results\nEffects are large.\n"
+        "References\n"
+        "1. Smith J, Brown K. Firm growth and policy. J Econ. 2019;12:1-20.\n"
+        "2. Wang L. Panel data methods\n"
+        "3. Chen X, Li Y. Difference in differences\n"
+        "4. Zhang Q. Results of a household survey\n"
+        "Appendix\nTable A1.\n"
+    )
+    sections = build_section_index(text, find_text_headings(text))
+    titles = [(section["title"], section["label"]) for section in sections]
+    for title, label in titles:
+        print(f"{label:<18}{title}")
+
+    assert titles == [
+        ("", "front"),
+        ("1. Introduction", "introduction"),
+        ("2. Data and Methods", "methods"),
+        ("3. Results", "results"),
+        ("References", "references"),
+        ("Appendix", "appendix"),
+    ], titles
+    references = sections[4]
+    assert "Difference in differences" in text[references["start"]:references["end"]]
+    print("✓ 参考文献条目未被识别为章节")
+
+
+if __name__ == "__main__":
+    test_section_index()
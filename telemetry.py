@@ -0,0 +1,197 @@
+"""
+运行指标模块
+记录每个文档各阶段（文本提取、AI解析、审稿、保存、移动）的耗时、token用量、模型、重试、模型切换和对冲次数、估算费用：
+- 逐条写入JSON Lines（<缓存目录>/telemetry.jsonl）
+- 累计指标写入Prometheus textfile（<缓存目录>/review_metrics.prom，可由node_exporter的textfile collector采集）
+- 运行结束时输出汇总
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from response_cache import get_cache_dir
+
+
+def load_prices():
+    """
+    读取模型价格（美元/百万token）
+    AI_PRICE_INPUT_PER_1M / AI_PRICE_OUTPUT_PER_1M 为默认价格，
+    AI_PRICES 可按模型覆盖，例如 {"openai/gpt-4o": [2.5, 10]}
+    """
+    default = (float(os.getenv("AI_PRICE_INPUT_PER_1M", 0)), float(os.getenv("AI_PRICE_OUTPUT_PER_1M", 0)))
+    prices = {}
+    try:
+        for model, (input_price, output_price) in json.loads(os.getenv("AI_PRICES", "{}")).items():
+            prices[model] = (float(input_price), float(output_price))
+    except (ValueError, TypeError):
+        print("⚠ AI_PRICES 格式错误，已忽略")
+    return default, prices
+
+
+class Telemetry:
+    """运行指标记录器（多线程共享同一实例）"""
+
+    def __init__(self, jsonl_path=None, prom_path=None):
+        """
+        :param jsonl_path: JSON Lines文件路径，默认读取TELEMETRY_FILE
+        :param prom_path: Prometheus textfile路径，默认读取TELEMETRY_PROM_FILE
+        """
+        self.enabled = os.getenv("TELEMETRY", "1") != "0"
+        cache_dir = get_cache_dir()
+        self.jsonl_path = Path(jsonl_path or os.getenv("TELEMETRY_FILE") or cache_dir / "telemetry.jsonl")
+        self.prom_path = Path(prom_path or os.getenv("TELEMETRY_PROM_FILE") or cache_dir / "review_metrics.prom")
+        self.default_price, self.prices = load_prices()
+
+        self._lock = threading.Lock()
+        # 本次运行的累计值：(stage, status) -> 汇总
+        self.totals = {}
+
+    def estimate_cost(self, model, prompt_tokens, completion_tokens):
+        """估算费用（美元），未配置价格时为0"""
+        input_price, output_price = self.prices.get(model, self.default_price)
+        return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+    def record(self, stage, seconds, document=None, review_number=None, status="ok", stats=None, **extra):
+        """
+        记录一个阶段
+        :param stage: 阶段名（extract / ai_parse / ai_review / save / move / document）
+        :param seconds: 耗时（秒）
+        :param stats: 该阶段的CallStats（AI阶段提供，用于记录token、模型、重试和费用）
+        :param extra: 其他字段（如文本提取后端、页数）
+        """
+        if not self.enabled:
+            return
+
+        record = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "stage": stage,
+            "document": document,
+            "review_number": review_number,
+            "status": status,
+            "seconds": round(seconds, 3),
+        }
+        prompt_tokens = completion_tokens = 0
+        cost = 0.0
+        if stats is not None:
+            usage = stats.usage_snapshot()
+            for model, tokens in usage.items():
+                prompt_tokens += tokens["prompt_tokens"]
+                completion_tokens += tokens["completion_tokens"]
+                cost += self.estimate_cost(model, tokens["prompt_tokens"], tokens["completion_tokens"])
+            record.update({
+                "models": sorted(usage),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cost_usd": round(cost, 6),
+                "attempts": stats.attempts,
+                "retries": stats.retries,
+                "wait_seconds": round(stats.wait_seconds, 3),
+                "cache_hits": stats.cache_hits,
+                "fallbacks": stats.routing()["fallbacks"],
+                "hedges": stats.hedges,
+            })
+        record.update(extra)
+
+        with self._lock:
+            total = self.totals.setdefault((stage, status), {
+                "count": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0,
+                "cost_usd": 0.0, "retries": 0, "fallbacks": 0, "hedges": 0,
+            })
+            total["count"] += 1
+            total["seconds"] += seconds
+            total["prompt_tokens"] += prompt_tokens
+            total["completion_tokens"] += completion_tokens
+            total["cost_usd"] += cost
+            total["retries"] += record.get("retries", 0)
+            total["fallbacks"] += len(record.get("fallbacks", []))
+            total["hedges"] += record.get("hedges", 0)
+
+            try:
+                self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._write_prometheus()
+            except OSError as e:
+                print(f"⚠ 运行指标写入失败: {e}")
+
+    @contextmanager
+    def stage(self, stage, document=None, review_number=None, stats=None, **extra):
+        """
+        记录代码块的耗时（代码块抛出异常时状态为error）
+        用法：with telemetry.stage("extract", file_name, review_number) as fields: fields["backend"] = ...
+        :return: 附加字段字典，代码块中可以补充字段
+        """
+        fields = dict(extra)
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield fields
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - start, document, review_number, status, stats, **fields)
+
+    def _write_prometheus(self):
+        """将累计值写入Prometheus textfile（先写临时文件再原子替换，需持有锁）"""
+        metrics = [
+            ("review_stage_runs_total", "counter", "Stage executions", "count"),
+            ("review_stage_seconds_total", "counter", "Wall time spent in each stage", "seconds"),
+            ("review_prompt_tokens_total", "counter", "Prompt tokens sent", "prompt_tokens"),
+            ("review_completion_tokens_total", "counter", "Completion tokens received", "completion_tokens"),
+            ("review_cost_usd_total", "counter", "Estimated API cost in USD", "cost_usd"),
+            ("review_api_retries_total", "counter", "API request retries", "retries"),
+            ("review_model_fallbacks_total", "counter", "Switches to a fallback model", "fallbacks"),
+            ("review_hedged_requests_total", "counter", "Hedged requests sent after a slow first token", "hedges"),
+        ]
+        lines = []
+        for name, metric_type, description, key in metrics:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for (stage, status), total in sorted(self.totals.items()):
+                lines.append(f'{name}{{stage="{stage}",status="{status}"}} {total[key]:g}')
+
+        tmp_path = self.prom_path.with_name(self.prom_path.name + ".tmp")
+        tmp_path.write_text("\n".join(lines) + "\n", encoding='utf-8')
+        os.replace(tmp_path, self.prom_path)
+
+    def print_summary(self):
+        """输出本次运行各阶段的汇总"""
+        if not self.enabled or not self.totals:
+            return
+
+        with self._lock:
+            totals = dict(self.totals)
+
+        print("\n阶段统计:")
+        print(f"  {'阶段':<10}{'次数':>6}{'失败':>6}{'总耗时(秒)':>12}{'平均(秒)':>10}"
+              f"{'输入tokens':>12}{'输出tokens':>12}{'费用($)':>10}")
+        stages = sorted({stage for stage, _ in totals}, key=lambda name: STAGE_ORDER.get(name, len(STAGE_ORDER)))
+        grand = {"prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+        for stage in stages:
+            ok = totals.get((stage, "ok"), {})
+            error = totals.get((stage, "error"), {})
+            count = ok.get("count", 0) + error.get("count", 0)
+            seconds = ok.get("seconds", 0.0) + error.get("seconds", 0.0)
+            prompt_tokens = ok.get("prompt_tokens", 0) + error.get("prompt_tokens", 0)
+            completion_tokens = ok.get("completion_tokens", 0) + error.get("completion_tokens", 0)
+            cost = ok.get("cost_usd", 0.0) + error.get("cost_usd", 0.0)
+            print(f"  {stage:<10}{count:>6}{error.get('count', 0):>6}{seconds:>12.1f}{seconds / count:>10.2f}"
+                  f"{prompt_tokens:>12}{completion_tokens:>12}{cost:>10.4f}")
+            if stage != "document":
+                grand["prompt_tokens"] += prompt_tokens
+                grand["completion_tokens"] += completion_tokens
+                grand["cost_usd"] += cost
+
+        print(f"  合计: 输入 {grand['prompt_tokens']} tokens，输出 {grand['completion_tokens']} tokens，"
+              f"估算费用 ${grand['cost_usd']:.4f}")
+        print(f"  明细: {self.jsonl_path}")
+
+
+# 汇总输出时的阶段顺序
+STAGE_ORDER = {name: index for index, name in enumerate(
+    ["extract", "ai_parse", "ai_review", "save", "move", "document"]
+)}
@@ -0,0 +1,135 @@
+"""
+文本分块模块
+按章节边界将长文档切分为token大小受控的文本块，供长文档分块分析使用
+"""
+
+import re
+from token_budget import count_tokens, truncate_to_tokens
+
+# 章节标题：编号标题（1. Introduction / 2.1 Data / III. RESULTS / \u4e00、引言 / 第二章）
+# 以及常见的无编号标题（Abstract / References / 摘要 / 参考文献 等）、按章节索引整理后的Markdown标题（## Methods）
+HEADING_PATTERN = re.compile(
+    r"^\s*(?:"
+    r"#{1,3}\s+[^\s#a-z][^\n]{0,90}"
+    r"|(?:\d+(?:\.\d+)*\.?|[IVX]+\.)\s+[A-Z\u4e00-\u9fff][^\n]{0,80}"
+    r"|[\u4e00二三四五六七八九十]+[、.．]\s*[^\n]{1,40}"
+    r"|第[\u4e00二三四五六七八九十\d]+[章节部分]\s*[^\n]{0,40}"
+    r"|(?:Abstract|Introduction|Background|Literature Review|Data|Methods?|Methodology|Results|"
+    r"Discussion|Conclusions?|Limitations|References|Bibliography|Acknowledge?ments?|Appendix[^\n]{0,40})"
+    r"|(?:摘\s*要|引\s*言|文献综述|研究方法|数据|实证结果|讨论|结\s*论|参考文献|致\s*谢|附\s*录)"
+    r")\s*$"
+)
+
+def split_sections(text):
+    """
+    按章节标题切分文本
+    :return: [(标题, 章节文本)]，标题行包含在章节文本开头；首个标题之前的内容标题为空字符串
+    """
+    sections = []
+    title = ""
+    start = 0
+    offset = 0
+
+    for line in text.splitlines(keepends=True):
+        if len(line) < 100 and HEADING_PATTERN.match(line):
+            if offset > start:
+                sections.append((title, text[start:offset]))
+            title = line.strip().lstrip("#").strip()
+            start = offset
+        offset += len(line)
+
+    if offset > start:
+        sections.append((title, text[start:offset]))
+    return sections
+
+
+def _split_oversized(section_text, max_tokens):
+    """将超过上限的单个章节按段落（必要时按行）切分"""
+    pieces = []
+    current = []
+    current_tokens = 0
+
+    for paragraph in re.split(r"(?<=\n\n)", section_text):
+        paragraph_tokens = count_tokens(paragraph)
+        if paragraph_tokens <= max_tokens:
+            units = [(paragraph, paragraph_tokens)]
+        else:
+            units = [(line, count_tokens(line)) for line in paragraph.splitlines(keepends=True)]
+
+        for unit, unit_tokens in units:
+            if current and current_tokens + unit_tokens > max_tokens:
+                pieces.append("".join(current))
+                current = []
+                current_tokens = 0
+            current.append(unit)
+            current_tokens += unit_tokens
+
+    if current:
+        pieces.append("".join(current))
+    return pieces
+
+
+def chunk_text(text, max_tokens):
+    """
+    将文本切分为不超过max_tokens的块，尽量在章节边界处切分
+    :return: 文本块列表（按原文顺序）
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for _, section_text in split_sections(text):
+        section_tokens = count_tokens(section_text)
+        if section_tokens > max_tokens:
+            pieces = [(piece, count_tokens(piece)) for piece in _split_oversized(section_text, max_tokens)]
+        else:
+            pieces = [(section_text, section_tokens)]
+
+        for piece, piece_tokens in pieces:
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append("".join(current))
+                current = []
+                current_tokens = 0
+            current.append(piece)
+            current_tokens += piece_tokens
+
+    if current and "".join(current).strip():
+        chunks.append("".join(current))
+    return chunks
+
+
+# 两阶段审稿时优先保留的章节（按优先级），以及不需要保留的章节
+KEY_SECTION_PATTERN = re.compile(
+    r"abstract|摘\s*要|method|data|design|sample|empirical|model|identification|estimation|result|finding"
+    r"|robust|discussion|conclu|limitation|方法|数据|设计|样本|模型|实证|结果|稳健|讨论|结\s*论|局限",
+    re.IGNORECASE
+)
+SKIP_SECTION_PATTERN = re.compile(
+    r"reference|bibliography|acknowledge?ment|appendix|参考文献|致\s*谢|附\s*录", re.IGNORECASE
+)
+
+
+def select_sections(text, max_tokens):
+    """
+    为两阶段审稿挑选原文片段：首个标题前的内容（题目、摘要）以及方法、结果、讨论、结论等关键章节，
+    各片段按原文顺序排列并平均分配token预算；未识别出关键章节时取原文开头和结尾
+    :return: 片段文本（各片段之间以 [...] 分隔）
+    """
+    selected = []
+    for index, (title, section_text) in enumerate(split_sections(text)):
+        if index == 0 and not title:
+            selected.append(section_text)
+        elif KEY_SECTION_PATTERN.search(title) and not SKIP_SECTION_PATTERN.search(title):
+            selected.append(section_text)
+
+    if len(selected) < 2:
+        if count_tokens(text) <= max_tokens:
+            return text
+        head = truncate_to_tokens(text, max_tokens * 2 // 3)
+        chars_per_token = len(head) / max(1, count_tokens(head))
+        tail = text[-int((max_tokens - max_tokens * 2 // 3) * chars_per_token):]
+        return f"{head.rstrip()}\n\n[...]\n\n{tail.lstrip()}"
+
+    share = max_tokens // len(selected)
+    excerpts = [truncate_to_tokens(section_text, share).strip() for section_text in selected]
+    return "\n\n[...]\n\n".join(excerpt for excerpt in excerpts if excerpt)
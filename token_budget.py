@@ -0,0 +1,162 @@
+"""
+Token预算模块
+本地计算token数、压缩提取文本中的冗余内容，并根据模型上下文长度分配输入与输出预算
+"""
+
+import os
+import re
+from collections import Counter
+
+try:
+    import tiktoken
+except ImportError:  # 可选依赖，未安装时使用估算
+    tiktoken = None
+
+CJK_PATTERN = re.compile(r"[\u3400-\u9fff\uf900-\ufaff\u3000-\u303f\uff00-\uffef]")
+
+# 页码行：12 / - 12 - / Page 3 / Page 3 of 20 / 第3页
+PAGE_NUMBER_PATTERN = re.compile(
+    r"^\s*(?:[-\u2013\u2014]?\s*\d{1,4}\s*[-\u2013\u2014]?|page\s+\d{1,4}(?:\s+of\s+\d{1,4})?|第\s*\d{1,4}\s*页)\s*$",
+    re.IGNORECASE
+)
+
+_encoding = None
+
+
+def estimate_tokens(text):
+    """
+    估算token数（未安装tiktoken时使用）
+    中日韩字符约1个token/字，其余文本约4个字符/token
+    """
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk) // 4
+
+
+def count_tokens(text):
+    """计算token数：优先使用tiktoken，否则估算"""
+    global _encoding
+
+    if tiktoken is None:
+        return estimate_tokens(text)
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding(os.getenv("TOKEN_ENCODING", "cl100k_base"))
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def _normalize_edge_line(line):
+    """页眉页脚比较时忽略数字（页码、卷期号）和空白差异"""
+    return re.sub(r"\d+", "#", re.sub(r"\s+", " ", line.strip())).lower()
+
+
+def strip_repeated_boilerplate(text, edge_lines=2, min_ratio=0.4):
+    """
+    去除跨页重复的页眉页脚和页码
+    提取文本以空行分隔各页，只检查每页开头和结尾的edge_lines行
+    """
+    pages = text.split("\n\n")
+    page_lines = [page.split("\n") for page in pages]
+    if sum(1 for lines in page_lines if any(line.strip() for line in lines)) < 3:
+        return text
+
+    counts = Counter()
+    for lines in page_lines:
+        if len(lines) <= edge_lines * 2:
+            continue
+        edges = {_normalize_edge_line(line) for line in lines[:edge_lines] + lines[-edge_lines:] if line.strip()}
+        counts.update(edges)
+
+    threshold = max(3, int(len(pages) * min_ratio))
+    repeated = {line for line, count in counts.items() if count >= threshold and len(line) <= 120}
+
+    def is_boilerplate(line):
+        return PAGE_NUMBER_PATTERN.match(line) or _normalize_edge_line(line) in repeated
+
+    cleaned_pages = []
+    for lines in page_lines:
+        if len(lines) <= edge_lines * 2:
+            cleaned_pages.append("\n".join(lines))
+            continue
+        head = 0
+        while head < min(edge_lines, len(lines)) and is_boilerplate(lines[head]):
+            head += 1
+        tail = len(lines)
+        while tail > max(head, len(lines) - edge_lines) and is_boilerplate(lines[tail - 1]):
+            tail -= 1
+        cleaned_pages.append("\n".join(lines[head:tail]))
+
+    return "\n\n".join(cleaned_pages)
+
+
+def compact_text(text):
+    """
+    压缩提取文本
+    - 去除跨页重复的页眉页脚和页码
+    - 合并行尾连字符断词（exam-\\nple -> example）
+    - 合并连续空白和多余空行
+    """
+    text = strip_repeated_boilerplate(text)
+    text = re.sub(r"([a-z])-\n([a-z])", r"\1\2", text)
+    text = re.sub(r"[ \t\xa0\u3000]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def truncate_to_tokens(text, max_tokens):
+    """将文本截断到不超过max_tokens（按比例估算后逐步收缩）"""
+    tokens = count_tokens(text)
+    while tokens > max_tokens and text:
+        text = text[:max(0, int(len(text) * max_tokens / tokens * 0.98))]
+        tokens = count_tokens(text)
+    return text
+
+
+class TokenBudget:
+    """按模型上下文长度分配输入和输出token"""
+
+    # 预留的安全余量（消息格式开销、计数误差）
+    SAFETY_MARGIN = 512
+    # 输出至少保留的token数
+    MIN_OUTPUT_TOKENS = 512
+
+    def __init__(self, context_tokens=None, max_input_tokens=None):
+        """
+        :param context_tokens: 模型上下文长度，默认读取MODEL_CONTEXT_TOKENS
+        :param max_input_tokens: 单次请求原文部分的token上限，默认读取AI_MAX_INPUT_TOKENS（0表示仅受上下文限制）
+        """
+        self.context_tokens = context_tokens or int(os.getenv("MODEL_CONTEXT_TOKENS", 128000))
+        if max_input_tokens is None:
+            max_input_tokens = int(os.getenv("AI_MAX_INPUT_TOKENS", 24000))
+        self.max_input_tokens = max_input_tokens
+
+    def document_budget(self, system_prompt, max_output_tokens):
+        """单次请求中可放入原文的token数"""
+        available = (
+            self.context_tokens
+            - count_tokens(system_prompt)
+            - max_output_tokens
+            - self.SAFETY_MARGIN
+        )
+        if self.max_input_tokens:
+            available = min(available, self.max_input_tokens)
+        return max(available, 0)
+
+    def fit_document(self, document_text, system_prompt, max_output_tokens):
+        """将原文截断到单次请求的预算内"""
+        return truncate_to_tokens(document_text, self.document_budget(system_prompt, max_output_tokens))
+
+    def fit_request(self, system_prompt, user_content, max_tokens):
+        """
+        保证一次请求不超出上下文长度
+        先按剩余空间下调max_tokens；剩余空间不足MIN_OUTPUT_TOKENS时截断用户内容
+        :return: (user_content, max_tokens)
+        """
+        input_tokens = count_tokens(system_prompt) + count_tokens(user_content) + self.SAFETY_MARGIN
+        remaining = self.context_tokens - input_tokens
+
+        if remaining < self.MIN_OUTPUT_TOKENS:
+            overflow = self.MIN_OUTPUT_TOKENS - remaining
+            user_content = truncate_to_tokens(user_content, count_tokens(user_content) - overflow)
+            remaining = self.MIN_OUTPUT_TOKENS
+
+        return user_content, min(max_tokens, remaining)
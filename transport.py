@@ -0,0 +1,396 @@
+"""
+传输层模块
+对AI API请求进行错误分类、带抖动的指数退避重试、请求截止时间控制、熔断，以及按阶段的模型选择与切换
+"""
+
+import email.utils
+import os
+import random
+import threading
+import time
+
+
+class AIClientError(Exception):
+    """AI请求失败"""
+
+
+class RetryableAPIError(AIClientError):
+    """可重试的错误（限流、超时、网关错误等）在重试耗尽或超过截止时间后抛出"""
+
+
+class FatalAPIError(AIClientError):
+    """不可重试的错误（认证失败、请求参数错误等）"""
+
+
+# 可重试的HTTP状态码
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 520, 521, 522, 523, 524, 529}
+
+
+def parse_retry_after(headers):
+    """解析Retry-After / retry-after-ms响应头，返回秒数"""
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        retry_date = email.utils.parsedate_to_datetime(retry_after)
+        return max(0.0, retry_date.timestamp() - time.time()) if retry_date else None
+
+
+def classify_error(error):
+    """
+    错误分类
+    :return: (是否可重试, 服务端建议的等待秒数或None)
+    """
+    # 发生错误时openai已随客户端导入，这里不增加启动时间
+    import openai
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True, None
+
+    if isinstance(error, openai.APIStatusError):
+        retry_after = parse_retry_after(getattr(error.response, "headers", None))
+        return error.status_code in RETRYABLE_STATUS_CODES, retry_after
+
+    return False, None
+
+
+class CallStats:
+    """
+    单个文档（或单个阶段）的请求统计（可被多个线程同时累加）
+    提供parent时，所有统计同时累加到parent（阶段统计汇总到文档统计）
+    """
+
+    def __init__(self, parent=None):
+        self._lock = threading.Lock()
+        self.parent = parent
+        self.attempts = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+        self.cache_hits = 0
+        # 按模型统计的token用量：模型 -> {"prompt_tokens", "completion_tokens"}
+        self.usage = {}
+        # 模型切换记录：[{"from", "to", "reason"}]
+        self.fallbacks = []
+        # 发出的对冲请求数 / 其中先收到首个token的次数
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record_attempt(self):
+        with self._lock:
+            self.attempts += 1
+        if self.parent:
+            self.parent.record_attempt()
+
+    def record_wait(self, seconds, retry=True):
+        with self._lock:
+            if retry:
+                self.retries += 1
+            self.wait_seconds += seconds
+        if self.parent:
+            self.parent.record_wait(seconds, retry)
+
+    def record_cache_hit(self):
+        with self._lock:
+            self.cache_hits += 1
+        if self.parent:
+            self.parent.record_cache_hit()
+
+    def record_usage(self, model, prompt_tokens, completion_tokens):
+        with self._lock:
+            tokens = self.usage.setdefault(model, {"prompt_tokens": 0, "completion_tokens": 0})
+            tokens["prompt_tokens"] += prompt_tokens
+            tokens["completion_tokens"] += completion_tokens
+        if self.parent:
+            self.parent.record_usage(model, prompt_tokens, completion_tokens)
+
+    def record_fallback(self, from_model, to_model, reason):
+        with self._lock:
+            self.fallbacks.append({"from": from_model, "to": to_model, "reason": reason})
+        if self.parent:
+            self.parent.record_fallback(from_model, to_model, reason)
+
+    def record_hedge(self):
+        with self._lock:
+            self.hedges += 1
+        if self.parent:
+            self.parent.record_hedge()
+
+    def record_hedge_win(self):
+        with self._lock:
+            self.hedge_wins += 1
+        if self.parent:
+            self.parent.record_hedge_win()
+
+    def usage_snapshot(self):
+        with self._lock:
+            return {model: dict(tokens) for model, tokens in self.usage.items()}
+
+    def routing(self):
+        """模型选择记录：实际生成结果的模型和切换过程"""
+        with self._lock:
+            return {"models": sorted(self.usage), "fallbacks": [dict(item) for item in self.fallbacks]}
+
+    def summary(self):
+        prompt_tokens = sum(tokens["prompt_tokens"] for tokens in self.usage.values())
+        completion_tokens = sum(tokens["completion_tokens"] for tokens in self.usage.values())
+        text = (f"请求 {self.attempts} 次，重试 {self.retries} 次，等待 {self.wait_seconds:.1f} 秒，"
+                f"tokens {prompt_tokens}/{completion_tokens}")
+        if self.usage:
+            text += f"，模型 {', '.join(sorted(self.usage))}"
+        if self.fallbacks:
+            text += f"，切换模型 {len(self.fallbacks)} 次"
+        if self.hedges:
+            text += f"，对冲 {self.hedges} 次"
+        return text
+
+
+def split_models(value):
+    """解析逗号分隔的模型链"""
+    return [model.strip() for model in (value or "").split(",") if model.strip()]
+
+
+class ModelRouter:
+    """
+    按阶段选择模型（多线程共享同一实例）
+    每个阶段一条按优先级排列的模型链：OPENAI_MODEL_PARSE / OPENAI_MODEL_REVIEW / OPENAI_MODEL_CHUNK（逗号分隔），
+    未配置的阶段使用OPENAI_MODEL（同样可以写成模型链）；
+    当前模型过载（限流、5xx、连接错误）或超过AI_FALLBACK_TIMEOUT秒仍未响应时切换到链中的下一个模型，
+    被切换掉的模型在AI_MODEL_COOLDOWN秒内不再作为首选
+    """
+
+    STAGES = ("parse", "review", "chunk")
+
+    def __init__(self, default_model=None, fallback_timeout=None, cooldown=None):
+        self.default_chain = split_models(default_model or os.getenv("OPENAI_MODEL", "openai/gpt-4o"))
+        self.chains = {
+            stage: split_models(os.getenv(f"OPENAI_MODEL_{stage.upper()}")) or self.default_chain
+            for stage in self.STAGES
+        }
+        self.fallback_timeout = fallback_timeout or float(os.getenv("AI_FALLBACK_TIMEOUT", 90))
+        self.cooldown = cooldown or float(os.getenv("AI_MODEL_COOLDOWN", 60))
+        self._lock = threading.Lock()
+        self._cooling_until = {}
+
+    def chain(self, stage=None):
+        """阶段的模型链（未知阶段使用默认模型链）"""
+        return self.chains.get(stage, self.default_chain)
+
+    def primary(self, stage=None):
+        """阶段的首选模型（响应缓存键和批处理使用）"""
+        return self.chain(stage)[0]
+
+    def route(self, stage=None):
+        """为一次请求创建模型选择状态"""
+        return ModelRoute(self, stage, self.chain(stage))
+
+    def is_cooling(self, model):
+        with self._lock:
+            return self._cooling_until.get(model, 0) > time.monotonic()
+
+    def cool_down(self, model):
+        with self._lock:
+            self._cooling_until[model] = time.monotonic() + self.cooldown
+
+
+class ModelRoute:
+    """单个请求的模型选择状态：从链中第一个未处于冷却期的模型开始，失败时依次后移"""
+
+    def __init__(self, router, stage, chain):
+        self.router = router
+        self.stage = stage
+        self.chain = chain
+        self.index = 0
+        self._skip_cooling()
+
+    @property
+    def model(self):
+        return self.chain[self.index]
+
+    def _skip_cooling(self):
+        while self.index + 1 < len(self.chain) and self.router.is_cooling(self.model):
+            self.index += 1
+
+    def alternate(self):
+        """对冲请求使用的模型选择状态：链中还有下一个模型时从下一个开始，否则使用当前模型"""
+        route = ModelRoute(self.router, self.stage, self.chain)
+        route.index = min(self.index + 1, len(self.chain) - 1)
+        return route
+
+    def attempt_timeout(self, remaining):
+        """本次尝试的超时：还有备选模型时不超过AI_FALLBACK_TIMEOUT，以便及时切换"""
+        if self.index + 1 < len(self.chain):
+            return min(remaining, self.router.fallback_timeout)
+        return remaining
+
+    def fall_back(self, error, stats=None):
+        """
+        当前模型请求失败时切换到下一个模型
+        :return: 已切换返回True；错误不可重试或已是最后一个模型时返回False（按重试策略处理）
+        """
+        if isinstance(error, AIClientError) or self.index + 1 >= len(self.chain):
+            return False
+        retryable, _ = classify_error(error)
+        if not retryable:
+            return False
+
+        import openai
+        if isinstance(error, openai.APITimeoutError):
+            reason = "timeout"
+        else:
+            reason = str(getattr(error, "status_code", None) or type(error).__name__)
+        previous = self.model
+        self.router.cool_down(previous)
+        self.index += 1
+        self._skip_cooling()
+        print(f"⚠ 模型 {previous} 不可用（{reason}），{self.stage or 'AI'}请求切换到 {self.model}")
+        if stats:
+            stats.record_fallback(previous, self.model, reason)
+        return True
+
+
+class CircuitBreaker:
+    """
+    熔断器
+    连续可重试失败达到阈值后打开，冷却期内所有请求暂停等待；
+    冷却结束后放行请求试探，成功即关闭，失败则重新打开
+    """
+
+    def __init__(self, failure_threshold=None, cooldown=None):
+        self.failure_threshold = failure_threshold or int(os.getenv("AI_BREAKER_THRESHOLD", 5))
+        self.cooldown = cooldown or float(os.getenv("AI_BREAKER_COOLDOWN", 30))
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+
+    def wait_time(self):
+        """熔断打开时返回还需等待的秒数，否则返回0"""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            half_open = self._opened_at is not None
+            if half_open or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print(f"⚠ 服务连续失败 {self._failures} 次，暂停所有请求 {self.cooldown:.0f} 秒")
+                self._opened_at = time.monotonic()
+
+
+class RetryPolicy:
+    """重试策略：指数退避+完全抖动，服务端给出Retry-After时以其为下限"""
+
+    def __init__(self, max_retries=None, base_delay=1.0, max_delay=60.0, deadline=None):
+        """
+        :param max_retries: 最大重试次数，默认读取AI_MAX_RETRIES
+        :param deadline: 单个请求（含重试）的截止时间（秒），默认读取AI_REQUEST_DEADLINE
+        """
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("AI_MAX_RETRIES", 5))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline or float(os.getenv("AI_REQUEST_DEADLINE", 600))
+
+    def backoff(self, retry_index, retry_after=None):
+        """第retry_index次重试前的等待时间"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry_index)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class Transport:
+    """带重试、截止时间和熔断的请求执行器（多线程共享同一实例）"""
+
+    def __init__(self, policy=None, breaker=None):
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+
+    def execute(self, request, stats=None, route=None):
+        """
+        执行请求
+        :param request: 可调用对象，接收timeout（本次尝试可用的秒数）并发起请求；
+                        提供route时接收 (timeout, model)
+        :param stats: CallStats，累加请求次数、重试次数、等待时间和模型切换
+        :param route: ModelRoute（可选），当前模型过载或超时时先切换到下一个模型，不等待退避
+        :return: request的返回值
+        """
+        deadline = time.monotonic() + self.policy.deadline
+        retry_index = 0
+
+        while True:
+            # 熔断打开时暂停，直到冷却结束
+            pause = self._breaker_pause(deadline)
+            if pause > 0:
+                time.sleep(pause)
+                if stats:
+                    stats.record_wait(pause, retry=False)
+
+            if stats:
+                stats.record_attempt()
+            try:
+                if route is None:
+                    result = request(self._remaining(deadline))
+                else:
+                    result = request(route.attempt_timeout(self._remaining(deadline)), route.model)
+            except Exception as e:
+                if route is not None and route.fall_back(e, stats):
+                    continue
+                delay = self._retry_delay(e, retry_index, deadline)
+                retry_index += 1
+                time.sleep(delay)
+                if stats:
+                    stats.record_wait(delay)
+                continue
+
+            self.breaker.record_success()
+            return result
+
+    def _breaker_pause(self, deadline):
+        """熔断打开时需要暂停的秒数（超过截止时间则直接失败）"""
+        pause = self.breaker.wait_time()
+        if pause > 0 and time.monotonic() + pause > deadline:
+            raise RetryableAPIError("AI API调用失败: 服务暂不可用（熔断中），已超过请求截止时间")
+        return pause
+
+    @staticmethod
+    def _remaining(deadline):
+        """本次尝试可用的秒数"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise RetryableAPIError("AI API调用失败: 已超过请求截止时间")
+        return remaining
+
+    def _retry_delay(self, error, retry_index, deadline):
+        """
+        处理一次失败：不可重试、重试耗尽或超过截止时间时抛出异常，否则返回重试前的等待秒数
+        """
+        if isinstance(error, AIClientError):
+            raise error
+
+        retryable, retry_after = classify_error(error)
+        if not retryable:
+            raise FatalAPIError(f"AI API调用失败: {error}") from error
+
+        self.breaker.record_failure()
+        delay = self.policy.backoff(retry_index, retry_after)
+        if retry_index >= self.policy.max_retries or time.monotonic() + delay > deadline:
+            raise RetryableAPIError(f"AI API调用失败（已重试 {retry_index} 次）: {error}") from error
+        return delay
@@ -0,0 +1,218 @@
+"""
+监视模式模块
+常驻运行，监视material文件夹中新放入的文档，文件写入完成后自动加入处理队列，
+每个文档按process_document的完整流程（提取、AI解析、审稿、移动）处理
+优先使用watchdog（Linux下基于inotify）接收文件事件，未安装时退化为定时扫描
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from document_parser import DocumentParser
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # 可选依赖，未安装时使用定时扫描
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _MaterialEventHandler(FileSystemEventHandler):
+    """把material根目录下的文件事件转交给监视器"""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.dest_path)
+
+
+class MaterialWatcher:
+    """material文件夹监视器"""
+
+    def __init__(self, review_system, workers=None, settle_seconds=None, poll_interval=None):
+        """
+        :param review_system: ReviewSystem实例（提供folder_manager、create_jobs和process_document）
+        :param workers: 同时处理的文档数，默认读取WATCH_WORKERS
+        :param settle_seconds: 文件大小和修改时间保持不变多少秒后视为写入完成，默认读取WATCH_SETTLE_SECONDS
+        :param poll_interval: 定时扫描间隔（秒，未安装watchdog时使用），默认读取WATCH_POLL_INTERVAL
+        """
+        self.review_system = review_system
+        self.folder_manager = review_system.folder_manager
+        self.material_dir = self.folder_manager.material_dir.resolve()
+
+        self.workers = workers or int(os.getenv("WATCH_WORKERS", 2))
+        self.settle_seconds = settle_seconds or float(os.getenv("WATCH_SETTLE_SECONDS", 2))
+        self.poll_interval = poll_interval or float(os.getenv("WATCH_POLL_INTERVAL", 1))
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        # 等待写入完成的文件：路径 -> (大小, 修改时间, 最近一次变化的时间)
+        self._pending = {}
+        # 正在排队或处理中的文件路径
+        self._active = set()
+        # 处理失败或已跳过的文件：路径 -> (大小, 修改时间)，文件被重新写入后才再次检查
+        self._ignored = {}
+
+    @staticmethod
+    def is_candidate(path):
+        """是否为需要处理的文档（跳过隐藏文件和Office临时锁文件）"""
+        name = path.name
+        if name.startswith((".", "~$")):
+            return False
+        return DocumentParser.is_supported(path)
+
+    def notify(self, path):
+        """收到文件事件（只处理material根目录下的文件）"""
+        path = Path(path)
+        if path.parent != self.material_dir or not self.is_candidate(path):
+            return
+        with self._lock:
+            if path not in self._active and path not in self._pending:
+                self._pending[path] = None
+        self._wakeup.set()
+
+    def scan(self):
+        """扫描material根目录，把新文件加入等待列表"""
+        with os.scandir(self.material_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    self.notify(entry.path)
+
+    def _collect_ready(self):
+        """返回写入已完成（大小和修改时间在settle_seconds内未变化）的文件"""
+        ready = []
+        now = time.monotonic()
+
+        with self._lock:
+            for path, state in list(self._pending.items()):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    del self._pending[path]
+                    continue
+
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if self._ignored.get(path) == signature:
+                    # 上次处理失败或已跳过且文件未改动，不重复处理
+                    del self._pending[path]
+                    continue
+
+                if state is None or state[:2] != signature:
+                    self._pending[path] = signature + (now,)
+                elif stat.st_size > 0 and now - state[2] >= self.settle_seconds:
+                    del self._pending[path]
+                    ready.append(path)
+
+        return ready
+
+    def _next_timeout(self):
+        """下一次检查前的等待时间"""
+        with self._lock:
+            waiting = bool(self._pending)
+        if waiting:
+            return min(self.poll_interval, self.settle_seconds / 2)
+        return self.poll_interval if Observer is None else None
+
+    def _ignore(self, path, signature=None):
+        """记录不再处理的文件（直到其被重新写入）"""
+        if signature is None:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                return
+            signature = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            self._ignored[path] = signature
+
+    def _dispatch(self, ready, executor):
+        """为写入完成的文件分配review编号并提交处理（review编号只在监视线程中分配，避免重复）"""
+        files = self.folder_manager.filter_unprocessed(ready)
+        for path in ready:
+            if path not in files:
+                self._ignore(path)
+
+        with self._lock:
+            files = [path for path in files if path not in self._active]
+            self._active.update(files)
+        for job in self.review_system.create_jobs(files):
+            executor.submit(self._process, job)
+
+    def _process(self, job):
+        """在工作线程中处理单个文档"""
+        file_path = job.file_path
+        try:
+            signature = None
+            try:
+                stat = file_path.stat()
+                signature = (stat.st_size, stat.st_mtime_ns)
+            except FileNotFoundError:
+                pass
+
+            success = self.review_system.process_document(
+                job.file_path,
+                job.review_number,
+                job.material_review_path,
+                job.response_review_path,
+                job.journal
+            )
+            if not success and signature:
+                self._ignore(file_path, signature)
+                print(f"❌ {file_path.name} 处理失败，文件被重新写入或重启监视后将再次处理")
+        except Exception as e:
+            print(f"❌ {file_path.name} 处理出错: {e}")
+        finally:
+            with self._lock:
+                self._active.discard(file_path)
+
+    def run(self):
+        """开始监视（阻塞运行，Ctrl+C退出）"""
+        observer = None
+        if Observer is not None:
+            observer = Observer()
+            observer.schedule(_MaterialEventHandler(self), str(self.material_dir), recursive=False)
+            observer.start()
+            mode = "文件事件"
+        else:
+            mode = f"每 {self.poll_interval:g} 秒扫描"
+
+        print(f"\n✓ 正在监视 {self.material_dir}（{mode}，同时处理 {self.workers} 个文档）")
+        print("  放入文档后自动开始处理，按 Ctrl+C 退出")
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        # 启动时已存在的文档同样处理
+        self.scan()
+
+        try:
+            while True:
+                self._wakeup.wait(self._next_timeout())
+                self._wakeup.clear()
+                if observer is None:
+                    self.scan()
+
+                ready = self._collect_ready()
+                if not ready:
+                    continue
+
+                try:
+                    self._dispatch(ready, executor)
+                except Exception as e:
+                    print(f"❌ 新文档加入队列失败: {e}")
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            print("\n正在停止监视：等待处理中的文档完成，排队中的文档将在下次启动时处理...")
+            executor.shutdown(wait=True, cancel_futures=True)